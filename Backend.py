@@ -0,0 +1,386 @@
+"""
+Compute Backend Module
+
+Selects the backend used for the pair kernels of the simulation: "numpy" (vectorised, always available) or "numba" (compiled in nopython mode and parallel over particles).
+The backend is chosen at import time from the LJ_BACKEND environment variable, or later with setbackend. If numba is not installed the numpy backend is used instead.
+
+The numba kernels cover the Lennard-Jones forces, potentials and virial (over all pairs, over a neighbour pair list in parallel over chunks of pairs with per-thread accumulators, and over all pairs of a stack of replicas), the lookup of tabulated pair potentials, the minimum image separation and the periodic boundary wrap.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Available backends
+BACKENDS = ("numpy", "numba")
+
+# Backend currently in use
+backend = "numpy"
+
+
+def setbackend(name):
+    """
+    Sets the compute backend, falling back to numpy if numba is requested but not installed.
+
+    :param name: name of the backend, "numpy" or "numba"
+    :return: name of the backend in use as a string
+    """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend " + str(name) + ", must be one of " + ", ".join(BACKENDS))
+    if name == "numba" and numba is None:
+        print("numba is not installed, using the numpy backend.\n")
+        name = "numpy"
+    backend = name
+    return backend
+
+def usenumba():
+    """
+    Checks whether the numba backend is in use.
+
+    :return: True if the pair kernels run with numba
+    """
+    return backend == "numba"
+
+
+# Per-thread accumulators of ljpairlist, kept between calls
+_accumulator = None
+
+
+def accumulators(N):
+    """
+    Returns the per-thread accumulators of ljpairlist, only allocated again when the number of particles or of numba threads changes.
+
+    :param N: number of particles as an integer
+    :return: (T,N,5) Numpy array for the T numba threads
+    """
+    global _accumulator
+    shape = (numba.get_num_threads(), N, 5)
+    if _accumulator is None or _accumulator.shape != shape:
+        _accumulator = np.empty(shape)
+    return _accumulator
+
+
+if numba is not None:
+
+    @numba.njit(inline="always")
+    def ljpair(rsq, Rc, Vc, Fc):
+        """
+        Computes the Lennard-Jones potential and force of a pair inside the cutoff, shifted according to the treatment of the cutoff.
+
+        :param rsq: squared distance of the pair as a float
+        :param Rc: cutoff radius as a float
+        :param Vc: shift of the pair potential at the cutoff as a float, see LennardJones.cutoffshift
+        :param Fc: shift of the pair force at the cutoff as a float, see LennardJones.cutoffshift
+        :return: pair potential and pair force divided by the distance as floats
+        """
+        r2inv = 1./rsq
+        r6inv = r2inv*r2inv*r2inv
+        pairvirial = 48.*r6inv*(r6inv - 0.5)
+        pairpotential = 4.*r6inv*(r6inv - 1.) - Vc
+        if Fc != 0.:
+            r = np.sqrt(rsq)
+            pairpotential += (r - Rc)*Fc
+            pairvirial -= r*Fc
+        return pairpotential, pairvirial*r2inv
+
+    @numba.njit(parallel=True, cache=True)
+    def wrap(position, image, boxdim):
+        """
+        Puts all particles back in the box in place according to the periodic boundary conditions, counting the box images crossed.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param image: box images crossed by the particles as an (N,3) Numpy array of integers
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        """
+        for i in numba.prange(position.shape[0]):
+            for k in range(3):
+                if position[i,k] < 0. or position[i,k] >= boxdim[k]:
+                    image[i,k] += np.int64(np.floor(position[i,k]/boxdim[k]))
+                    position[i,k] = position[i,k] % boxdim[k]
+
+    @numba.njit(parallel=True, cache=True)
+    def micvecsep(position, boxdim, n, vecsep):
+        """
+        Computes the minimum image vector separation between the nth particle and all particles.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param n: index of the reference particle
+        :param vecsep: (N,3) Numpy array the vector separations are written to
+        :return: vector separations as an (N,3) Numpy array
+        """
+        N = position.shape[0]
+        for i in numba.prange(N):
+            for k in range(3):
+                d = position[n,k] - position[i,k]
+                vecsep[i,k] = d - boxdim[k]*np.rint(d/boxdim[k])
+        return vecsep
+
+    @numba.njit(parallel=True, cache=True)
+    def ljallpairs(position, boxdim, Rc, Vc, Fc, force, potential, virial):
+        """
+        Computes the Lennard-Jones forces, potentials and virial over all pairs, in parallel over particles.
+        Every particle sums over all the others so that no two threads write to the same particle.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :param Vc: shift of the pair potential at the cutoff as a float, see LennardJones.cutoffshift
+        :param Fc: shift of the pair force at the cutoff as a float, see LennardJones.cutoffshift
+        :param force: (N,3) Numpy array the forces are written to
+        :param potential: (N,) Numpy array the potentials are written to
+        :param virial: (N,) Numpy array the virial of every particle is summed in
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        N = position.shape[0]
+        Rcsq = Rc*Rc
+        force[:] = 0.
+        potential[:] = 0.
+        virial[:] = 0.
+        for i in numba.prange(N):
+            for j in range(N):
+                if i != j:
+                    dx = position[i,0] - position[j,0]
+                    dy = position[i,1] - position[j,1]
+                    dz = position[i,2] - position[j,2]
+                    dx -= boxdim[0]*np.rint(dx/boxdim[0])
+                    dy -= boxdim[1]*np.rint(dy/boxdim[1])
+                    dz -= boxdim[2]*np.rint(dz/boxdim[2])
+                    rsq = dx*dx + dy*dy + dz*dz
+                    if rsq < Rcsq:
+                        pairpotential, fscalar = ljpair(rsq, Rc, Vc, Fc)
+                        potential[i] += pairpotential
+                        virial[i] += fscalar*rsq
+                        force[i,0] += fscalar*dx
+                        force[i,1] += fscalar*dy
+                        force[i,2] += fscalar*dz
+        # Every pair was visited from both particles
+        return force, potential, 0.5*np.sum(virial)
+
+    @numba.njit(cache=True)
+    def ljpairlistserial(position, boxdim, Rc, ilist, jlist, Vc, Fc, force, potential):
+        """
+        Computes the Lennard-Jones forces, potentials and virial over a neighbour pair list in a single thread, applying each pair force to both particles.
+        Used when numba runs on one thread, where the per-thread accumulators of ljpairlist only add a reduction.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :param ilist: first particle of every pair as a Numpy array
+        :param jlist: second particle of every pair as a Numpy array
+        :param Vc: shift of the pair potential at the cutoff as a float, see LennardJones.cutoffshift
+        :param Fc: shift of the pair force at the cutoff as a float, see LennardJones.cutoffshift
+        :param force: (N,3) Numpy array the forces are written to
+        :param potential: (N,) Numpy array the potentials are written to
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        Rcsq = Rc*Rc
+        force[:] = 0.
+        potential[:] = 0.
+        virial = 0.
+        for p in range(ilist.shape[0]):
+            i = ilist[p]
+            j = jlist[p]
+            dx = position[i,0] - position[j,0]
+            dy = position[i,1] - position[j,1]
+            dz = position[i,2] - position[j,2]
+            dx -= boxdim[0]*np.rint(dx/boxdim[0])
+            dy -= boxdim[1]*np.rint(dy/boxdim[1])
+            dz -= boxdim[2]*np.rint(dz/boxdim[2])
+            rsq = dx*dx + dy*dy + dz*dz
+            if rsq < Rcsq:
+                pairpotential, fscalar = ljpair(rsq, Rc, Vc, Fc)
+                potential[i] += pairpotential
+                potential[j] += pairpotential
+                virial += fscalar*rsq
+                fx = fscalar*dx
+                fy = fscalar*dy
+                fz = fscalar*dz
+                force[i,0] += fx
+                force[i,1] += fy
+                force[i,2] += fz
+                force[j,0] -= fx
+                force[j,1] -= fy
+                force[j,2] -= fz
+        return force, potential, virial
+
+    @numba.njit(parallel=True, cache=True)
+    def ljpairlist(position, boxdim, Rc, ilist, jlist, Vc, Fc, force, potential, accumulator):
+        """
+        Computes the Lennard-Jones forces, potentials and virial over a neighbour pair list, in parallel over chunks of pairs.
+        Every thread applies the pair forces of its chunk to both particles in its own accumulator, the accumulators being summed over threads afterwards in parallel over particles.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :param ilist: first particle of every pair as a Numpy array
+        :param jlist: second particle of every pair as a Numpy array
+        :param Vc: shift of the pair potential at the cutoff as a float, see LennardJones.cutoffshift
+        :param Fc: shift of the pair force at the cutoff as a float, see LennardJones.cutoffshift
+        :param force: (N,3) Numpy array the forces are written to
+        :param potential: (N,) Numpy array the potentials are written to
+        :param accumulator: (T,N,5) Numpy array of the forces, potential and virial of every particle summed by each of the T chunks, see accumulators
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        N = position.shape[0]
+        T = accumulator.shape[0]
+        P = ilist.shape[0]
+        Rcsq = Rc*Rc
+        for t in numba.prange(T):
+            accumulator[t] = 0.
+            for p in range(t*P//T, (t+1)*P//T):
+                i = ilist[p]
+                j = jlist[p]
+                dx = position[i,0] - position[j,0]
+                dy = position[i,1] - position[j,1]
+                dz = position[i,2] - position[j,2]
+                dx -= boxdim[0]*np.rint(dx/boxdim[0])
+                dy -= boxdim[1]*np.rint(dy/boxdim[1])
+                dz -= boxdim[2]*np.rint(dz/boxdim[2])
+                rsq = dx*dx + dy*dy + dz*dz
+                if rsq < Rcsq:
+                    pairpotential, fscalar = ljpair(rsq, Rc, Vc, Fc)
+                    fx = fscalar*dx
+                    fy = fscalar*dy
+                    fz = fscalar*dz
+                    accumulator[t,i,0] += fx
+                    accumulator[t,i,1] += fy
+                    accumulator[t,i,2] += fz
+                    accumulator[t,i,3] += pairpotential
+                    accumulator[t,i,4] += fscalar*rsq
+                    accumulator[t,j,0] -= fx
+                    accumulator[t,j,1] -= fy
+                    accumulator[t,j,2] -= fz
+                    accumulator[t,j,3] += pairpotential
+        virial = 0.
+        for n in numba.prange(N):
+            fx = 0.
+            fy = 0.
+            fz = 0.
+            u = 0.
+            w = 0.
+            for t in range(T):
+                fx += accumulator[t,n,0]
+                fy += accumulator[t,n,1]
+                fz += accumulator[t,n,2]
+                u += accumulator[t,n,3]
+                w += accumulator[t,n,4]
+            force[n,0] = fx
+            force[n,1] = fy
+            force[n,2] = fz
+            potential[n] = u
+            virial += w
+        return force, potential, virial
+
+    @numba.njit(cache=True)
+    def tablepairlist(position, boxdim, Rcsq, ilist, jlist, rsqmin, invds, Vcoef, Wcoef, force, potential):
+        """
+        Computes the forces, potentials and virial over a neighbour pair list by lookup in a table of a pair potential in r^2, see PairPotential.PairTable.
+
+        :param position: positions of the particles as an (N,3) Numpy array
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rcsq: squared cutoff radius as a float
+        :param ilist: first particle of every pair as a Numpy array
+        :param jlist: second particle of every pair as a Numpy array
+        :param rsqmin: squared distance of the first node of the table as a float
+        :param invds: inverse of the spacing of the nodes in r^2 as a float
+        :param Vcoef: polynomial coefficients of the pair potential in every interval as an (order+1,intervals) Numpy array
+        :param Wcoef: polynomial coefficients of the pair force divided by the distance in every interval as an (order+1,intervals) Numpy array
+        :param force: (N,3) Numpy array the forces are written to
+        :param potential: (N,) Numpy array the potentials are written to
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        N = position.shape[0]
+        order = Vcoef.shape[0] - 1
+        last = Vcoef.shape[1] - 1
+        force[:] = 0.
+        potential[:] = 0.
+        virial = 0.
+        for p in range(ilist.shape[0]):
+            i = ilist[p]
+            j = jlist[p]
+            dx = position[i,0] - position[j,0]
+            dy = position[i,1] - position[j,1]
+            dz = position[i,2] - position[j,2]
+            dx -= boxdim[0]*np.rint(dx/boxdim[0])
+            dy -= boxdim[1]*np.rint(dy/boxdim[1])
+            dz -= boxdim[2]*np.rint(dz/boxdim[2])
+            rsq = dx*dx + dy*dy + dz*dz
+            if rsq < Rcsq:
+                x = (rsq - rsqmin)*invds
+                k = min(max(int(x), 0), last)
+                t = x - k
+                pairpotential = Vcoef[order,k]
+                fscalar = Wcoef[order,k]
+                for c in range(order - 1, -1, -1):
+                    pairpotential = pairpotential*t + Vcoef[c,k]
+                    fscalar = fscalar*t + Wcoef[c,k]
+                potential[i] += pairpotential
+                potential[j] += pairpotential
+                virial += fscalar*rsq
+                fx = fscalar*dx
+                fy = fscalar*dy
+                fz = fscalar*dz
+                force[i,0] += fx
+                force[i,1] += fy
+                force[i,2] += fz
+                force[j,0] -= fx
+                force[j,1] -= fy
+                force[j,2] -= fz
+        return force, potential, virial
+
+    @numba.njit(parallel=True, cache=True)
+    def ljreplicas(position, boxdim, Rc, Vc, Fc):
+        """
+        Computes the Lennard-Jones forces, potentials and virials over all pairs of a stack of replicas, in parallel over replicas.
+        Every replica is computed by one thread, applying each pair force to both particles.
+
+        :param position: positions of the particles of every replica as an (R,N,3) Numpy array
+        :param boxdim: box dimensions of every replica as an (R,3) Numpy array
+        :param Rc: cutoff radius of every replica as an (R,) Numpy array
+        :param Vc: shift of the pair potential at the cutoff of every replica as an (R,) Numpy array, see LennardJones.cutoffshift
+        :param Fc: shift of the pair force at the cutoff of every replica as an (R,) Numpy array, see LennardJones.cutoffshift
+        :return: forces as an (R,N,3) Numpy array, potentials as an (R,N) Numpy array and virials as an (R,) Numpy array
+        """
+        R = position.shape[0]
+        N = position.shape[1]
+        force = np.zeros((R,N,3))
+        potential = np.zeros((R,N))
+        virial = np.zeros(R)
+        for r in numba.prange(R):
+            Rcsq = Rc[r]*Rc[r]
+            for i in range(N):
+                for j in range(i+1, N):
+                    dx = position[r,i,0] - position[r,j,0]
+                    dy = position[r,i,1] - position[r,j,1]
+                    dz = position[r,i,2] - position[r,j,2]
+                    dx -= boxdim[r,0]*np.rint(dx/boxdim[r,0])
+                    dy -= boxdim[r,1]*np.rint(dy/boxdim[r,1])
+                    dz -= boxdim[r,2]*np.rint(dz/boxdim[r,2])
+                    rsq = dx*dx + dy*dy + dz*dz
+                    if rsq < Rcsq:
+                        pairpotential, fscalar = ljpair(rsq, Rc[r], Vc[r], Fc[r])
+                        potential[r,i] += pairpotential
+                        potential[r,j] += pairpotential
+                        virial[r] += fscalar*rsq
+                        fx = fscalar*dx
+                        fy = fscalar*dy
+                        fz = fscalar*dz
+                        force[r,i,0] += fx
+                        force[r,i,1] += fy
+                        force[r,i,2] += fz
+                        force[r,j,0] -= fx
+                        force[r,j,1] -= fy
+                        force[r,j,2] -= fz
+        return force, potential, virial
+
+
+# Backend chosen at import time
+setbackend(os.environ.get("LJ_BACKEND", "numpy"))
@@ -0,0 +1,192 @@
+"""
+Batch Runner
+
+Runs many simulations without prompts or plot windows across a pool of processes, either from a list of input files or for every combination of a grid of parameters (temperature, density, cutoff radius, number of particles and timestep).
+Every run writes its output files and the log of its printed output to its own directory, and the averages of all runs are collected in one summary table.
+
+Usage:
+    python3 Batch.py solid.in fluid.in gas.in
+    python3 Batch.py --name Fluid --N 108 --temp 0.8 1.0 1.2 --rho 0.8 0.9 --rc 2.5 --numstep 1000 --dt 0.01 0.005 --processes 4 --plot
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import os
+
+# Plots are only saved, never shown
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import contextlib
+import itertools
+import multiprocessing
+import traceback
+import NBodySim
+import Trajectory as traj
+import LennardJones as lj
+import Thermostat as th
+import ParticleList as pl
+
+# Columns of the summary table, after the name of the run
+COLUMNS = ("name", "N", "temp", "rho", "r_c", "numstep", "dt", "KE", "PE", "totE", "temperature", "pressure", "drift", "msd", "time")
+
+
+def fileruns(fileNames, dts=(0.01,)):
+    """
+    Lists the runs of a set of input files, for every timestep
+
+    :param fileNames: names of the input files as a list of strings
+    :param dts: timesteps as a sequence of floats
+    :return: runs as a list of dictionaries
+    """
+    runs = []
+    for fileName, dt in itertools.product(fileNames, dts):
+        run = os.path.splitext(os.path.basename(fileName))[0]
+        if len(dts) > 1:
+            run += "_dt" + str(dt)
+        runs.append({"run": run, "input": fileName, "dt": dt})
+    return runs
+
+def gridruns(name, N, temp, rho, r_c, numstep, dts=(0.01,)):
+    """
+    Lists the runs of every combination of a grid of parameters
+
+    :param name: name of the system as a string
+    :param N: numbers of particles as a sequence of integers
+    :param temp: temperatures as a sequence of floats
+    :param rho: densities as a sequence of floats
+    :param r_c: cutoff radii as a sequence of floats
+    :param numstep: number of steps of every run as an integer
+    :param dts: timesteps as a sequence of floats
+    :return: runs as a list of dictionaries
+    """
+    runs = []
+    for n, t, density, cutoff, dt in itertools.product(N, temp, rho, r_c, dts):
+        run = "{0}_N{1}_T{2}_rho{3}_rc{4}_dt{5}".format(name, n, t, density, cutoff, dt)
+        runs.append({"run": run, "input": None, "parameters": (name, n, t, density, cutoff, numstep), "dt": dt})
+    return runs
+
+def writeinput(fileName, name, N, temp, rho, r_c, numstep):
+    """
+    Writes an input file of NBodySim
+
+    :param fileName: name of the input file as a string
+    :param name: name of the system as a string
+    :param N: number of particles as an integer
+    :param temp: temperature as a float
+    :param rho: density as a float
+    :param r_c: cutoff radius as a float
+    :param numstep: number of steps as an integer
+    """
+    with open(fileName, "w") as file:
+        file.write(str(name) + " " + str(N) + " " + str(temp) + " " + str(rho) + "\n")
+        file.write(str(r_c) + " " + str(numstep) + "\n")
+
+def runone(task):
+    """
+    Runs one simulation in its own directory, with its printed output written to log.out in that directory
+
+    :param task: run as a dictionary, output directory of the batch and keyword arguments of NBodySim.simulate
+    :return: name of the run, summary of the run or None if it failed, and traceback of the error or None
+    """
+    run, outdir, settings = task
+    rundir = os.path.join(outdir, run["run"])
+    os.makedirs(rundir, exist_ok=True)
+
+    # A run of a parameter grid gets an input file written to its directory
+    fileName = run["input"]
+    if fileName is None:
+        fileName = os.path.join(rundir, "input.in")
+        writeinput(fileName, *run["parameters"])
+
+    try:
+        with open(os.path.join(rundir, "log.out"), "w") as log, contextlib.redirect_stdout(log):
+            summary = NBodySim.simulate(fileName, rundir, dt=run["dt"], show=False, **settings)
+        return run["run"], summary, None
+    except Exception:
+        return run["run"], None, traceback.format_exc()
+
+def writesummary(fileName, results):
+    """
+    Writes the summary table of a batch where each line is: [run] [name] [N] [temp] [rho] [r_c] [numstep] [dt] [KE] [PE] [totE] [temperature] [pressure] [drift] [msd] [time]
+    Energies, temperature and pressure are averages over the samples, drift is the change of the total energy per particle over the run and msd the final MSD.
+
+    :param fileName: name of the summary file as a string
+    :param results: results of runone as a list
+    """
+    with open(fileName, "w") as file:
+        file.write("# run " + " ".join(COLUMNS) + "\n")
+        for run, summary, error in results:
+            if summary is None:
+                file.write(run + " failed\n")
+                continue
+            values = [summary[column] for column in COLUMNS]
+            file.write(run + "".join([" {0:.6g}".format(value) if isinstance(value, float) else " " + str(value) for value in values]) + "\n")
+
+def runbatch(runs, outdir="batch", processes=None, **settings):
+    """
+    Runs a list of simulations across a pool of processes and writes their summary table to summary.out in the output directory.
+    Every simulation computes its forces in its own process, so the parallelism is across runs.
+
+    :param runs: runs as returned by fileruns or gridruns
+    :param outdir: output directory of the batch as a string, with one directory per run
+    :param processes: number of processes as an integer, the number of CPUs if None
+    :param settings: keyword arguments of NBodySim.simulate such as plot, seed or trajectoryformat
+    :return: results of the runs as a list of (name of the run, summary or None, traceback or None)
+    """
+    os.makedirs(outdir, exist_ok=True)
+    tasks = [(run, outdir, settings) for run in runs]
+
+    # One process per run, so that every run starts from a fresh interpreter state
+    results = []
+    with multiprocessing.Pool(processes, maxtasksperchild=1) as pool:
+        for result in pool.imap(runone, tasks):
+            run, summary, error = result
+            if summary is None:
+                print(run + " failed:\n" + error)
+            else:
+                print(run + " completed in " + str(round(summary["time"], 2)) + " seconds")
+            results.append(result)
+
+    writesummary(os.path.join(outdir, "summary.out"), results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a batch of Lennard-Jones simulations from input files or a grid of parameters.")
+    parser.add_argument("files", nargs="*", help="input files, the grid of parameters is used if there are none")
+    parser.add_argument("--name", default="LJ", help="name of the system of the grid")
+    parser.add_argument("--N", type=int, nargs="+", help="numbers of particles of the grid")
+    parser.add_argument("--temp", type=float, nargs="+", help="temperatures of the grid")
+    parser.add_argument("--rho", type=float, nargs="+", help="densities of the grid")
+    parser.add_argument("--rc", type=float, nargs="+", help="cutoff radii of the grid")
+    parser.add_argument("--numstep", type=int, help="number of steps of every run of the grid")
+    parser.add_argument("--dt", type=float, nargs="+", default=[0.01], help="timesteps")
+    parser.add_argument("--processes", type=int, default=None, help="number of processes, the number of CPUs by default")
+    parser.add_argument("--outdir", default="batch", help="output directory")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random initial velocities")
+    parser.add_argument("--trajectory", choices=traj.FORMATS, default="dcd", help="trajectory format")
+    parser.add_argument("--cutoff", choices=lj.CUTOFFS, default="truncated", help="treatment of the cutoff radius")
+    parser.add_argument("--tail", action="store_true", help="add the tail corrections to the energy and pressure")
+    parser.add_argument("--respa", type=int, default=1, help="short range steps per timestep of the r-RESPA integrator, 1 for velocity Verlet")
+    parser.add_argument("--rinner", type=float, default=2.0, help="inner radius of the r-RESPA integrator")
+    parser.add_argument("--thermostat", choices=th.THERMOSTATS, default=None, help="thermostat at the temperature of the run, constant energy by default")
+    parser.add_argument("--tau", type=float, default=0.1, help="relaxation time of the thermostat")
+    parser.add_argument("--pressure", type=float, default=None, help="pressure of the Berendsen barostat, constant volume by default")
+    parser.add_argument("--taup", type=float, default=1.0, help="relaxation time of the barostat")
+    parser.add_argument("--precision", choices=pl.PRECISIONS, default="double", help="precision of the positions, velocities and pair terms")
+    parser.add_argument("--plot", action="store_true", help="save the plots of every run")
+    parser.add_argument("--profile", action="store_true", help="profile the main loop of every run with cProfile")
+    args = parser.parse_args()
+    if args.tail and args.cutoff == "forceshifted":
+        parser.error("--tail cannot be used with --cutoff forceshifted")
+
+    if args.files:
+        runs = fileruns(args.files, args.dt)
+    else:
+        if None in (args.N, args.temp, args.rho, args.rc, args.numstep):
+            parser.error("input files or all of --N, --temp, --rho, --rc and --numstep are needed")
+        runs = gridruns(args.name, args.N, args.temp, args.rho, args.rc, args.numstep, args.dt)
+
+    runbatch(runs, args.outdir, args.processes, plot=args.plot, seed=args.seed, trajectoryformat=args.trajectory, cutoff=args.cutoff, tail=args.tail, respa=args.respa, rinner=args.rinner,
+             thermostat=args.thermostat, tau=args.tau, pressure=args.pressure, taup=args.taup, precision=args.precision, profile=args.profile)
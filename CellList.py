@@ -0,0 +1,98 @@
+"""
+Cell List Module
+
+Linked-cell neighbour search: particles are binned into cells of side at least the cutoff radius so that only particles in the same or adjacent cells (with periodic wrap) are considered as interacting pairs.
+A CellList instance can be passed as the neighbour backend of the LennardJones force and energy routines.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+import LennardJones as lj
+
+# Offsets of the 13 neighbouring cells of the half shell, so that every pair of cells is only visited once
+_halfshell = np.array([(dx,dy,dz) for dx in (-1,0,1) for dy in (-1,0,1) for dz in (-1,0,1) if (dx,dy,dz) > (0,0,0)])
+
+
+class CellList(object):
+
+    def __init__(self):
+        """
+        Initialise an empty CellList instance, the cells are built from the particle positions on each call to pairs.
+        """
+        self.ncell = None
+        self.cell = None
+        self.order = None
+        self.counts = None
+        self.starts = None
+
+    def __str__(self):
+        """
+        Print the number of cells in each direction
+
+        :param CellList: CellList instance
+        :return: string with the cell grid
+        """
+        return "CellList with cell grid " + str(self.ncell)
+
+    def build(self, system, boxdim, Rc):
+        """
+        Bins the particles of the system into cells of side greater or equal to the cutoff radius.
+
+        :param CellList: CellList instance
+        :param system: ParticleSyst instance with positions inside the box
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :return: True if the box holds at least 3 cells in every direction, False otherwise
+        """
+        # Number of cells in each direction, cells must be at least Rc wide
+        self.ncell = np.floor(boxdim/Rc).astype(int)
+
+        # With less than 3 cells in a direction the same neighbour cell would be visited twice
+        if np.any(self.ncell < 3):
+            return False
+
+        # Cell coordinates of every particle, the modulo catches particles sitting exactly on the box edge
+        cellcoords = np.floor(system.position*(self.ncell/boxdim)).astype(int) % self.ncell
+        self.cell = (cellcoords[:,0]*self.ncell[1] + cellcoords[:,1])*self.ncell[2] + cellcoords[:,2]
+
+        # Particles sorted by cell, with the start and number of particles of each cell in the sorted array
+        self.order = np.argsort(self.cell, kind="stable")
+        self.counts = np.bincount(self.cell, minlength=np.prod(self.ncell))
+        self.starts = np.cumsum(self.counts) - self.counts
+        return True
+
+    def pairs(self, system, boxdim, Rc):
+        """
+        Finds the candidate interacting pairs of the system by visiting only the same and neighbouring cells of every particle.
+        Every pair is returned once; pairs further apart than Rc can be included and are left to the cutoff condition of the force routines.
+
+        :param CellList: CellList instance
+        :param system: ParticleSyst instance with positions inside the box
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :return i, j: two Numpy arrays of particle indices where the pth pair is (i[p], j[p])
+        """
+        # Fall back to all pairs if the box is too small for the cell grid
+        if not self.build(system, boxdim, Rc):
+            return lj.allpairs(system.N)
+
+        ncell = self.ncell
+        cellcoords = np.stack(np.unravel_index(self.cell, ncell), axis=1)
+
+        # Cell visited by every particle for its own cell and each half shell offset, with periodic wrap
+        offsets = np.vstack((np.zeros((1,3), dtype=int), _halfshell))
+        neighbourcoords = (cellcoords[np.newaxis,:,:] + offsets[:,np.newaxis,:]) % ncell
+        neighbour = ((neighbourcoords[:,:,0]*ncell[1] + neighbourcoords[:,:,1])*ncell[2] + neighbourcoords[:,:,2]).ravel()
+        particle = np.tile(np.arange(system.N), len(offsets))
+
+        # Expand every (particle, cell) entry into one candidate pair per particle of that cell
+        count = self.counts[neighbour]
+        i = np.repeat(particle, count)
+        first = np.repeat(np.cumsum(count) - count, count)
+        j = self.order[np.repeat(self.starts[neighbour], count) + np.arange(len(i)) - first]
+
+        # Pairs within a cell are found from both particles, only keep them once
+        samecell = np.repeat(np.arange(len(neighbour)) < system.N, count)
+        keep = ~samecell | (i < j)
+        return i[keep], j[keep]
@@ -0,0 +1,131 @@
+"""
+Checkpoint Module
+
+Saves and restores the full state of a simulation in a compressed Numpy .npz snapshot: positions, velocities, box images, cached forces, step counter, random number generator state, box dimensions, simulation parameters and the state of the RDF, MSD and neighbour list accumulators and of the thermostat.
+The snapshot is first written to a temporary file which is then renamed, so that a run stopped while saving never leaves a corrupt checkpoint.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import os
+import json
+import random
+import numpy as np
+from ParticleList import ParticleSyst as P
+
+
+def save(fileName, syst, boxdim, step, parameters, rdf=None, msdtracker=None, neighbours=None, thermostat=None):
+    """
+    Saves the state of a simulation to a checkpoint file
+
+    :param fileName: name of the checkpoint file as a string, ending in .npz
+    :param syst: ParticleSyst instance
+    :param boxdim: box dimensions as a (1,3) Numpy array
+    :param step: last completed timestep number as an integer
+    :param parameters: simulation parameters as a dictionary of numbers and strings
+    :param rdf: RDF instance, not saved if None
+    :param msdtracker: MSDTracker instance, not saved if None
+    :param neighbours: neighbour backend with a state method such as a VerletList instance, not saved if None
+    :param thermostat: thermostat or barostat with a state method, not saved if None
+    """
+    state = {
+        "step": np.array(step),
+        "name": np.array(str(syst.name)),
+        "label": np.array([str(label) for label in syst.label]),
+        "mass": np.array(syst.mass),
+        "position": syst.position,
+        "velocity": syst.velocity,
+        "image": syst.image,
+        "boxdim": np.asarray(boxdim),
+        "parameters": np.array(json.dumps(parameters)),
+        "random": np.array(json.dumps(random.getstate())),
+    }
+
+    # State of the Numpy global random number generator
+    generator, key, position, hasgauss, gauss = np.random.get_state()
+    state["nprandom_key"] = key
+    state["nprandom"] = np.array(json.dumps([generator, int(position), int(hasgauss), float(gauss)]))
+
+    # Cached forces so that the next step starts from exactly the same forces
+    if syst.force is not None:
+        state["force"] = syst.force
+        state["potential"] = syst.potential
+        state["virial"] = np.array(syst.virial)
+
+    # Accumulators, with their keys prefixed by their name
+    for prefix, accumulator in (("rdf", rdf), ("msd", msdtracker), ("neighbours", neighbours), ("thermostat", thermostat)):
+        if accumulator is not None and hasattr(accumulator, "state"):
+            for key, value in accumulator.state().items():
+                state[prefix + "_" + key] = value
+
+    # Write to a temporary file and rename it over the checkpoint in one atomic operation
+    temporary = fileName + ".tmp"
+    with open(temporary, "wb") as snapshot:
+        np.savez_compressed(snapshot, **state)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, fileName)
+
+def load(fileName):
+    """
+    Loads a checkpoint file
+
+    :param fileName: name of the checkpoint file as a string
+    :return: state of the simulation as a dictionary of Numpy arrays
+    """
+    with np.load(fileName) as data:
+        return {key: data[key] for key in data.files}
+
+def substate(state, prefix):
+    """
+    Extracts the state of one accumulator from the state of the simulation
+
+    :param state: state of the simulation as returned by load
+    :param prefix: name of the accumulator, "rdf", "msd", "neighbours" or "thermostat"
+    :return: state of the accumulator as a dictionary, empty if it was not saved
+    """
+    start = prefix + "_"
+    return {key[len(start):]: value for key, value in state.items() if key.startswith(start)}
+
+def parameters(state):
+    """
+    Returns the simulation parameters saved in a checkpoint
+
+    :param state: state of the simulation as returned by load
+    :return: simulation parameters as a dictionary
+    """
+    return json.loads(str(state["parameters"]))
+
+def restoresystem(state):
+    """
+    Creates the system saved in a checkpoint, with its cached forces, and restores the state of the random number generator
+
+    :param state: state of the simulation as returned by load
+    :return: ParticleSyst instance and box dimensions as a (1,3) Numpy array
+    """
+    label = [str(label) for label in state["label"]]
+    syst = P.fromarrays(str(state["name"]), state["position"], state["velocity"], float(state["mass"]), label)
+    syst.image = np.copy(state["image"])
+    if "force" in state:
+        syst.force = np.copy(state["force"])
+        syst.potential = np.copy(state["potential"])
+        syst.virial = float(state["virial"])
+
+    version, internal, gauss = json.loads(str(state["random"]))
+    random.setstate((version, tuple(internal), gauss))
+    generator, position, hasgauss, gauss = json.loads(str(state["nprandom"]))
+    np.random.set_state((generator, state["nprandom_key"], position, hasgauss, gauss))
+
+    return syst, np.copy(state["boxdim"])
+
+def truncate(fileName, step):
+    """
+    Removes the lines of an output file written after a checkpoint, so that a restarted run appends to it without duplicated timesteps
+
+    :param fileName: name of an output file where every line starts with its timestep number
+    :param step: timestep number of the checkpoint as an integer
+    """
+    with open(fileName, "r") as file:
+        lines = [line for line in file if int(line.split()[0]) <= step]
+    with open(fileName, "w") as file:
+        file.writelines(lines)
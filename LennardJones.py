@@ -2,98 +2,242 @@
 Lennard Jones Module 
 
 Returns the force and potential energy acting on every particle through the Lennard-Jones pair potential as well as the total potential energy of the system.
+The potential is truncated at the cutoff radius, or shifted to zero there, or shifted so that both the potential and force go to zero there. Analytic tail corrections give the energy and pressure of the pairs beyond the cutoff.
 
 Authors: Marina Ruiz Sanchez-Oro, Cara Lynch
 
 21/02/2017
 """
 
+import functools
+import math
 import numpy as np
-from ParticleList import ParticleSyst as P
+import PBC
+import Backend
 
+# Treatments of the cutoff radius: truncated potential, potential shifted to zero at the cutoff, potential and force shifted to zero at the cutoff
+CUTOFFS = ("truncated", "shifted", "forceshifted")
 
-def ljforce(system,boxdim,Rc) :
+
+# Cache of the (i,j) index pairs with i<j, keyed by number of particles
+_pairindices = {}
+
+def allpairs(N):
+    """
+    Returns the indices of every pair of particles in a system of N particles, each pair only once.
+    
+    :param N: number of particles as an integer
+    :return i, j: two Numpy arrays of particle indices where i[p]<j[p] for the pth pair
+    """
+    if N not in _pairindices:
+        _pairindices[N] = np.triu_indices(N, k=1)
+    return _pairindices[N]
+
+def cutoffshift(Rc, cutoff="truncated"):
+    """
+    Returns the shifts of the pair potential and force at the cutoff radius.
+    The pair potential within the cutoff is V(r) - Vc + (r - Rc)Fc and the pair force is F(r) - Fc, where Vc and Fc are the potential and force at the cutoff for the shifted variants and zero otherwise.
+
+    :param Rc: cutoff radius as a float
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :return: shift of the potential Vc and of the force Fc as floats
+    """
+    if cutoff not in CUTOFFS:
+        raise ValueError("Unknown cutoff " + str(cutoff) + ", must be one of " + ", ".join(CUTOFFS))
+    if cutoff == "truncated":
+        return 0., 0.
+    rc6inv = 1./Rc**6
+    Vc = 4.*rc6inv*(rc6inv - 1.)
+    Fc = 48.*rc6inv*(rc6inv - 0.5)/Rc if cutoff == "forceshifted" else 0.
+    return Vc, Fc
+
+def ljpairterms(rsq, Rc, Vc=0., Fc=0.):
+    """
+    Computes the Lennard-Jones pair potentials and virials r.f of pairs within the cutoff from their squared distances, shifted according to the treatment of the cutoff.
+
+    :param rsq: squared distances of the pairs as a Numpy array
+    :param Rc: cutoff radius as a float, or of every pair as a Numpy array
+    :param Vc: shift of the pair potential at the cutoff as a float, or of every pair as a Numpy array, see cutoffshift
+    :param Fc: shift of the pair force at the cutoff as a float, or of every pair as a Numpy array, see cutoffshift
+    :return: pair potentials, pair virials and inverse squared distances as Numpy arrays
+    """
+    # Powers of 1/r^2 are used so that no square root or float exponent is needed
+    r2inv = 1./rsq
+    r6inv = r2inv*r2inv*r2inv
+    
+    # Pair potential 4(1/r^12 - 1/r^6) and r.f = 48(1/r^12 - 1/(2r^6))
+    pairpotential = 4.*r6inv*(r6inv - 1.)
+    pairvirial = 48.*r6inv*(r6inv - 0.5)
+    
+    # Shifts of the potential and force at the cutoff, the force shift being the only place a distance is needed
+    if np.any(Vc):
+        pairpotential -= Vc
+    if np.any(Fc):
+        r = np.sqrt(rsq)
+        pairpotential += (r - Rc)*Fc
+        pairvirial -= r*Fc
+    return pairpotential, pairvirial, r2inv
+
+def tailcorrection(N, volume, Rc, cutoff="truncated"):
+    """
+    Computes the analytic tail corrections of the energy and pressure of the Lennard-Jones potential truncated at the cutoff radius, assuming a uniform density beyond it.
+    The energy correction holds for the truncated potential only and is zero for the shifted potential, whose energy is by definition that of the pairs within the cutoff.
+    The pressure correction holds for the truncated and shifted potentials, whose forces are the same. Neither holds for the force shifted potential, whose forces differ everywhere.
+
+    :param N: number of particles as an integer
+    :param volume: volume of the box as a float
+    :param Rc: cutoff radius as a float
+    :param cutoff: treatment of the cutoff, "truncated" or "shifted"
+    :return: energy and pressure corrections as floats
+    """
+    cutoffshift(Rc, cutoff)
+    if cutoff == "forceshifted":
+        raise ValueError("There are no tail corrections for the force shifted potential")
+    rho = N/volume
+    rc3inv = 1./Rc**3
+    rc9inv = rc3inv**3
+    energy = 8./3.*math.pi*N*rho*(rc9inv/3. - rc3inv) if cutoff == "truncated" else 0.
+    pressure = 16./3.*math.pi*rho*rho*(2./3.*rc9inv - rc3inv)
+    return energy, pressure
+
+def forcefield(cutoff="truncated"):
+    """
+    Returns the force field function of a treatment of the cutoff, with the arguments and returns of ljpairs, to be given to the integrator
+
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :return: function of (system, boxdim, Rc, neighbours)
+    """
+    cutoffshift(1., cutoff)
+    if cutoff == "truncated":
+        return ljpairs
+    return functools.partial(ljpairs, cutoff=cutoff)
+
+def ljpairs(system,boxdim,Rc,neighbours=None,cutoff="truncated",out=None) :
+    """
+    Computes the Lennard-Jones forces, potentials and virial of the system in a single pass over the particle pairs.
+    The minimum image displacement of every pair is built once in a vectorised way and each pair is only computed once, its force being applied to both particles according to Newton's third law.
+    
+    :param system: ParticleSyst object representing the system of N particles
+    :param boxdim: Box dimensions as an (1,3) Numpy array
+    :param Rc: cutoff radius as a float
+    :param neighbours: neighbour backend with a pairs(system,boxdim,Rc) method such as a CellList instance, all pairs are used if None
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :param out: (N,3) and (N,) Numpy arrays the forces and potentials are written to, such as buffers of a Workspace instance, optionally followed by an (N,) Numpy array
+                the numba kernel over all pairs sums the virial of every particle in, new arrays if None
+    :return force: an (N,3) Numpy array where the ith row is the force experienced by the ith particle
+    :return potential: an (N,1) Numpy array where the ith row is the potential of the ith particle
+    :return virial: sum of r_ij.f_ij over all pairs as a float
+    """
+    N = system.N
+    Vc, Fc = cutoffshift(Rc, cutoff)
+    
+    # Positions are put back in the box once per step by the integrator, the MIC holds for any image
+    position = system.position
+    
+    # Compiled kernels with the numba backend
+    if Backend.usenumba():
+        boxdim = np.asarray(boxdim, dtype=float)
+        force, potential = (np.empty((N,3)), np.empty(N)) if out is None else out[:2]
+        if neighbours is None:
+            virial = out[2] if out is not None and len(out) > 2 else np.empty(N)
+            return Backend.ljallpairs(position, boxdim, Rc, Vc, Fc, force, potential, virial)
+        i, j = neighbours.pairs(system, boxdim, Rc)
+        # Chunks of pairs with per-thread accumulators when numba runs on several threads
+        if Backend.numba.get_num_threads() == 1:
+            return Backend.ljpairlistserial(position, boxdim, Rc, i, j, Vc, Fc, force, potential)
+        return Backend.ljpairlist(position, boxdim, Rc, i, j, Vc, Fc, force, potential, Backend.accumulators(N))
+    
+    # Candidate pairs from the neighbour backend, or every pair
+    if neighbours is None:
+        i, j = allpairs(N)
+    else:
+        i, j = neighbours.pairs(system, boxdim, Rc)
+    
+    return ljkernel(position, boxdim, Rc, i, j, Vc, Fc, out)
+
+def ljkernel(position, boxdim, Rc, i, j, Vc=0., Fc=0., out=None) :
+    """
+    Computes the Lennard-Jones forces, potentials and virial from a list of pairs of particles, each pair being computed once.
+    
+    :param position: positions of the N particles inside the box as an (N,3) Numpy array
+    :param boxdim: Box dimensions as an (1,3) Numpy array
+    :param Rc: cutoff radius as a float
+    :param i: first particle of every pair as a Numpy array
+    :param j: second particle of every pair as a Numpy array
+    :param Vc: shift of the pair potential at the cutoff as a float, see cutoffshift
+    :param Fc: shift of the pair force at the cutoff as a float, see cutoffshift
+    :param out: (N,3) and (N,) Numpy arrays the forces and potentials are written to, and possibly further arrays which are not used here, new arrays if None.
+                The per-pair temporaries of this vectorised kernel are allocated on every call, only the numba kernels work without any allocation.
+    :return force: an (N,3) Numpy array where the ith row is the force experienced by the ith particle
+    :return potential: an (N,1) Numpy array where the ith row is the potential of the ith particle
+    :return virial: sum of r_ij.f_ij over the pairs as a float
+    """
+    # The pair terms are computed in the precision of the positions, and summed over the pairs in double precision by bincount and sum
+    N = len(position)
+    
+    # Minimum image vector separation of every pair
+    rvec = PBC.MIC(position[i] - position[j], boxdim)
+    rsq = np.einsum("ij,ij->i", rvec, rvec)
+    
+    # Cutoff radius condition
+    inside = rsq < Rc*Rc
+    i = i[inside]
+    j = j[inside]
+    rvec = rvec[inside]
+    
+    pairpotential, pairvirial, r2inv = ljpairterms(rsq[inside], Rc, Vc, Fc)
+    fvec = (pairvirial*r2inv)[:,np.newaxis]*rvec
+    
+    # Add the pair force to particle i and its opposite to particle j
+    force, potential = (np.empty(shape=(N,3)), np.empty(N)) if out is None else out[:2]
+    for k in range(0,3):
+        np.subtract(np.bincount(i, fvec[:,k], minlength=N), np.bincount(j, fvec[:,k], minlength=N), out=force[:,k])
+    
+    # Every pair potential contributes to the potential of both particles
+    np.add(np.bincount(i, pairpotential, minlength=N), np.bincount(j, pairpotential, minlength=N), out=potential)
+    
+    return force, potential, np.sum(pairvirial, dtype=np.float64)
+
+def ljforce(system,boxdim,Rc,neighbours=None,cutoff="truncated") :
     """
     Computes the Lennard-Jones force acting on each particle in the system as an (N,3) Numpy array.
 	
     :param system: ParticleSyst object representing the system of N particles
     :param boxdim: Box dimensions as an (1,3) Numpy array
     :param Rc: cutoff radius as a float
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
     :return force: an (N,3) Numpy array where the ith row is the force experienced by the ith particle
     """
-    # Create force array with initial condition of 0.0 force everywhere
-    force = np.zeros(shape=(system.N,3))
-    
-    # Compute force on ith particle
-    for i in range (0,system.N):
-        # Compute vector separation and magnituge of vector separation (both arrays)
-        r = P.sepmag(system,boxdim,i)
-        rvec = P.MICvecsep(system,boxdim,i)
-        
-        # Compute with respect to jth particle
-        for j in range(0,system.N):
-            # Not computing force particle has on itself
-            if i !=j :
-                # Cutoff radius condition
-                if r[j]<Rc:
-                    for k in range(0,3):
-                        force[i,k] += 48.*(1./(r[j]**14.) + 1./(2.*r[j]**8.))*rvec[j,k]
-                else:
-                    pass
-            else:
-                pass
-    return force
+    return ljpairs(system,boxdim,Rc,neighbours,cutoff)[0]
 	
-def ljpotential(system,boxdim,Rc) :
+def ljpotential(system,boxdim,Rc,neighbours=None,cutoff="truncated") :
     """
     Computes the Lennard-Jones potential of each particle in the system as an (N,1) Numpy array.
     
     :param system: ParticleSyst object representing the system of N particles
     :param boxdim: Box dimensions as a (1,3) Numpy array
     :param Rc: cutoff radius
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
     :return force: an (N,1) Numpy array where the ith row is the potential of the ith particle
     """
-    
-    # Create potential array with initial condition of 0.0 potential on each particle
-    potential = np.zeros(shape=(system.N))
-    
-    # Compute potential of ith particle
-    for i in range (0,system.N):
-        # Compute magnituge of vector separation with respect to all particles
-        r = P.sepmag(system,boxdim,i)
-        
-        # Compute potential with respect to jth particle
-        for j in range(0,system.N):
-            # Not computing potential from itself
-            if i !=j :
-                # Cutoff radius condition
-                if r[j]<Rc:
-                    potential[i]+= 4.*(1./(r[j]**12.) - 1./(r[j]**6.))
-                else:
-                    pass
-            else:
-                pass
-    return potential
-
-def totPE(system, boxdim, Rc):
+    return ljpairs(system,boxdim,Rc,neighbours,cutoff)[1]
+
+def totPE(system, boxdim, Rc, neighbours=None, cutoff="truncated"):
     """
     Computes the total potential energy of the system according to the Lennard-Jones potential.
     
     :param system: ParticleSyst object representing the system of N particles
     :param boxdim: Box dimensions
     :param Rc: cutoff radius
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
     :return totalPE: a float representing the potential of the system
     """
     # Compute the potential of each individual particle
-    potential = ljpotential(system,boxdim,Rc)
-    
-    # Set initial potential as a float
-    doubletotalPE = 0.0
+    potential = ljpotential(system,boxdim,Rc,neighbours,cutoff)
     
-    # Add all potentials
-    for i in range(0,system.N):
-        doubletotalPE += potential[i]
     # Every interaction is counted twice so must divide potential calculated by 2
-    return doubletotalPE/2.0
+    return np.sum(potential)/2.0
 
- 
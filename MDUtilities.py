@@ -2,137 +2,106 @@
 CompMod Project B: auxiliary MD methods
 
 Modified 21/02/2017 by Cara Lynch to be used with ParticleSyst instances.
+Lattices and velocities are generated with whole array operations, the velocities from a seeded numpy.random.Generator.
 """
 
-import random
 import numpy as np
 
-def setInitialPositions(rho, syst):
-    
+# Fractional coordinates of the particles in the cubic unit cell of every lattice
+LATTICES = {
+    "sc": np.array([[0.0, 0.0, 0.0]]),
+    "bcc": np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]]),
+    "fcc": np.array([[0.0, 0.0, 0.0], [0.5, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.5]]),
+}
+
+
+def lattice(cells, spacing, kind="fcc"):
+    """
+    Generates the sites of a lattice of unit cells replicated along each axis.
+    The sites are ordered by unit cell, x slowest and z fastest, then by site within the unit cell.
+
+    :param cells: number of unit cells along each axis as an integer or a sequence of 3 integers
+    :param spacing: side of the unit cell as a float, or along each axis as a sequence of 3 floats
+    :param kind: type of lattice, "sc", "bcc" or "fcc"
+    :return: positions of the sites as an (M,3) Numpy array and box dimensions as a (1,3) Numpy array
     """
-    Sets the initial positions of the particles in a system.
-    
+    if kind not in LATTICES:
+        raise ValueError("Unknown lattice " + str(kind) + ", must be one of " + ", ".join(LATTICES))
+    cells = np.broadcast_to(np.asarray(cells, dtype=int), (3,))
+    spacing = np.broadcast_to(np.asarray(spacing, dtype=float), (3,))
+
+    # Corner of every unit cell plus every site of the unit cell
+    corners = np.indices(cells).reshape(3, -1).T
+    sites = (corners[:,np.newaxis,:] + LATTICES[kind][np.newaxis,:,:]).reshape(-1, 3)
+
+    return sites*spacing, cells*spacing
+
+def setInitialPositions(rho, syst, kind="fcc", cells=None):
+
+    """
+    Sets the initial positions of the particles in a system on a lattice.
+    By default the box is a cube with the smallest number of unit cells along each axis that holds all particles.
+    With cells, the box holds that number of cubic unit cells along each axis, so that it can be non-cubic.
+
     :param rho: density of the system as a float
     :param syst: N body system represented as a ParticleSyst object
+    :param kind: type of lattice, "sc", "bcc" or "fcc"
+    :param cells: number of unit cells along each axis as a sequence of 3 integers, or None for a cubic box
     :return: size of the box as a (1,3) Numpy array
     """
     # Determine number of particles
     nAtoms = syst.N
-    
-    # Set box dimensions
-    boxSize = (nAtoms/rho)**(1./3.)
-    
-    # Number or particles in each direction
-    nDim = int(float((nAtoms-1)/4.0)**(1./3.))+1
-    
-    # Give warning if fcc lattice will not be fully occupied
-    if 4*nDim**3 != nAtoms:
-        print("Atoms will not fill a fcc lattice completely.\n")
-    
-    # Separation between particles
-    delta = boxSize / nDim
-    
-    # Set particle positions
-    iAtom = 0
-    for ix in range(nDim):
-        for iy in range(nDim):
-            for iz in range(nDim):
-                if iAtom<nAtoms:
-                    pos = np.array([ix*delta, iy*delta, iz*delta])
-                    for j in range(0,3):
-                        syst.position[iAtom,j] = pos[j]
-                    iAtom += 1
-                if iAtom<nAtoms:
-                    pos = np.array([(ix+0.5)*delta, (iy+0.5)*delta, iz*delta])
-                    for j in range(0,3):
-                        syst.position[iAtom,j] = pos[j]
-                    iAtom += 1
-                if iAtom<nAtoms:
-                    pos = np.array([(ix+0.5)*delta, iy*delta, (iz+0.5)*delta])
-                    for j in range(0,3):
-                        syst.position[iAtom,j] = pos[j]
-                    iAtom += 1
-                if iAtom<nAtoms:
-                    pos = np.array([ix*delta, (iy+0.5)*delta, (iz+0.5)*delta])
-                    for j in range(0,3):
-                        syst.position[iAtom,j] = pos[j]
-                    iAtom += 1
-    
+    nBasis = len(LATTICES[kind])
+
+    # Number of unit cells in each direction
+    if cells is None:
+        nDim = int(float((nAtoms-1)/nBasis)**(1./3.))+1
+        cells = (nDim, nDim, nDim)
+
+    # Give warning if lattice will not be fully occupied
+    if nBasis*np.prod(cells) < nAtoms:
+        raise ValueError("A " + kind + " lattice of " + str(tuple(cells)) + " unit cells has fewer sites than " + str(nAtoms) + " atoms")
+    if nBasis*np.prod(cells) != nAtoms:
+        print("Atoms will not fill a " + kind + " lattice completely.\n")
+
+    # Side of the unit cell giving the density
+    delta = (nAtoms/(rho*np.prod(cells)))**(1./3.)
+
+    # Set particle positions on the first sites of the lattice
+    sites, boxdim = lattice(cells, delta, kind)
+    syst.position[:] = sites[:nAtoms]
+
     # Some output
-    print("{0:d} atoms placed on a face-centered cubic lattice.\n".format(nAtoms))
-    print("Box dimensions: {0:f} {0:f} {0:f}\n".format(boxSize))
-    
-    # Return the box size as Vector3D object
-    return(np.array([boxSize, boxSize, boxSize]))
-    
-def setInitialVelocities(temp, syst):
+    print("{0:d} atoms placed on a {1:s} lattice.\n".format(nAtoms, kind))
+    print("Box dimensions: {0:f} {1:f} {2:f}\n".format(*boxdim))
+
+    return boxdim
+
+def setInitialVelocities(temp, syst, seed=None):
     """
-    Sets the intial velocities of the particles in a system.
-    
+    Sets the intial velocities of the particles in a system from the Maxwell-Boltzmann distribution, with no centre-of-mass motion and rescaled to the exact temperature.
+
     :param temp: temperature of system
     :param syst: system of N particles represented as a ParticleSyst instance
+    :param seed: seed of the random velocities as an integer or a numpy.random.Generator, a different seed every run if None
+    :return: numpy.random.Generator instance used
     """
-    # Determine number of particles
-    nAtoms = syst.N
-    print(nAtoms)
-    # Zero the accumulators
-    xv0 = 0.0
-    yv0 = 0.0
-    zv0 = 0.0
-    vsq = 0.0
-    
-    # Loop over particles, set velocities
-    for i in range(nAtoms):
-        # Random inital velocities
-        xvt = random.random() - 0.5
-        syst.velocity[i,0] = xvt
-        
-        yvt = random.random() - 0.5
-        syst.velocity[i,1] = yvt
-        
-        zvt = random.random() - 0.5
-        syst.velocity[i,2] = zvt
-        
-        # Add to total velocity
-        xv0 += xvt
-        yv0 += yvt
-        zv0 += zvt
-        vsq += xvt**2 + yvt**2 + zvt**2
-        
-    # Centre-of-mass motion
-    xv0 /= nAtoms
-    yv0 /= nAtoms
-    zv0 /= nAtoms
-    
-    # Boltzmann factor
-    kB = (3*nAtoms*temp/vsq)**(1./2.)
-    
-    # Zero the probe accumulators
-    xv0Tot = 0.0
-    yv0Tot = 0.0
-    zv0Tot = 0.0
-    v0sq = 0.0
-    
-    # Rescale all velocities
-    for i in range(nAtoms):
-        vtempx = syst.velocity[i,0]
-        xvt = kB*(vtempx - xv0)
-        syst.velocity[i,0] = xvt     
-
-        vtempy = syst.velocity[i,1]
-        yvt = kB*(vtempy - yv0)
-        syst.velocity[i,1] = yvt
-        
-        vtempz = syst.velocity[i,2]
-        zvt = kB*(vtempz - zv0)
-        syst.velocity[i,2] = zvt
-        
-        xv0Tot += xvt
-        yv0Tot += yvt
-        zv0Tot += zvt
-        v0sq += xvt**2 + yvt**2 + zvt**2
-    
+    generator = np.random.default_rng(seed)
+
+    # Random initial velocities from the Maxwell-Boltzmann distribution
+    velocity = generator.normal(0.0, np.sqrt(temp/syst.mass), (syst.N, 3))
+
+    # Remove centre-of-mass motion
+    velocity -= np.mean(velocity, axis=0)
+
+    # Rescale to the temperature, which is 2/3 of the kinetic energy per particle
+    vsq = np.einsum("ij,ij->", velocity, velocity)
+    if vsq > 0.0:
+        velocity *= np.sqrt(3*syst.N*temp/(syst.mass*vsq))
+    syst.velocity[:] = velocity
+
     # Output
     print("Temperature = {0:f}\n".format(temp))
-    print("Centre-of-mass velocity = {0:f} {1:f} {2:f}\n".format(xv0Tot/nAtoms, yv0Tot/nAtoms, zv0Tot/nAtoms))
-    
+    print("Centre-of-mass velocity = {0:f} {1:f} {2:f}\n".format(*np.mean(velocity, axis=0)))
+
+    return generator
@@ -0,0 +1,114 @@
+"""
+Mean Squared Displacement Module
+
+Tracks the mean squared displacement of the particles from their unwrapped positions, recovered from the box images counted by PBC.PBCpos, so that the MSD does not saturate at the box size.
+The MSD can also be averaged over all time origins of the run with an FFT based estimator.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+
+
+def unwrapped(syst, boxdim):
+    """
+    Computes the positions of the particles without the periodic boundary conditions
+
+    :param syst: ParticleSyst instance
+    :param boxdim: box dimensions as a (1,3) Numpy array
+    :return: unwrapped positions as an (N,3) Numpy array
+    """
+    return syst.position + syst.image*boxdim
+
+def fftmsd(frames):
+    """
+    Computes the MSD averaged over all time origins of a series of unwrapped positions, in O(T log T) per particle with FFTs.
+    MSD(m) = S1(m) - 2 S2(m) where S2 is the autocorrelation of the positions and S1 is built recursively from their squares.
+
+    :param frames: unwrapped positions at T equally spaced times as a (T,N,3) Numpy array
+    :return: MSD at every lag from 0 to T-1 frames as a Numpy array of length T
+    """
+    T = len(frames)
+    lags = T - np.arange(T)
+
+    # Autocorrelation of every particle and coordinate, zero padded to avoid circular correlation
+    transform = np.fft.rfft(frames, n=2*T, axis=0)
+    S2 = np.sum(np.fft.irfft(transform*np.conj(transform), axis=0)[:T], axis=2)/lags[:,np.newaxis]
+
+    # Squared positions summed over the coordinates
+    D = np.sum(frames*frames, axis=2)
+    D = np.concatenate((D, np.zeros((1,D.shape[1]))))
+    S1 = np.empty((T,D.shape[1]))
+    Q = 2.*np.sum(D, axis=0)
+    for m in range(T):
+        Q = Q - D[m-1] - D[T-m]
+        S1[m] = Q/lags[m]
+
+    return np.mean(S1 - 2.*S2, axis=1)
+
+
+class MSDTracker(object):
+
+    def __init__(self, syst, boxdim, store=False):
+        """
+        Initialise an MSDTracker instance from the current positions of the system
+
+        :param syst: ParticleSyst instance
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param store: keep the unwrapped positions of every sample to compute the multiple time origin MSD
+        """
+        self.initial = unwrapped(syst, boxdim)
+        self.store = store
+        self.frames = []
+
+    def __str__(self):
+        """
+        Print the number of particles and stored samples
+
+        :param MSDTracker: MSDTracker instance
+        :return: string with the number of particles and samples
+        """
+        return "MSDTracker of " + str(len(self.initial)) + " particles with " + str(len(self.frames)) + " stored samples"
+
+    def sample(self, syst, boxdim):
+        """
+        Computes the mean squared displacement of the particles from their initial positions
+
+        :param MSDTracker: MSDTracker instance
+        :param syst: ParticleSyst instance
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :return: MSD as a float
+        """
+        position = unwrapped(syst, boxdim)
+        if self.store:
+            self.frames.append(position)
+        displacement = position - self.initial
+        return np.einsum("ij,ij->", displacement, displacement)/len(displacement)
+
+    def multiorigin(self):
+        """
+        Computes the MSD averaged over all time origins of the stored samples
+
+        :param MSDTracker: MSDTracker instance
+        :return: MSD at every lag, in number of samples, as a Numpy array
+        """
+        return fftmsd(np.array(self.frames))
+
+    def state(self):
+        """
+        Returns the initial positions and stored samples, to be saved in a checkpoint
+
+        :param MSDTracker: MSDTracker instance
+        :return: dictionary of Numpy arrays
+        """
+        return {"initial": self.initial, "frames": np.array(self.frames).reshape(-1, len(self.initial), 3)}
+
+    def restore(self, state):
+        """
+        Restores the initial positions and stored samples saved in a checkpoint
+
+        :param MSDTracker: MSDTracker instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        self.initial = np.copy(state["initial"])
+        self.frames = list(np.copy(state["frames"])) if self.store else []
@@ -7,37 +7,31 @@ Cara Lynch
 """
 
 import matplotlib.pyplot as pyplot
+import numpy as np
 
-def plot(fileName,name):
+def plot(fileName,name,prefix=None,show=True):
     """
     Plots MSD as a function of time
     
     :param fileName: name of file with MSD data as a string
     :param name: name of system as a string
+    :param prefix: path and name the figure is saved under, the name of the system if None
+    :param show: show the figure, otherwise it is only saved
     """
     
-    # Set up data lists for plotting MSD
-    dtValue = []
-    MSDValue = []
-    
-    # Open MSD file for reading
-    Infile = open(fileName, "r")
-    lines = Infile.readlines()
-    numstep = len(lines)
-
-    # Start loop to append values to data lists
-    for i in range(0,numstep):
-        data = lines[i].split()
-        dtValue.append(data[0])
-        MSDValue.append(data[1])
+    # Read the timestep numbers and MSD values
+    data = np.loadtxt(fileName, ndmin=2)
+    dtValue = data[:,0]
+    MSDValue = data[:,1]
     
     # Plot graph of MSD vs timestep number
+    pyplot.figure()
     pyplot.plot(dtValue,MSDValue, "g")
     pyplot.title("Mean Squared Distance over time for a " + str(name))
     pyplot.xlabel("Time step number")
     pyplot.ylabel("MSD ")
-    pyplot.savefig(str(name)+'MSDevolution')
-    pyplot.show()
-
-
-
+    pyplot.savefig(str(name if prefix is None else prefix)+'MSDevolution')
+    if show:
+        pyplot.show()
+    else:
+        pyplot.close()
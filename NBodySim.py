@@ -5,6 +5,8 @@ Simulates an N-body system of particles interacting through the Lennard-Jones pa
 
 Outputs radial distribution function, mean squared distance and energy over time.
 
+Run as a script it prompts for the input file, or takes it as command line argument. The simulation itself is the simulate function, which Batch.py calls for every run of a sweep.
+
 Created on Tue Feb 28 13:18:18 2017
 
 Author: Cara Lynch, Marina Ruiz Sanchez-Oro
@@ -16,199 +18,389 @@ import VelVerlet as vv
 import MDUtilities as md
 import histogram as hist
 import numpy as np
-import random
+import os
+import sys
 import LennardJones as lj
 import time as systime
 import MSDplot as MSDplot
+import Observables as obs
+import Trajectory as traj
+import OutputWriter as out
+import MSD as msd
+import Checkpoint as ckpt
+import Thermostat as th
+import Timing as tm
+import cProfile
+import pstats
+from CellList import CellList
+from VerletList import VerletList
+from ParallelForce import ParallelForce
+
+
+def readinput(fileName):
+    """
+    Reads the simulation parameters from an input file in format:
+    [name of system] [number of particles] [temperature] [density]
+    [cutoff radius] [number of steps]
+
+    :param fileName: name of the input file as a string
+    :return: name, number of particles, temperature, density, cutoff radius and number of steps
+    """
+    # Open file for reading
+    with open(fileName, "r") as file:
+        lines = file.readlines()
+    line0 = lines[0].split()
+    line1 = lines[1].split()
+
+    # Extract simulation parameters
+    name = str(line0[0]) #name of system
+    N = int(line0[1]) # number of particles
+    temp = float(line0[2]) # temperature
+    rho = float(line0[3]) # density
+    r_c = float(line1[0]) # LJ cutoff radius
+    numstep = int(line1[1]) # number of steps
+    # dt = float(line1[2]) # timestep
+
+    return name, N, temp, rho, r_c, numstep
+
+def plotenergy(tValue, KEValue, PEValue, totEValue, name, prefix=None, show=True):
+    """
+    Plots the kinetic, potential and total energy against the timestep number
+
+    :param tValue: timestep numbers as a list
+    :param KEValue: kinetic energies as a list
+    :param PEValue: potential energies as a list
+    :param totEValue: total energies as a list
+    :param name: name of system as a string
+    :param prefix: path and name the figure is saved under, the name of the system if None
+    :param show: show the figure, otherwise it is only saved
+    """
+    pyplot.figure()
+    pyplot.plot(tValue,totEValue, "g", label="Total Energy")
+    pyplot.plot(tValue, KEValue, "r", label = "Kinetic Energy")
+    pyplot.plot(tValue, PEValue, "b", label = "Potential Energy")
+    pyplot.legend()
+    pyplot.title("Energy over timesteps")
+    pyplot.xlabel("Time step number")
+    pyplot.ylabel("Energy ")
+    pyplot.savefig(str(name if prefix is None else prefix)+'Energyevolution')
+    if show:
+        pyplot.show()
+    else:
+        pyplot.close()
+
+def simulate(fileName, outdir=None, dt=0.01, skin=0.3, workers=1, trajectoryformat="dcd", msdmultiorigin=False, seed=None, checkpointinterval=1000, cutoff="truncated", tail=False, respa=1, rinner=2.0, thermostat=None, tau=0.1, pressure=None, taup=1.0, precision="double", profile=False, plot=True, show=True):
+    """
+    Runs a simulation from an input file or restarts it from a checkpoint, writing the output files to a directory.
+    The settings of a restarted run are the ones saved in the checkpoint.
+
+    :param fileName: name of the input file, or of a checkpoint file (.npz) to restart from, as a string
+    :param outdir: directory of the output files as a string, the directory of the checkpoint for a restarted run and the current directory otherwise if None
+    :param dt: timestep as a float
+    :param skin: skin distance of the Verlet neighbour list as a float
+    :param workers: number of worker processes for the force evaluation, 1 to compute the forces in this process
+    :param trajectoryformat: trajectory format: "dcd" (binary, for VMD), "npy" (Numpy memory map) or "xyz" (text, for VMD)
+    :param msdmultiorigin: also compute the MSD averaged over all time origins, which stores the unwrapped positions of every sample
+    :param seed: seed of the random initial velocities, None for different velocities every run
+    :param checkpointinterval: number of timesteps between checkpoints, 0 for no checkpoints
+    :param cutoff: treatment of the cutoff radius: "truncated", "shifted" (potential shifted to zero at the cutoff) or "forceshifted" (potential and force shifted to zero at the cutoff)
+    :param tail: add the analytic tail corrections of the pairs beyond the cutoff to the pressure, and to the potential energy of the truncated potential, not allowed with the force shifted potential
+    :param respa: number of short range steps per timestep of the r-RESPA integrator, which evaluates the forces beyond rinner only once per timestep, 1 for velocity Verlet
+    :param rinner: inner radius of the r-RESPA integrator as a float
+    :param thermostat: thermostat keeping the system at the input temperature: "berendsen", "nosehoover" or "langevin", None for constant energy
+    :param tau: relaxation time of the thermostat as a float
+    :param pressure: target pressure of the Berendsen barostat as a float, None for a constant volume
+    :param taup: relaxation time of the barostat as a float
+    :param precision: "double", or "mixed" to store the positions and velocities and compute the pair terms in single precision, with the forces and energies accumulated in double precision
+    :param profile: profile the main loop with cProfile, writing the statistics to [name of system]profile.out and printing the 20 functions with the largest cumulative time
+    :param plot: plot the MSD, RDF and energies
+    :param show: show the plots, otherwise they are only saved
+    :return: summary of the run as a dictionary of the parameters, averages of the observables, drift of the total energy per particle, final MSD and time taken
+    """
+    # Will be used to indicate time taken to complete simulation
+    starttime = systime.perf_counter()
+
+    if tail and cutoff == "forceshifted":
+        raise ValueError("There are no tail corrections for the force shifted potential")
+
+    # Restart from a checkpoint, which holds the simulation parameters and the full state of the run
+    restart = fileName.endswith(".npz")
+
+    if restart:
+        state = ckpt.load(fileName)
+        parameters = ckpt.parameters(state)
+        name = parameters["name"]
+        N = parameters["N"]
+        temp = parameters["temp"]
+        rho = parameters["rho"]
+        r_c = parameters["r_c"]
+        numstep = parameters["numstep"]
+        dt = parameters["dt"]
+        seed = parameters["seed"]
+        skin = parameters["skin"]
+        workers = parameters["workers"]
+        trajectoryformat = parameters["trajectoryformat"]
+        msdmultiorigin = parameters["msdmultiorigin"]
+        checkpointinterval = parameters["checkpointinterval"]
+        cutoff = parameters.get("cutoff", "truncated")
+        tail = parameters.get("tail", False)
+        respa = parameters.get("respa", 1)
+        rinner = parameters.get("rinner", 2.0)
+        thermostat = parameters.get("thermostat")
+        tau = parameters.get("tau", 0.1)
+        pressure = parameters.get("pressure")
+        taup = parameters.get("taup", 1.0)
+        precision = parameters.get("precision", "double")
+
+        # System, box and random number generators as they were at the checkpoint
+        System, boxdim = ckpt.restoresystem(state)
+        System.setprecision(precision)
+        start = int(state["step"]) + 1
 
-# Input file name from command line
-fileName = str(input("File name: "))
-
-# Will be used to indicate time taken to complete simulation
-systime.clock()
-
-# Option to input timestep if needed
-# dt = float(input("timestep: "))
-
-# Ideal timestep found
-dt = 0.01
-
-# Open file for reading 
-file = open(fileName, "r")
-lines = file.readlines()
-line0 = lines[0].split()
-line1 = lines[1].split()
-
-# Extract simulation parameters
-name = str(line0[0]) #name of system
-N = int(line0[1]) # number of particles
-temp = float(line0[2]) # temperature
-rho = float(line0[3]) # density
-r_c = float(line1[0]) # LJ cutoff radius
-numstep = int(line1[1]) # number of steps
-# dt = float(line1[2]) # timestep
-
-
-
-
-# Set additional parameters
-m = 1.0 # Mass of particles
-
-# Create system file which will be used to create a ParticleSyst instance
-systemFile = open("system.in", "w")
-systemFile.write(name + " " + str(N) + " " + str(m) + "\n")
-for i in range (0, N):
-    label = "p" + str(i)
-    systemFile.write(str(label) +  " 0.0 0.0 0.0 0.0 0.0 0.0 \n")
-systemFile.close()
-
-# Create ParticleSyst instance
-System = P.createsystem("system.in")
-
-# Initialise with MDUtilities
-boxdim = md.setInitialPositions(rho, System)
-md.setInitialVelocities(temp, System)
-
-k = 0 # timestep number
-
-# Open output files 
-VMDfile = open(str(name)+"VMD.xyz", "w") # VMD trajectory information
-RDFfile = open(str(name)+"rdf.out", "w") # radial distribution function information
-MSDfile = open(str(name)+"msd.out","w") # mean squared displacement information 
-Energyfile = open(str(name)+"energy.out","w") # energy fluctuations in format: Kinetic Potential Total
-
-# Save initial positions of particles to an array to compute the MSD
-initialpositions = System.position
-
-# Set up data lists for plotting energy
-tValue = [0]
-KEValue = [P.kineticEnergy(System)]
-PEValue = [lj.totPE(System,boxdim,r_c)]
-totEValue = [vv.totE(System, boxdim, r_c)]
-             
-# Write initial energy values to file
-Energyfile.write("0 " + str.format("{0:.4f}",P.kineticEnergy(System)) + " "  + str.format("{0:.4f}",lj.totPE(System,boxdim,r_c)) + " " + str.format("{0:.4f}",vv.totE(System, boxdim, r_c)) + "\n")
-
-# Print system time at beginning of loop
-print(str(systime.strftime("%H:%M:%S") + " - " + " 0% of loop completed"))
-
-# Start time integration loop
-for i in range(1, numstep):
-    
-    # Perform VV time integration
-    vv.VelVerlet(dt, System, boxdim, r_c)
-    force = lj.ljforce(System,boxdim,r_c)
-    
-    # For a small enough number of steps, get Energy, RDF and MSD data for every step
-    if numstep <= 1000:
-        # Output trajectory information for VMD file
-        trajectory = P.printVMD(System, k)
-        VMDfile.write(trajectory)
-        
-        # Output energy information for energy file
-        tValue.append(i)
-        KEValue.append(P.kineticEnergy(System))
-        PEValue.append(lj.totPE(System,boxdim,r_c))
-        totEValue.append(vv.totE(System, boxdim, r_c))
-    
-        Energyfile.write(str(i) + " " + str.format("{0:.4f}",P.kineticEnergy(System)) + " "  + str.format("{0:.4f}",lj.totPE(System,boxdim,r_c)) + " " + str.format("{0:.4f}",vv.totE(System, boxdim, r_c)) + "\n")
-        
-        # RDF histogram and MSD calculation
-        for l in range(0, System.N):
-        
-            # Output radial distances for RDF
-            hist.particledistances(System, RDFfile,boxdim,l)
-            
-            # MSD calculation
-            displacementarray = System.position - initialpositions
-        
-        MSDtimesN = 0.0
-        # Sum over all squared displacements
-        for m in range(0, System.N):
-            MSDtimesN += np.inner(displacementarray[m],displacementarray[m])
-        
-        # Divide by N
-        MSD = MSDtimesN/System.N
-            
-        # Add to MSD file with format: timestep MSD
-        MSDfile.write(str(i)+ " " + str.format("{0:.4f}",MSD) + "\n")
-        
-    # For a large number of steps, only get Energy, RDF and MSD data every 4th step
     else:
-        if i%5.0 == 0:
-            
-            # Output trajectory information for VMD file
-            trajectory = P.printVMD(System, k)
-            VMDfile.write(trajectory)
-
-            
-            # Output energy information for energy file
-            tValue.append(i)
-            KEValue.append(P.kineticEnergy(System))
-            PEValue.append(lj.totPE(System,boxdim,r_c))
-            totEValue.append(vv.totE(System, boxdim, r_c))
-    
-            Energyfile.write(str(i) + " " + str.format("{0:.4f}",P.kineticEnergy(System)) + " "  + str.format("{0:.4f}",lj.totPE(System,boxdim,r_c)) + " " + str.format("{0:.4f}",vv.totE(System, boxdim, r_c)) + "\n")
-            
-            # RDF histogram and MSD calculation
-            for l in range(0, System.N):
-        
-                # Output radial distances for RDF
-                hist.particledistances(System, RDFfile,boxdim,l)
-                
-                # MSD calculation
-                displacementarray = System.position - initialpositions
-        
-            MSDtimesN = 0.0
-            # Sum over all squared displacements
-            for m in range(0, System.N):
-                MSDtimesN += np.inner(displacementarray[m],displacementarray[m])
-            # Divide by N
-            MSD = MSDtimesN/System.N
-            
-            # Add to MSD file with format: timestep MSD
-            MSDfile.write(str(i)+ " " + str.format("{0:.4f}",MSD) + "\n")
-            
-        else:
-            pass
-    
+        name, N, temp, rho, r_c, numstep = readinput(fileName)
 
-    # Increase timestep number tracker
-    k += 1
-    
-    # Give percentage of completion of simulation every 5%
-    if i%(numstep/20.0) == 0:
-        print(str(systime.strftime("%H:%M:%S") + " - " + str(int(i*100/numstep)) + "% of loop completed"))
+        # Set additional parameters
+        m = 1.0 # Mass of particles
 
-# Close output files    
-VMDfile.close()
-RDFfile.close()
-MSDfile.close()
-Energyfile.close()
+        # Create ParticleSyst instance of N particles at rest, labelled p0 to p(N-1)
+        System = P.fromarrays(name, np.zeros((N,3)), mass=m, precision=precision)
 
-print(str(systime.strftime("%H:%M:%S") + " - 100% of loop completed"))
+        # Initialise with MDUtilities
+        boxdim = md.setInitialPositions(rho, System)
+        md.setInitialVelocities(temp, System, seed)
+        start = 1
 
-# Indicate simulation time before graph plotting
-print("It took "+ str(systime.clock()) + " seconds to compute the time evolution of an " + str(N) + " body system over " + str(numstep) + " steps")
+        # Simulation parameters saved with every checkpoint
+        parameters = {"name": name, "N": N, "temp": temp, "rho": rho, "r_c": r_c, "numstep": numstep, "dt": dt, "seed": seed, "skin": skin, "workers": workers,
+                      "trajectoryformat": trajectoryformat, "msdmultiorigin": msdmultiorigin, "checkpointinterval": checkpointinterval,
+                      "cutoff": cutoff, "tail": tail, "respa": respa, "rinner": rinner,
+                      "thermostat": thermostat, "tau": tau, "pressure": pressure, "taup": taup, "precision": precision}
 
+    # Output files are named after the system, in the output directory
+    if outdir is None:
+        outdir = os.path.dirname(fileName) if restart else "."
+    os.makedirs(outdir or ".", exist_ok=True)
+    prefix = os.path.join(outdir, str(name))
 
-# plot graph of mean squared distance evolution (MSD)
-MSDplot.plot(str(name)+"msd.out",name)
+    # Checkpoint file, overwritten at every checkpoint
+    checkpointFile = prefix+"checkpoint.npz"
 
-    
-# Histogram for RDF function
-hist.histogram(str(name)+"rdf.out",name, System, rho)
+    # Number of timesteps between samples of the outputs
+    interval = 1 if numstep <= 1000 else 5
 
+    # Timers of the phases of the main loop: force, neighbours, integrate, wrap, sample and io
+    timers = tm.PhaseTimers()
 
-# plot graph of energy fluctuations
-pyplot.plot(tValue,totEValue, "g", label="Total Energy")
-pyplot.plot(tValue, KEValue, "r", label = "Kinetic Energy")
-pyplot.plot(tValue, PEValue, "b", label = "Potential Energy")
-pyplot.legend()
-pyplot.title("Energy over timesteps")
-pyplot.xlabel("Time step number")
-pyplot.ylabel("Energy ")
-pyplot.savefig(str(name)+'Energyevolution')
-pyplot.show()
+    # Verlet neighbour list built with a cell list, which falls back to all pairs if the box is smaller than 3 list radii
+    neighbours = VerletList(skin, CellList(), timers)
 
+    # Lennard-Jones forces with the chosen cutoff treatment, in parallel across a pool of worker processes
+    forcefield = ParallelForce(N, workers, cutoff) if workers > 1 else lj.forcefield(cutoff)
 
+    # Velocity Verlet integrator carrying the forces over between steps, or r-RESPA with respa short range steps per timestep
+    if respa > 1:
+        integrator = vv.RESPA(System, boxdim, r_c, neighbours, forcefield, rinner, respa, skin=skin, timers=timers)
+    else:
+        integrator = vv.VelocityVerlet(System, boxdim, r_c, neighbours, forcefield, timers)
+
+    # Thermostat and barostat wrapped around the integrator, the barostat scaling boxdim in place, with random forces of the Langevin thermostat drawn from their own stream
+    integrator = th.ensemble(integrator, thermostat, temp, tau, pressure, taup, None if seed is None else (seed, 1), tail, cutoff)
+
+    k = start - 1 # timestep number
+
+    # Open output files, a restarted run drops the lines written after the checkpoint and appends to them
+    if restart:
+        ckpt.truncate(prefix+"msd.out", k)
+        ckpt.truncate(prefix+"energy.out", k)
+    MSDfile = open(prefix+"msd.out","a" if restart else "w") # mean squared displacement information
+    Energyfile = open(prefix+"energy.out","a" if restart else "w") # energy fluctuations in format: Kinetic Potential Total
+
+    # Background thread formatting and writing the outputs while the integration goes on
+    writer = out.BackgroundWriter()
+
+    # Radial distribution function accumulated up to the cutoff radius, or half the box if it is smaller, with 10 block averages,
+    # a restarted run takes the range and bins from the checkpoint as a barostat may have rescaled the box since the start
+    nsamples = (numstep - 1)//interval
+    rdf = hist.RDF(min(r_c, 0.5*np.min(boxdim)), 100, max(1, nsamples//10))
+
+    # Cell list of the RDF pairs, so that the Verlet list of the forces is never rebuilt for the range of the RDF
+    rdfcells = CellList()
+
+    # Trajectory writer, a restarted run writes the frames after the checkpoint to a new file named after the checkpoint step
+    trajectoryName = prefix+"VMD" + ("restart"+str(k) if restart else "")
+    if trajectoryformat == "dcd":
+        # A DCD trajectory comes with the initial frame as an XYZ file which VMD uses as its structure
+        if not restart:
+            with traj.XYZWriter(prefix+"VMD.xyz") as structure:
+                structure.write(System, 0)
+        trajectoryfile = traj.opentrajectory(trajectoryName+".dcd", "dcd", System, dt=dt, interval=interval, boxdim=boxdim)
+    elif trajectoryformat == "npy":
+        trajectoryfile = traj.opentrajectory(trajectoryName+".npy", "npy", System, nframes=nsamples - k//interval)
+    else:
+        trajectoryfile = traj.opentrajectory(trajectoryName+".xyz", "xyz", System)
+
+    # The outputs are written and closed and the force workers stopped even if the run stops on an exception, as Batch.py workers leave without running atexit hooks
+    profiler = None
+    try:
+        # Track the unwrapped displacements from the initial positions of particles to compute the MSD
+        msdtracker = msd.MSDTracker(System, boxdim, msdmultiorigin)
+        MSD = 0.0
+
+        # Pressures of the samples of this run, which are not in the energy file
+        PValue = []
+
+        if restart:
+            # Accumulators and neighbour list as they were at the checkpoint
+            rdf.restore(ckpt.substate(state, "rdf"))
+            msdtracker.restore(ckpt.substate(state, "msd"))
+            neighbours.restore(ckpt.substate(state, "neighbours"))
+            if hasattr(integrator, "restore"):
+                integrator.restore(ckpt.substate(state, "thermostat"))
+
+            # Reload the energies written up to the checkpoint for plotting
+            energies = np.loadtxt(prefix+"energy.out", ndmin=2)
+            tValue = [int(t) for t in energies[:,0]]
+            KEValue = list(energies[:,1])
+            PEValue = list(energies[:,2])
+            totEValue = list(energies[:,3])
+
+        else:
+            # Observables of the initial configuration, the force pass is reused by the first integration step
+            record = obs.thermo(System, boxdim, r_c, neighbours, forcefield, tail, cutoff)
+
+            # Set up data lists for plotting energy
+            tValue = [0]
+            KEValue = [record.KE]
+            PEValue = [record.PE]
+            totEValue = [record.totE]
+            PValue.append(record.pressure)
+
+            # Write initial energy values to file
+            writer.write(Energyfile, obs.energyline, 0, record)
+
+        # Print system time at beginning of loop
+        print(str(systime.strftime("%H:%M:%S") + " - " + str(int(k*100/numstep)) + "% of loop completed"))
+
+        # Only the main loop is timed and profiled
+        timers.reset()
+        profiler = cProfile.Profile() if profile else None
+        if profiler is not None:
+            profiler.enable()
+
+        # Start time integration loop
+        for i in range(start, numstep):
+
+            # Perform VV time integration, whose force, neighbour and wrap phases are timed by the integrator
+            with timers.phase("integrate"):
+                integrator.step(dt)
+
+            # Get Energy, RDF and MSD data every step for a small enough number of steps, and every 5th step otherwise
+            if i%interval == 0:
+                # Output trajectory information
+                with timers.phase("io"):
+                    writer.call(trajectoryfile.write, out.snapshot(System), k)
+
+                # Output energy information for energy file, from the force pass of the integration step
+                with timers.phase("sample"):
+                    record = obs.thermo(System, boxdim, r_c, neighbours, forcefield, tail, cutoff)
+                tValue.append(i)
+                KEValue.append(record.KE)
+                PEValue.append(record.PE)
+                totEValue.append(record.totE)
+                PValue.append(record.pressure)
+
+                with timers.phase("io"):
+                    writer.write(Energyfile, obs.energyline, i, record)
+
+                with timers.phase("sample"):
+                    # RDF histogram, with its own cell list
+                    rdf.sample(System, boxdim, rdfcells)
+
+                    # MSD calculation
+                    MSD = msdtracker.sample(System, boxdim)
+
+                # Add to MSD file with format: timestep MSD
+                with timers.phase("io"):
+                    writer.write(MSDfile, out.formatline, i, MSD)
+
+            # Increase timestep number tracker
+            k += 1
+
+            # Save a checkpoint once the outputs up to this step are on disk, restart with: python3 NBodySim.py [name]checkpoint.npz
+            if checkpointinterval > 0 and i%checkpointinterval == 0:
+                with timers.phase("io"):
+                    writer.call(trajectoryfile.flush)
+                    writer.flush()
+                    MSDfile.flush()
+                    Energyfile.flush()
+                    ckpt.save(checkpointFile, System, boxdim, i, parameters, rdf, msdtracker, neighbours, integrator)
+
+            # Give percentage of completion of simulation every 5%, with the rates and time shares of the phases so far
+            if i%(numstep/20.0) == 0:
+                print(str(systime.strftime("%H:%M:%S") + " - " + str(int(i*100/numstep)) + "% of loop completed - " + timers.line(i - start + 1, dt)))
+    finally:
+        timers.stop()
+        if profiler is not None:
+            profiler.disable()
+
+        # Write the remaining outputs and close output files
+        try:
+            writer.close()
+        finally:
+            trajectoryfile.close()
+            MSDfile.close()
+            Energyfile.close()
+
+            # Stop the force workers
+            if workers > 1:
+                forcefield.close()
+
+    # Write the radial distribution function
+    rdf.write(prefix+"rdf.out")
+
+    # Write the MSD averaged over all time origins in format: lag in timesteps, MSD
+    if msdmultiorigin:
+        lag = interval*np.arange(len(msdtracker.frames))
+        np.savetxt(prefix+"msdmulti.out", np.column_stack((lag, msdtracker.multiorigin())), fmt=["%d", "%.4f"])
+
+    print(str(systime.strftime("%H:%M:%S") + " - 100% of loop completed"))
+
+    # Neighbour list statistics to tune the skin distance
+    print(str(neighbours))
+
+    # Indicate simulation time before graph plotting
+    elapsed = systime.perf_counter() - starttime
+    print("It took "+ str(elapsed) + " seconds to compute the time evolution of an " + str(N) + " body system over " + str(numstep) + " steps")
+
+    # Rates and time of every phase of the main loop
+    print(timers.summary(numstep - start, dt))
+    stepspersecond, tauperday, nsperday = timers.rates(numstep - start, dt)
+
+    # Profile statistics of the main loop, which can be read again with pstats
+    if profiler is not None:
+        profiler.dump_stats(prefix+"profile.out")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    if plot:
+        # plot graph of mean squared distance evolution (MSD)
+        MSDplot.plot(prefix+"msd.out", name, prefix, show)
+
+        # Histogram for RDF function
+        hist.plotrdf(rdf, name, prefix, show)
+
+        # plot graph of energy fluctuations
+        plotenergy(tValue, KEValue, PEValue, totEValue, name, prefix, show)
+
+    # Averages over the samples, the temperature being 2/3 of the kinetic energy per particle
+    return {"name": name, "N": N, "temp": temp, "rho": rho, "r_c": r_c, "numstep": numstep, "dt": dt,
+            "KE": np.mean(KEValue), "PE": np.mean(PEValue), "totE": np.mean(totEValue),
+            "temperature": 2.*np.mean(KEValue)/(3.*N), "pressure": np.mean(PValue) if PValue else float("nan"),
+            "drift": (totEValue[-1] - totEValue[0])/N, "msd": MSD, "time": elapsed,
+            "stepspersecond": stepspersecond, "nsperday": nsperday, "phases": timers.state()}
+
+
+if __name__ == "__main__":
+    # Input file name, or checkpoint file (.npz) to restart from, as command line argument or from the prompt
+    fileName = sys.argv[1] if len(sys.argv) > 1 else str(input("File name: "))
+    simulate(fileName)
@@ -0,0 +1,65 @@
+"""
+Thermodynamic Observables Module
+
+Computes the kinetic, potential and total energy, temperature, pressure and momentum of the system in a single pass, reusing the forces cached by the integrator when they are available.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import collections
+import numpy as np
+import LennardJones as lj
+
+# Record of the observables of the system at one point in time
+Thermo = collections.namedtuple("Thermo", ["KE", "PE", "totE", "temperature", "pressure", "momentum"])
+
+
+def thermo(syst, boxdim, R_c, neighbours=None, forcefield=None, tail=False, cutoff="truncated"):
+    """
+    Computes the thermodynamic observables of the system.
+    The potentials and virial cached on the system by the integrator are used if present, otherwise a single force pass is made and cached on the system.
+    With tail, the analytic tail corrections of the pairs beyond the cutoff are added to the pressure, and to the potential energy of the truncated potential.
+
+    :param syst: N body system represented as a ParticleSyst instance
+    :param boxdim: box dimensions as a (1,3) Numpy array
+    :param R_c: cutoff radius
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+    :param forcefield: function with the arguments and returns of LennardJones.ljpairs used for the force pass, LennardJones.ljpairs if None
+    :param tail: add the tail corrections of LennardJones.tailcorrection, which raises a ValueError for the force shifted potential
+    :param cutoff: treatment of the cutoff of the force field, "truncated", "shifted" or "forceshifted"
+    :return: Thermo record with KE, PE, totE, temperature, pressure and momentum (as a (1,3) Numpy array)
+    """
+    # Single force pass if the integrator has not already made one at these positions
+    if syst.potential is None:
+        syst.force, syst.potential, syst.virial = (lj.ljpairs if forcefield is None else forcefield)(syst, boxdim, R_c, neighbours)
+
+    KE = syst.kineticEnergy()
+
+    # Every interaction is counted twice in the particle potentials
+    PE = np.sum(syst.potential)/2.0
+
+    # Temperature from equipartition with kB = 1
+    temperature = 2.0*KE/(3.0*syst.N)
+
+    # Pressure from the virial theorem
+    pressure = (2.0*KE + syst.virial)/(3.0*np.prod(boxdim))
+
+    # Energy and pressure of the pairs beyond the cutoff
+    if tail:
+        tailenergy, tailpressure = lj.tailcorrection(syst.N, np.prod(boxdim), R_c, cutoff)
+        PE += tailenergy
+        pressure += tailpressure
+
+    momentum = syst.mass*np.sum(syst.velocity, axis=0)
+
+    return Thermo(KE, PE, KE + PE, temperature, pressure, momentum)
+
+def energyline(step, record):
+    """
+    Formats a line of the energy file in format: timestep Kinetic Potential Total
+
+    :param step: timestep number as an integer
+    :param record: Thermo record of the system at that timestep
+    :return: line of the energy file as a string
+    """
+    return "{0:d} {1:.4f} {2:.4f} {3:.4f}\n".format(step, record.KE, record.PE, record.totE)
@@ -0,0 +1,170 @@
+"""
+Output Writer Module
+
+Background writer thread for the output files of the simulation.
+The main loop hands snapshots of the data to a bounded queue and keeps integrating while the writer thread formats the lines, joins them per file and writes them in batches.
+The queue blocks the main loop when it is full, and the writer is flushed when it is closed, when it is used as a context manager or at interpreter exit.
+An item which fails does not stop the writer: the rest of its batch and the later items are still written, and the first exception is raised in the main thread by the next write, flush or close.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import atexit
+import copy
+import queue
+import threading
+import numpy as np
+
+# Largest number of queued items formatted and written in one batch
+BATCHSIZE = 256
+
+
+def snapshot(syst):
+    """
+    Returns a copy of the system with its own position and velocity arrays, safe to hand to the writer thread while the system keeps evolving.
+
+    :param syst: ParticleSyst instance
+    :return: ParticleSyst instance
+    """
+    copied = copy.copy(syst)
+    copied.position = np.copy(syst.position)
+    copied.velocity = np.copy(syst.velocity)
+    return copied
+
+def formatline(step, *values):
+    """
+    Formats a line of an output file in format: timestep value1 value2 ...
+
+    :param step: timestep number as an integer
+    :param values: values of the line as floats
+    :return: line as a string
+    """
+    return str(step) + "".join([" {0:.4f}".format(value) for value in values]) + "\n"
+
+
+class BackgroundWriter(object):
+
+    def __init__(self, maxsize=1024):
+        """
+        Initialise a BackgroundWriter instance and start its thread
+
+        :param maxsize: number of items the queue holds before the main loop is blocked, as an integer
+        """
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self.thread.start()
+
+        # Flush the queue even if the simulation stops on an exception
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self):
+        """
+        Raises the exception of the writer thread in the main thread if there was one
+
+        :param BackgroundWriter: BackgroundWriter instance
+        """
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+    def write(self, file, formatter, *args):
+        """
+        Queues a line to be formatted as formatter(*args) and written to an open file
+
+        :param BackgroundWriter: BackgroundWriter instance
+        :param file: file opened for writing
+        :param formatter: function returning the text to write as a string
+        :param args: arguments of the formatter, which must not be modified afterwards
+        """
+        self._check()
+        self.queue.put((file, formatter, args))
+
+    def call(self, function, *args):
+        """
+        Queues a call to a function, such as the write method of a trajectory writer
+
+        :param BackgroundWriter: BackgroundWriter instance
+        :param function: function to call
+        :param args: arguments of the function, which must not be modified afterwards (see snapshot)
+        """
+        self._check()
+        self.queue.put((None, function, args))
+
+    def _run(self):
+        """
+        Writer thread: takes batches of items from the queue, formats them and writes the text of every file at once
+
+        :param BackgroundWriter: BackgroundWriter instance
+        """
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < BATCHSIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Text of every file in the batch, in order, an item which fails being skipped so that the rest of the batch is still written
+            texts = {}
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                file, function, args = item
+                try:
+                    if file is None:
+                        function(*args)
+                    else:
+                        texts.setdefault(file, []).append(function(*args))
+                except Exception as error:
+                    self._fail(error)
+            for file in texts:
+                try:
+                    file.write("".join(texts[file]))
+                except Exception as error:
+                    self._fail(error)
+            for item in batch:
+                self.queue.task_done()
+
+    def _fail(self, error):
+        """
+        Keeps the first exception of the writer thread, to be raised in the main thread by the next write, flush or close
+
+        :param BackgroundWriter: BackgroundWriter instance
+        :param error: exception raised by a formatter, a call or a write
+        """
+        if self.error is None:
+            self.error = error
+
+    def flush(self):
+        """
+        Waits until every queued item has been written
+
+        :param BackgroundWriter: BackgroundWriter instance
+        """
+        self.queue.join()
+        self._check()
+
+    def close(self):
+        """
+        Writes all queued items and stops the writer thread
+
+        :param BackgroundWriter: BackgroundWriter instance
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        atexit.unregister(self.close)
+        self._check()
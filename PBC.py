@@ -2,35 +2,68 @@
 """
 Periodic Boundary Conditions module
 
-A module complete with a method that implements Periodic Boundary Conditions.
+A module complete with methods that implement Periodic Boundary Conditions and the Minimum Image Convention.
 
 Created on Wed Feb 22 21:03:52 2017
 
 Author: Cara Lynch
 """
 
+import numpy as np
+import Backend
 
 
-def PBCpos(syst, boxdim):
+def PBCpos(syst, boxdim, work=None):
     """
     Periodic Boundary Conditions algorithm that returns the updated positions of the particles.
+    The positions are wrapped back into the box in place, for a box of any (1,3) dimensions, and the box images crossed are counted in syst.image.
     
     :param syst: system represented as a ParticleSyst instance
     :param boxdim: dimensions of box represented as an (1,3) Numpy array
+    :param work: Workspace instance providing the buffer of the box images crossed, a new array if None
     :return: position of the particle according to the PBC update
     """
     position = syst.position
-    for i in range(0, syst.N):
-        # Applying to the i th particle
-        
-        for j in range(0,3):
-            # for x, y and z directions
-            
-            if position[i,j] < 0.:
-                # if the particle is in the negative region, add a length of the box to that coordinate
-                position[i,j] = position[i,j]%boxdim[j]
-            if position[i,j] > boxdim[j]:
-                    # if the particle is outside the box in the positive direction, subtract a length of the box in that coordinate
-                position[i,j] = position[i,j]%boxdim[j]
+    
+    # Compiled wrap in place with the numba backend
+    if Backend.usenumba():
+        Backend.wrap(position, syst.image, np.asarray(boxdim, dtype=float))
+        return position
+    
+    # Count the box lengths added or subtracted to every coordinate outside of the box
+    if work is None:
+        syst.image += np.floor_divide(position, boxdim).astype(np.int64)
+        np.mod(position, boxdim, out=position)
+        return position
+    
+    # One coordinate at a time through the workspace buffers, so that numpy does not allocate iteration buffers
+    crossed = work.buffer("crossed", (len(position),), position.dtype)
+    images = work.buffer("images", (len(position),), np.int64)
+    for k, length in enumerate(np.ravel(boxdim).tolist()):
+        np.floor_divide(position[:,k], length, out=crossed)
+        np.copyto(images, crossed, casting="unsafe")
+        syst.image[:,k] += images
+        np.mod(position[:,k], length, out=position[:,k])
     return position
+
+def MIC(vecsep, boxdim, work=None):
+    """
+    Minimum Image Convention applied in place to an array of vector separations.
     
+    :param vecsep: vector separations as an (M,3) Numpy array
+    :param boxdim: dimensions of box represented as an (1,3) Numpy array
+    :param work: Workspace instance providing the buffer of the box lengths subtracted, new arrays if None
+    :return: vector separations according to the MIC
+    """
+    # Subtract the nearest whole number of box lengths from every component
+    if work is None:
+        vecsep -= boxdim*np.rint(vecsep/boxdim)
+        return vecsep
+    # One coordinate at a time through a workspace buffer, so that numpy does not allocate iteration buffers
+    shift = work.buffer("mic", (len(vecsep),), vecsep.dtype)
+    for k, length in enumerate(np.ravel(boxdim).tolist()):
+        np.divide(vecsep[:,k], length, out=shift)
+        np.rint(shift, out=shift)
+        shift *= length
+        vecsep[:,k] -= shift
+    return vecsep
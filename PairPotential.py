@@ -0,0 +1,254 @@
+"""
+Pair Potential Module
+
+Tabulated pair potentials: any pair potential, such as Lennard-Jones, WCA or Morse, is sampled once on a uniform grid in the squared distance r^2 between a minimum distance and the cutoff, and the forces and energies of the pairs are then interpolated from the table, linearly or with cubic Hermite polynomials.
+The lookup needs neither a square root nor a power per pair, and the shifts of the potential and force at the cutoff are built into the table.
+A PairTable instance has the arguments and returns of LennardJones.ljpairs, so it can be given to the integrators and to Observables.thermo as their force field.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+import LennardJones as lj
+import PBC
+import Backend
+
+# Interpolations of the tables: order of the polynomial in every interval
+INTERPOLATIONS = {"linear": 1, "cubic": 3}
+
+
+def lennardjones(rsq, epsilon=1.0, sigma=1.0):
+    """
+    Lennard-Jones pair potential 4e((s/r)^12 - (s/r)^6)
+
+    :param rsq: squared distances as a Numpy array
+    :param epsilon: depth of the well as a float
+    :param sigma: distance at which the potential is zero as a float
+    :return: pair potentials and pair forces divided by the distance, -(dV/dr)/r, as Numpy arrays
+    """
+    r2inv = 1./rsq
+    r6inv = (sigma*sigma*r2inv)**3
+    return 4.*epsilon*r6inv*(r6inv - 1.), 48.*epsilon*r6inv*(r6inv - 0.5)*r2inv
+
+def wca(rsq, epsilon=1.0, sigma=1.0):
+    """
+    Weeks-Chandler-Andersen pair potential: the Lennard-Jones potential cut at its minimum 2^(1/6)s and shifted up by e, so that it is purely repulsive
+
+    :param rsq: squared distances as a Numpy array
+    :param epsilon: depth of the Lennard-Jones well as a float
+    :param sigma: distance at which the Lennard-Jones potential is zero as a float
+    :return: pair potentials and pair forces divided by the distance as Numpy arrays
+    """
+    potential, fscalar = lennardjones(rsq, epsilon, sigma)
+    inside = rsq < 2.**(1./3.)*sigma*sigma
+    return np.where(inside, potential + epsilon, 0.), np.where(inside, fscalar, 0.)
+
+def morse(rsq, D=1.0, alpha=3.0, r0=2.**(1./6.)):
+    """
+    Morse pair potential D(1 - exp(-a(r - r0)))^2 - D
+
+    :param rsq: squared distances as a Numpy array
+    :param D: depth of the well as a float
+    :param alpha: width parameter of the well as a float
+    :param r0: distance of the minimum as a float
+    :return: pair potentials and pair forces divided by the distance as Numpy arrays
+    """
+    r = np.sqrt(rsq)
+    e = np.exp(-alpha*(r - r0))
+    return D*(1. - e)**2 - D, -2.*D*alpha*e*(1. - e)/r
+
+def switched(function, Rin, width, **parameters):
+    """
+    Returns the inner part S(r)V(r) of a pair potential, for splitting it into a short range and a long range part.
+    The switch S is 1 below Rin - width and goes to 0 at Rin with continuous first and second derivatives, so that both parts are smooth.
+
+    :param function: pair potential, function of the squared distances with the returns of lennardjones
+    :param Rin: distance beyond which the inner part is zero as a float
+    :param width: width of the switching region as a float
+    :param parameters: keyword arguments of the pair potential
+    :return: function of the squared distances with the returns of lennardjones
+    """
+    def inner(rsq):
+        potential, fscalar = function(rsq, **parameters)
+        r = np.sqrt(rsq)
+        x = np.clip((r - (Rin - width))/width, 0., 1.)
+        # Switch 1 - 10x^3 + 15x^4 - 6x^5 and its derivative in r
+        S = 1. - x**3*(10. - 15.*x + 6.*x*x)
+        dS = -30.*x*x*(1. - x)**2/width
+        return S*potential, S*fscalar - dS*potential/r
+    return inner
+
+# Pair potentials which can be tabulated by name
+POTENTIALS = {"lj": lennardjones, "wca": wca, "morse": morse}
+
+
+class PairTable(object):
+
+    def __init__(self, potential, Rc, rmin=0.5, points=4096, interpolation="cubic", cutoff="truncated", **parameters):
+        """
+        Initialise a PairTable instance, tabulating the pair potential and the pair force divided by the distance on a uniform grid in r^2.
+        Pairs closer than rmin are extrapolated from the first interval of the table.
+
+        :param potential: name of a pair potential of POTENTIALS, or function of the squared distances with the returns of lennardjones
+        :param Rc: cutoff radius as a float
+        :param rmin: smallest distance of the table as a float
+        :param points: number of intervals of the table as an integer
+        :param interpolation: "linear" or "cubic"
+        :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted", as in LennardJones.cutoffshift
+        :param parameters: keyword arguments of the pair potential, such as epsilon and sigma
+        """
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError("Unknown interpolation " + str(interpolation) + ", must be one of " + ", ".join(INTERPOLATIONS))
+        lj.cutoffshift(Rc, cutoff)
+        function = POTENTIALS[potential] if isinstance(potential, str) else potential
+        self.name = potential if isinstance(potential, str) else getattr(potential, "__name__", "potential")
+        self.Rc = Rc
+        self.Rcsq = Rc*Rc
+        self.interpolation = interpolation
+        self.cutoff = cutoff
+
+        # Potential and force at the cutoff, subtracted from the pairs within it
+        Vc, Wc = function(np.array([self.Rcsq]), **parameters)
+        Vc = Vc[0] if cutoff != "truncated" else 0.
+        Fc = Wc[0]*Rc if cutoff == "forceshifted" else 0.
+
+        def shifted(rsq):
+            potential, fscalar = function(rsq, **parameters)
+            if Fc == 0.:
+                return potential - Vc, fscalar
+            r = np.sqrt(rsq)
+            return potential - Vc + (r - Rc)*Fc, fscalar - Fc/r
+
+        # Uniform grid in r^2, of spacing ds
+        self.rsqmin = rmin*rmin
+        self.invds = points/(self.Rcsq - self.rsqmin)
+        ds = 1./self.invds
+        rsq = self.rsqmin + ds*np.arange(points + 1)
+        V, W = shifted(rsq)
+
+        if interpolation == "linear":
+            # Value and change over every interval
+            self.Vcoef = np.stack((V[:-1], np.diff(V)))
+            self.Wcoef = np.stack((W[:-1], np.diff(W)))
+        else:
+            # Derivatives in r^2 at the nodes, dV/dr^2 = -W/2 exactly and dW/dr^2 by central differences
+            h = 1e-6*rsq
+            dV = -0.5*W
+            dW = (shifted(rsq + h)[1] - shifted(rsq - h)[1])/(2.*h)
+            self.Vcoef = hermite(V, ds*dV)
+            self.Wcoef = hermite(W, ds*dW)
+
+    def __str__(self):
+        """
+        Print the potential, cutoff and size of the table
+
+        :param PairTable: PairTable instance
+        :return: string with potential, cutoff, number of intervals and interpolation
+        """
+        return "PairTable of " + str(self.name) + " up to " + str(self.Rc) + " with " + str(self.Vcoef.shape[1]) + " " + self.interpolation + " intervals"
+
+    def lookup(self, rsq):
+        """
+        Interpolates the pair potentials and the pair forces divided by the distance from the table
+
+        :param PairTable: PairTable instance
+        :param rsq: squared distances within the cutoff as a Numpy array
+        :return: pair potentials and pair forces divided by the distance as Numpy arrays
+        """
+        # Interval of every pair and fraction t of the interval, in double precision as single precision would leave few digits of t in a large table
+        t = (rsq.astype(np.float64) - self.rsqmin)*self.invds
+        k = t.astype(np.intp)
+        np.clip(k, 0, self.Vcoef.shape[1] - 1, out=k)
+        t -= k
+        return horner(self.Vcoef, k, t), horner(self.Wcoef, k, t)
+
+    def __call__(self, system, boxdim, Rc, neighbours=None, out=None):
+        """
+        Computes the forces, potentials and virial of the system from the table, with the arguments and returns of LennardJones.ljpairs.
+        The pairs interact up to the cutoff of the table, Rc only being given to the neighbour backend.
+
+        :param PairTable: PairTable instance
+        :param system: ParticleSyst object representing the system of N particles
+        :param boxdim: Box dimensions as an (1,3) Numpy array
+        :param Rc: cutoff radius of the neighbour backend as a float
+        :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+        :param out: (N,3) and (N,) Numpy arrays the forces and potentials are written to, and possibly further arrays which are not used here, new arrays if None
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        if neighbours is None:
+            i, j = lj.allpairs(system.N)
+        else:
+            i, j = neighbours.pairs(system, boxdim, Rc)
+
+        # Compiled kernel with the numba backend
+        if Backend.usenumba():
+            force, potential = (np.empty((system.N,3)), np.empty(system.N)) if out is None else out[:2]
+            return Backend.tablepairlist(system.position, np.asarray(boxdim, dtype=float), self.Rcsq, i, j, self.rsqmin, self.invds, self.Vcoef, self.Wcoef, force, potential)
+
+        return self.kernel(system.position, boxdim, i, j, out)
+
+    def kernel(self, position, boxdim, i, j, out=None):
+        """
+        Computes the forces, potentials and virial from a list of pairs of particles by table lookup, each pair being computed once as in LennardJones.ljkernel
+
+        :param PairTable: PairTable instance
+        :param position: positions of the N particles inside the box as an (N,3) Numpy array
+        :param boxdim: Box dimensions as an (1,3) Numpy array
+        :param i: first particle of every pair as a Numpy array
+        :param j: second particle of every pair as a Numpy array
+        :param out: (N,3) and (N,) Numpy arrays the forces and potentials are written to, and possibly further arrays which are not used here, new arrays if None
+        :return: forces as an (N,3) Numpy array, potentials as an (N,) Numpy array and virial as a float
+        """
+        N = len(position)
+
+        # Minimum image vector separation of every pair within the cutoff
+        rvec = PBC.MIC(position[i] - position[j], boxdim)
+        rsq = np.einsum("ij,ij->i", rvec, rvec)
+        inside = rsq < self.Rcsq
+        i = i[inside]
+        j = j[inside]
+        rvec = rvec[inside]
+        rsq = rsq[inside]
+
+        # Pair potential and pair force over the distance, whose product with r^2 is the pair virial r.f
+        pairpotential, fscalar = self.lookup(rsq)
+        fvec = fscalar[:,np.newaxis]*rvec
+
+        # Add the pair force to particle i and its opposite to particle j
+        force, potential = (np.empty(shape=(N,3)), np.empty(N)) if out is None else out[:2]
+        for k in range(0,3):
+            np.subtract(np.bincount(i, fvec[:,k], minlength=N), np.bincount(j, fvec[:,k], minlength=N), out=force[:,k])
+
+        # Every pair potential contributes to the potential of both particles
+        np.add(np.bincount(i, pairpotential, minlength=N), np.bincount(j, pairpotential, minlength=N), out=potential)
+
+        return force, potential, np.dot(fscalar, rsq)
+
+
+def hermite(values, slopes):
+    """
+    Coefficients of the cubic Hermite polynomials of every interval of a table, in the fraction t of the interval
+
+    :param values: values at the nodes as a Numpy array
+    :param slopes: derivatives at the nodes multiplied by the spacing of the nodes as a Numpy array
+    :return: (4,intervals) Numpy array of the coefficients of 1, t, t^2 and t^3 in every interval
+    """
+    p0, p1 = values[:-1], values[1:]
+    m0, m1 = slopes[:-1], slopes[1:]
+    return np.stack((p0, m0, 3.*(p1 - p0) - 2.*m0 - m1, 2.*(p0 - p1) + m0 + m1))
+
+def horner(coefficients, k, t):
+    """
+    Evaluates the polynomials of a table with Horner's rule.
+    Every power is gathered from its own contiguous row of coefficients, which is faster than gathering whole rows of a (intervals,order+1) array.
+
+    :param coefficients: (order+1,intervals) Numpy array of the coefficients of the polynomial of every interval, from the constant term
+    :param k: interval of every point as an (M,) Numpy array of integers
+    :param t: fraction of the interval of every point as an (M,) Numpy array
+    :return: values as an (M,) Numpy array
+    """
+    value = np.take(coefficients[-1], k)
+    for c in range(len(coefficients) - 2, -1, -1):
+        value *= t
+        value += np.take(coefficients[c], k)
+    return value
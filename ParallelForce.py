@@ -0,0 +1,236 @@
+"""
+Parallel Force Module
+
+Computes the Lennard-Jones forces, potentials and virial across a persistent pool of worker processes.
+All pairs are split into row blocks of the upper triangle of the pair matrix with equal numbers of pairs, and neighbour pair lists into equal chunks.
+Positions, pair lists and the partial results of every worker live in shared memory so that no array is pickled at each step.
+The workers are started from a fork server (or spawned where there is none) rather than forked, as forking a process whose numba kernels have started their thread pool deadlocks.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import LennardJones as lj
+
+# Largest number of pairs handled at once by a worker, to bound its memory
+CHUNKPAIRS = 2**20
+
+# Shared memory segments attached by a worker process, by name
+_segments = {}
+
+
+def _attach(name, shape, dtype):
+    """
+    Returns a Numpy view of a shared memory segment, attaching the worker to it on first use.
+
+    :param name: name of the shared memory segment
+    :param shape: shape of the array
+    :param dtype: type of the array
+    :return: Numpy array backed by the shared memory
+    """
+    if name not in _segments:
+        _segments[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=_segments[name].buf)
+
+def _rowpairs(start, stop, N):
+    """
+    Returns the pairs (i, j) with j>i for the rows start to stop of the pair matrix.
+
+    :param start: first row as an integer
+    :param stop: row after the last row as an integer
+    :param N: number of particles as an integer
+    :return i, j: two Numpy arrays of particle indices
+    """
+    rows = np.arange(start, stop)
+    count = N - 1 - rows
+    i = np.repeat(rows, count)
+    first = np.repeat(np.cumsum(count) - count, count)
+    j = i + 1 + np.arange(len(i)) - first
+    return i, j
+
+def _work(task):
+    """
+    Computes the forces, potentials and virial of one block of pairs and stores them in the worker's slot of the shared results.
+
+    :param task: tuple (worker slot, names of the shared segments, N, number of workers, number of pairs in the list, first and last row or pair of the block, Rc, box dimensions, shifts of the potential and force at the cutoff)
+    """
+    w, names, N, workers, npairs, start, stop, Rc, boxdim, Vc, Fc = task
+    boxdim = np.array(boxdim)
+
+    # Detach from the segments no longer in use, such as the pair list before it was grown
+    for name in [name for name in _segments if name not in names]:
+        _segments.pop(name).close()
+
+    position = _attach(names[0], (N,3), np.float64)
+    results = _attach(names[1], (workers,N,4), np.float64)
+    virial = _attach(names[2], (workers,), np.float64)
+
+    results[w] = 0.
+    virial[w] = 0.
+
+    # Rows of the pair matrix when there is no pair list, else pairs of the list
+    if names[3] is None:
+        step = max(1, CHUNKPAIRS//N)
+    else:
+        pairs = _attach(names[3], (npairs,2), np.int64)
+        step = CHUNKPAIRS
+
+    for first in range(start, stop, step):
+        last = min(first + step, stop)
+        if names[3] is None:
+            i, j = _rowpairs(first, last, N)
+        else:
+            i = pairs[first:last,0]
+            j = pairs[first:last,1]
+        force, potential, pairvirial = lj.ljkernel(position, boxdim, Rc, i, j, Vc, Fc)
+        results[w,:,0:3] += force
+        results[w,:,3] += potential
+        virial[w] += pairvirial
+
+def rowblocks(N, workers):
+    """
+    Splits the rows of the upper triangle of the pair matrix into blocks holding the same number of pairs.
+
+    :param N: number of particles as an integer
+    :param workers: number of blocks as an integer
+    :return: row boundaries as a Numpy array of length workers+1
+    """
+    # Number of pairs before every row
+    before = np.concatenate(([0], np.cumsum(N - 1 - np.arange(N))))
+    targets = np.arange(workers + 1)*before[-1]/float(workers)
+    bounds = np.searchsorted(before, targets)
+    bounds[0] = 0
+    bounds[-1] = N
+    return bounds
+
+
+class ParallelForce(object):
+
+    def __init__(self, N, workers=None, cutoff="truncated"):
+        """
+        Initialise a ParallelForce instance with its pool of worker processes and shared memory.
+        The instance is used in place of LennardJones.ljpairs and must be closed to stop the workers and free the shared memory.
+
+        :param N: number of particles as an integer
+        :param workers: number of worker processes, the number of cores if None
+        :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+        """
+        self.N = N
+        self.workers = workers or os.cpu_count()
+        self.cutoff = cutoff
+
+        # Shared positions, partial forces and potentials, and partial virials of every worker
+        self._position = shared_memory.SharedMemory(create=True, size=N*3*8)
+        self._results = shared_memory.SharedMemory(create=True, size=self.workers*N*4*8)
+        self._virial = shared_memory.SharedMemory(create=True, size=self.workers*8)
+        self.position = np.ndarray((N,3), dtype=np.float64, buffer=self._position.buf)
+        self.results = np.ndarray((self.workers,N,4), dtype=np.float64, buffer=self._results.buf)
+        self.virial = np.ndarray((self.workers,), dtype=np.float64, buffer=self._virial.buf)
+
+        # Shared pair list, allocated when a neighbour backend is used, with the arrays last copied into it
+        self._pairs = None
+        self.pairs = None
+        self._sharedlist = None
+
+        self.bounds = rowblocks(N, self.workers)
+        context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        self.pool = context.Pool(self.workers)
+
+    def __str__(self):
+        """
+        Print the number of particles and workers
+
+        :param ParallelForce: ParallelForce instance
+        :return: string with the number of particles and workers
+        """
+        return "ParallelForce for " + str(self.N) + " particles over " + str(self.workers) + " workers"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _sharepairs(self, i, j):
+        """
+        Copies a neighbour pair list into shared memory, growing the segment if needed.
+        The copy is skipped when the arrays are those of the last copy, as a VerletList returns the same arrays until it is rebuilt.
+
+        :param ParallelForce: ParallelForce instance
+        :param i: first particle of every pair as a Numpy array
+        :param j: second particle of every pair as a Numpy array
+        """
+        if self._sharedlist is not None and self._sharedlist[0] is i and self._sharedlist[1] is j:
+            return
+        npairs = len(i)
+        if self.pairs is None or len(self.pairs) < npairs:
+            if self._pairs is not None:
+                self._pairs.close()
+                self._pairs.unlink()
+            # Room for the list to grow between rebuilds
+            capacity = max(1, int(1.25*npairs))
+            self._pairs = shared_memory.SharedMemory(create=True, size=capacity*2*8)
+            self.pairs = np.ndarray((capacity,2), dtype=np.int64, buffer=self._pairs.buf)
+        self.pairs[:npairs,0] = i
+        self.pairs[:npairs,1] = j
+        self._sharedlist = (i, j)
+
+    def __call__(self, system, boxdim, Rc, neighbours=None, out=None):
+        """
+        Computes the Lennard-Jones forces, potentials and virial of the system across the workers, with the same results as LennardJones.ljpairs.
+
+        :param ParallelForce: ParallelForce instance
+        :param system: ParticleSyst object representing the system of N particles
+        :param boxdim: Box dimensions as an (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+        :param out: (N,3) and (N,) Numpy arrays the forces and potentials are written to, and possibly further arrays which are not used here, new arrays if None
+        :return force: an (N,3) Numpy array where the ith row is the force experienced by the ith particle
+        :return potential: an (N,1) Numpy array where the ith row is the potential of the ith particle
+        :return virial: sum of r_ij.f_ij over all pairs as a float
+        """
+        # Share the positions with the workers
+        self.position[:] = system.position
+
+        names = [self._position.name, self._results.name, self._virial.name, None]
+        if neighbours is None:
+            npairs = 0
+            bounds = self.bounds
+        else:
+            i, j = neighbours.pairs(system, boxdim, Rc)
+            self._sharepairs(i, j)
+            names[3] = self._pairs.name
+            npairs = len(self.pairs)
+            bounds = np.linspace(0, len(i), self.workers + 1).astype(int)
+
+        Vc, Fc = lj.cutoffshift(Rc, self.cutoff)
+        tasks = [(w, names, self.N, self.workers, npairs, bounds[w], bounds[w+1], Rc, list(boxdim), Vc, Fc) for w in range(self.workers)]
+        self.pool.map(_work, tasks)
+
+        # Reduce the partial results of the workers
+        if out is None:
+            total = np.sum(self.results, axis=0)
+            return total[:,0:3], total[:,3], np.sum(self.virial)
+        np.sum(self.results[:,:,0:3], axis=0, out=out[0])
+        np.sum(self.results[:,:,3], axis=0, out=out[1])
+        return out[0], out[1], np.sum(self.virial)
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared memory.
+
+        :param ParallelForce: ParallelForce instance
+        """
+        if self.pool is None:
+            return
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+        self.position = self.results = self.virial = self.pairs = self._sharedlist = None
+        for segment in (self._position, self._results, self._virial, self._pairs):
+            if segment is not None:
+                segment.close()
+                segment.unlink()
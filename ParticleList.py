@@ -9,12 +9,17 @@ Date: 07/02/2017
 
 import numpy as np
 import math
+import itertools
 import PBC
+import Backend
+
+# Floating point types of the positions and velocities: double precision throughout, or single precision storage and pair arithmetic with the forces and energies accumulated in double precision
+PRECISIONS = {"double": np.float64, "mixed": np.float32}
 
 
 class ParticleSyst(object) :
 
-    def __init__(self, name, label, pos, vel, mass, N):
+    def __init__(self, name, label, pos, vel, mass, N, precision="double"):
         """
         Initialise a ParticleSyst instance
         :param name: name of system as a string
@@ -23,6 +28,7 @@ class ParticleSyst(object) :
         :param pos: positions of the particles as an (N,3) Numpy array
         :param vel: velocities of the particle as an (N,3) Numpy array
         :param mass: mass of the particles as a float
+        :param precision: precision of the positions and velocities, "double" or "mixed" (single precision storage)
         """
         self.name = name
         self.label = label
@@ -30,6 +36,15 @@ class ParticleSyst(object) :
         self.velocity = vel
         self.N = N
         self.mass = mass
+        self.setprecision(precision)
+
+        # Number of box lengths every particle has been moved by the periodic boundary conditions, to recover unwrapped positions
+        self.image = np.zeros((N,3), dtype=np.int64)
+
+        # Forces, potentials and virial of the last force evaluation at the current positions, cached by the integrator
+        self.force = None
+        self.potential = None
+        self.virial = None
 
 
     def __str__(self):
@@ -42,6 +57,21 @@ class ParticleSyst(object) :
         return  str(self.name) + " represents a system of " + str(self.N) + " Particle3D instances"
  
 
+    def setprecision(self, precision):
+        """
+        Converts the positions and velocities to the floating point type of a precision.
+        In mixed precision they are stored in single precision, which halves the memory traffic of the pair kernels, while the forces, potentials, virial and kinetic energy are accumulated in double precision.
+
+        :param ParticleSyst: ParticleSyst instance
+        :param precision: "double" or "mixed"
+        """
+        if precision not in PRECISIONS:
+            raise ValueError("Unknown precision " + str(precision) + ", must be one of " + ", ".join(PRECISIONS))
+        self.precision = precision
+        self.position = np.ascontiguousarray(self.position, dtype=PRECISIONS[precision])
+        self.velocity = np.ascontiguousarray(self.velocity, dtype=PRECISIONS[precision])
+
+
     def velmag(self, i):
         """
         Calculates the magnitude of the velocity of the particle of index i
@@ -63,90 +93,108 @@ class ParticleSyst(object) :
         :param ParticleSyst: ParticleSyst instance
         :return: kinetic energy of system as float
         """
-        energy = 0.0
-        for i in range(0, self.N):
-            speed = self.velmag(i)
-            energy = energy + 0.5*self.mass*speed**2.
-        return energy
+        # Sum of the squares without a temporary array
+        return 0.5*self.mass*np.einsum("ij,ij->", self.velocity, self.velocity, dtype=np.float64)
     
-    def MICvecsep(self, boxdim,n):
+    def MICvecsep(self, boxdim,n, work=None):
         """
         Computes the vector separation between the nth particle and all other particles as an array according to the Minimum Image Convention
         
         :param ParticleSyst: ParticleSyst instance
         :param boxdim: dimensions of box
         :param n: index of particle
+        :param work: Workspace instance whose buffers are used and returned instead of new arrays, new arrays if None
         :return: vector separation of particle with respect to all other particles as an (N,3) numpy array
         """
-        # Insure all particles are in the box for calculation
-        position = PBC.PBCpos(self, boxdim)
-
-        # Set up empty array for vector separation with respect to all particles (includes itself)
-        vecsep = np.empty(shape=(self.N,3))
-        for i in range(0,self.N):
-            for j in range(0,3):
-                vecsep[i,j] = position[n,j]- position[i,j]
-                if abs(vecsep[i,j])>boxdim[j]/2.:
-                    if vecsep[i,j]>=0.0:
-                        vecsep[i,j]-=boxdim[j]
-                    else:
-                        vecsep[i,j]+=boxdim[j]
-        return vecsep
+        vecsep = np.empty((self.N,3), dtype=self.position.dtype) if work is None else work.buffer("vecsep", (self.N,3), self.position.dtype)
+
+        # Compiled separation with the numba backend
+        if Backend.usenumba():
+            Backend.micvecsep(self.position, np.asarray(boxdim, dtype=float), n, vecsep)
+            return vecsep
+
+        # Vector separation with respect to all particles (includes itself), positions are put back in the box once per step by the integrator
+        for k in range(0,3):
+            np.subtract(self.position[n,k], self.position[:,k], out=vecsep[:,k])
+        return PBC.MIC(vecsep, boxdim, work)
         
-    def sepmag(self,boxdim,n):
+    def sepmag(self,boxdim,n, work=None):
         """
         Computes the magnitude of the vector separation between the nth particle and all other particles as an array according to the MIC
         
         :param ParticleSyst: ParticleSyst instance
         :param boxdim: dimensions of box
         :param n: index of particle
+        :param work: Workspace instance whose buffers are used and returned instead of new arrays, new arrays if None
         :return: magnitude of vector separation of particle with respect to all other particles as an (N,1) numpy array
         """
-        vecsep = self.MICvecsep(boxdim,n)
-        sepmag = np.empty(shape=(self.N))
-        for i in range(0,self.N):
-            mag = 0.0
-            for j in range(0,3):
-                mag+= vecsep[i,j]*vecsep[i,j]
-            sepmag[i] = math.sqrt(mag)
-        return sepmag
+        vecsep = self.MICvecsep(boxdim,n,work)
+        distance = np.empty(self.N, dtype=vecsep.dtype) if work is None else work.buffer("sepmag", (self.N,), vecsep.dtype)
+        np.einsum("ij,ij->i", vecsep, vecsep, out=distance)
+        return np.sqrt(distance, out=distance)
             
 
     # Time integration methods
+    # With a Workspace instance the updates are made in place through one of its buffers, so that no array is allocated, otherwise new arrays are created
     # First-order velocity update
-    def leapVelocity(self, dt, force):
+    def leapVelocity(self, dt, force, work=None):
         """
         Update the velocity to the first order
 
         :param ParticleSyst: ParticleSyst instance
         :param dt: timestep as float
         :param force: force between every particle represented by an (N,3) Numpy array
+        :param work: Workspace instance for an update in place, None for a new array
         :return: updated velocity of particle represented by an (N,3) Numpy array
         """
-        self.velocity = self.velocity + dt/self.mass*force
+        # The update is rounded once to the precision of the velocities
+        if work is None:
+            self.velocity = (self.velocity + dt/self.mass*force).astype(self.velocity.dtype, copy=False)
+            return self.velocity
+        kick = work.buffer("kick", force.shape)
+        np.multiply(force, dt/self.mass, out=kick)
+        self.velocity += work.cast(kick, self.velocity.dtype)
+        return self.velocity
 
     # First-order position update
-    def leapPos1st(self, dt):
+    def leapPos1st(self, dt, work=None):
         """
         Update the position to the first order
 	
         :param ParticleSyst: ParticleSyst instance
         :param dt: timestep as float
+        :param work: Workspace instance for an update in place, None for a new array
         :return: first order update of position of particle represented by a (N,3) Numpy array
         """
-        self.position = self.position + dt*self.velocity
+        if work is None:
+            self.position = (self.position + dt*self.velocity).astype(self.position.dtype, copy=False)
+            return self.position
+        drift = work.buffer("drift", self.velocity.shape)
+        np.multiply(work.cast(self.velocity, drift.dtype), dt, out=drift)
+        self.position += work.cast(drift, self.position.dtype)
+        return self.position
 
     # Second-order position update
-    def leapPos2nd(self,dt,force):
+    def leapPos2nd(self,dt,force, work=None):
         """
         Update the position to the second order
 	
         :param ParticleSyst: ParticleSyst instance
         :param dt: timestep as float
         :param force: force as a vector represented by an (N,3) Numpy array
+        :param work: Workspace instance for an update in place, None for a new array
         :return: second order update of position of particle represented by an (N,3) Numpy array
         """
-        self.position = self.position + dt*self.velocity + 0.5*(dt**2)/self.mass*force
+        if work is None:
+            self.position = (self.position + dt*self.velocity + 0.5*(dt**2)/self.mass*force).astype(self.position.dtype, copy=False)
+            return self.position
+        # dt*(v + dt/2m f) in a single buffer
+        drift = work.buffer("drift", force.shape)
+        np.multiply(force, 0.5*dt/self.mass, out=drift)
+        drift += work.cast(self.velocity, drift.dtype)
+        drift *= dt
+        self.position += work.cast(drift, self.position.dtype)
+        return self.position
 	
     # Prints in format necessary for VMD
     def printVMD(self, k):
@@ -157,11 +205,9 @@ class ParticleSyst(object) :
         :param k: timestep number as float
         :return: N strings
         """
-        total = str()
-        total = total + str(self.N) + "\n" + "Point = " + str(k) + "\n"
-        for i in range(0,self.N):
-            total = total + str(self.label[i]) + " " + str(self.position[i,0]) + " " + str(self.position[i,1]) + " " + str(self.position[i,2]) + "\n"
-        return total
+        # Template with one line per particle, filled with all coordinates in a single formatting call
+        template = "".join([str(label) + " %r %r %r\n" for label in self.label])
+        return str(self.N) + "\n" + "Point = " + str(k) + "\n" + template % tuple(self.position.ravel().tolist())
 		 
 
     # Create a particle from a file entry
@@ -169,40 +215,77 @@ class ParticleSyst(object) :
     def createsystem(fileIn):
         """
         Create a system of N particles from a file entry.
-        The first line of the file contains the system name and the number of particles, N, as a float.
-        Each subsequent line of the file must have the label, mass, position and velocity coordinates of the relevant particle in that order, separated by spaces.
-	
-        :param fileIn: file opened for reading
+        The first line of the file contains the system name, the number of particles, N, and the mass of the particles.
+        Each subsequent line of the file must have the label, position and velocity coordinates of the relevant particle in that order, separated by spaces.
+        The file is opened once: the coordinates are parsed in bulk by np.loadtxt as numbers, and the labels are then taken from the first word of every line.
+
+        :param fileIn: name of the file as a string
         :return: ParticleSyst as an instance
         """
-        file = open(fileIn, "r")
-        lines = file.readlines()
-        line0 = lines[0].split()
-        name = str(line0[0])
-        N = int(line0[1])
-        mass = float(line0[2])
-	
-        # Create Numpy arrays to hold system information
-        label = [None]*N
-        pos = np.empty([N,3], dtype = float)
-        vel = np.empty([N,3], dtype = float)
-	
-        for i in range(0,N):
-		
-		# Define list of elements of line i corresponding to particle of index i
-              line = lines[i+1].split()
-		
-		# Add label of particle i to label array
-              label[i] = str(line[0])
-		
-		# Add position of particle i to row i of position array
-              pos[i,0] = float(line[1])
-              pos[i,1] = float(line[2])
-              pos[i,2] = float(line[3])
-		
-		# Add velocity of particle i to 
-              vel[i,0] = float(line[4])
-              vel[i,1] = float(line[5])
-              vel[i,2] = float(line[6])
-
-        return ParticleSyst(name, label, pos, vel, mass, N)
+        with open(fileIn, "r") as file:
+            line0 = file.readline().split()
+            name = str(line0[0])
+            N = int(line0[1])
+            mass = float(line0[2])
+            start = file.tell()
+
+            # Positions and velocities of the N particles in one (N,6) array
+            data = np.loadtxt(file, dtype=float, usecols=range(1,7), max_rows=N, ndmin=2)
+
+            # Labels from the same lines, read again from the start of the particles
+            file.seek(start)
+            label = [line.split(None, 1)[0] for line in itertools.islice(file, N)]
+
+        return ParticleSyst.fromarrays(name, data[:,0:3], data[:,3:6], mass, label)
+
+    # Create a system directly from arrays
+    @staticmethod
+    def fromarrays(name, pos, vel=None, mass=1.0, label=None, precision="double"):
+        """
+        Create a system of N particles from arrays of positions and velocities, such as the output of a lattice generator, without going through a file.
+        The arrays are copied once, straight into new arrays of the precision, so read only memory maps can be passed.
+
+        :param name: name of system as a string
+        :param pos: positions of the particles as an (N,3) array
+        :param vel: velocities of the particles as an (N,3) array, zero if None
+        :param mass: mass of the particles as a float
+        :param label: labels of the particles as a list of strings, "p0" to "p(N-1)" if None
+        :param precision: precision of the positions and velocities, "double" or "mixed"
+        :return: ParticleSyst as an instance
+        """
+        # Unknown precisions are rejected by setprecision
+        dtype = PRECISIONS.get(precision, np.float64)
+        pos = np.array(pos, dtype=dtype)
+        N = len(pos)
+        vel = np.zeros((N,3), dtype=dtype) if vel is None else np.array(vel, dtype=dtype)
+        if label is None:
+            label = ["p" + str(i) for i in range(N)]
+        return ParticleSyst(name, label, pos, vel, mass, N, precision)
+
+    # Create a system from a binary file
+    @staticmethod
+    def loadsystem(fileIn, name=None, mass=1.0, mmap=True):
+        """
+        Create a system of N particles from a binary .npy file holding an (N,6) array of the position and velocity coordinates of every particle, as written by savesystem.
+        The file is memory mapped by default so that a large configuration is read once, straight into the arrays of the system.
+
+        :param fileIn: name of the .npy file as a string
+        :param name: name of system as a string, the name of the file if None
+        :param mass: mass of the particles as a float
+        :param mmap: memory map the file instead of reading it into memory first
+        :return: ParticleSyst as an instance
+        """
+        if name is None:
+            name = fileIn[:-4] if fileIn.endswith(".npy") else fileIn
+        data = np.load(fileIn, mmap_mode="r" if mmap else None)
+        return ParticleSyst.fromarrays(name, data[:,0:3], data[:,3:6], mass)
+
+    # Write the system to a binary file
+    def savesystem(self, fileOut):
+        """
+        Writes the positions and velocities of the particles to a binary .npy file as an (N,6) array, which can be read back with loadsystem
+
+        :param ParticleSyst: ParticleSyst instance
+        :param fileOut: name of the .npy file as a string
+        """
+        np.save(fileOut, np.hstack((self.position, self.velocity)))
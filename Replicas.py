@@ -0,0 +1,285 @@
+"""
+Replica Module
+
+Stack of R independent replicas of a small N-body system held in (R,N,3) arrays, each replica with its own box, temperature and random seed.
+The Lennard-Jones forces, periodic boundary conditions and velocity Verlet integration run over all replicas at once in the same array operations, which keeps NumPy busy for systems of only a hundred particles.
+Forces are computed over all pairs of every replica, which is the fastest choice for such small systems, with the same pair terms and treatments of the cutoff as LennardJones.ljkernel. With the numba backend the replicas are computed in parallel, one replica per thread.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+from ParticleList import ParticleSyst as P
+import MDUtilities as md
+import LennardJones as lj
+import Observables as obs
+import Backend
+
+
+class ReplicaSyst(object):
+
+    def __init__(self, name, pos, vel, mass, boxdim, temperature=None, seed=None):
+        """
+        Initialise a ReplicaSyst instance
+
+        :param name: name of system as a string
+        :param pos: positions of the particles of every replica as an (R,N,3) Numpy array
+        :param vel: velocities of the particles of every replica as an (R,N,3) Numpy array
+        :param mass: mass of the particles as a float
+        :param boxdim: box dimensions of every replica as an (R,3) Numpy array
+        :param temperature: temperature of every replica as an (R,) Numpy array, or None
+        :param seed: seed of the random velocities of every replica as a list, or None
+        """
+        self.name = name
+        self.position = pos
+        self.velocity = vel
+        self.mass = mass
+        self.R, self.N = pos.shape[0:2]
+        self.boxdim = np.asarray(boxdim, dtype=float).reshape(self.R, 3)
+        self.temperature = temperature
+        self.seed = seed
+
+        # Box images crossed by every particle, as for ParticleSyst
+        self.image = np.zeros((self.R,self.N,3), dtype=np.int64)
+
+        # Forces, potentials and virials of the last force evaluation, cached by the integrator
+        self.force = None
+        self.potential = None
+        self.virial = None
+
+    def __str__(self):
+        """
+        Print the name, number of replicas and number of particles
+
+        :param ReplicaSyst: ReplicaSyst instance
+        :return: string with name, replicas and particles
+        """
+        return str(self.name) + ": " + str(self.R) + " replicas of " + str(self.N) + " particles"
+
+    @staticmethod
+    def lattice(name, R, N, rho, temp, seed=None, kind="fcc", mass=1.0):
+        """
+        Creates R replicas of N particles on a cubic lattice with Maxwell-Boltzmann velocities, as MDUtilities does for a single system.
+        The density, temperature and seed can be different for every replica.
+
+        :param name: name of system as a string
+        :param R: number of replicas as an integer
+        :param N: number of particles per replica as an integer
+        :param rho: density as a float or a sequence of R floats
+        :param temp: temperature as a float or a sequence of R floats
+        :param seed: seeds of the random velocities as a sequence of R integers, or a single seed from which the seeds of the replicas are drawn, or None
+        :param kind: type of lattice, "sc", "bcc" or "fcc"
+        :param mass: mass of the particles as a float
+        :return: ReplicaSyst instance
+        """
+        rho = np.broadcast_to(np.asarray(rho, dtype=float), (R,))
+        temp = np.broadcast_to(np.asarray(temp, dtype=float), (R,))
+        if seed is None or np.ndim(seed) == 0:
+            seed = np.random.SeedSequence(seed).generate_state(R).tolist()
+
+        # Sites of a lattice of unit spacing, scaled to the density of every replica
+        nDim = int(float((N-1)/len(md.LATTICES[kind]))**(1./3.))+1
+        sites, cells = md.lattice(nDim, 1.0, kind)
+        delta = (N/(rho*nDim**3))**(1./3.)
+        position = sites[np.newaxis,:N,:]*delta[:,np.newaxis,np.newaxis]
+        boxdim = cells[np.newaxis,:]*delta[:,np.newaxis]
+
+        # Gaussian velocities from the generator of every replica
+        velocity = np.stack([np.random.default_rng(s).standard_normal((N,3)) for s in seed])
+
+        replicas = ReplicaSyst(name, position, velocity, mass, boxdim, np.array(temp), list(seed))
+        replicas.settemperature(temp)
+        return replicas
+
+    def settemperature(self, temp):
+        """
+        Removes the centre-of-mass motion of every replica and rescales its velocities to its exact temperature
+
+        :param ReplicaSyst: ReplicaSyst instance
+        :param temp: temperature as a float or a sequence of R floats
+        """
+        self.velocity -= np.mean(self.velocity, axis=1, keepdims=True)
+        vsq = np.einsum("rij,rij->r", self.velocity, self.velocity)
+        scale = np.sqrt(3*self.N*np.asarray(temp)/(self.mass*np.where(vsq > 0., vsq, 1.)))
+        self.velocity *= scale.reshape(-1,1,1)
+
+    def kineticEnergy(self):
+        """
+        Computes the kinetic energy of every replica
+
+        :param ReplicaSyst: ReplicaSyst instance
+        :return: kinetic energies as an (R,) Numpy array
+        """
+        return 0.5*self.mass*np.einsum("rij,rij->r", self.velocity, self.velocity)
+
+    def replica(self, r):
+        """
+        Copies one replica into a ParticleSyst instance, to be used with the output routines of a single system
+
+        :param ReplicaSyst: ReplicaSyst instance
+        :param r: index of the replica as an integer
+        :return: ParticleSyst instance and box dimensions as a (1,3) Numpy array
+        """
+        syst = P.fromarrays(str(self.name) + str(r), self.position[r], self.velocity[r], self.mass)
+        syst.image = np.copy(self.image[r])
+        return syst, np.copy(self.boxdim[r])
+
+
+# Cache of the pair indices of all replicas in the flattened (R*N) arrays, keyed by number of replicas and particles
+_replicapairs = {}
+
+def replicapairs(R, N):
+    """
+    Returns the indices of every pair of particles of every replica in the flattened (R*N,3) arrays, replica by replica, each pair only once.
+
+    :param R: number of replicas as an integer
+    :param N: number of particles per replica as an integer
+    :return i, j: two Numpy arrays of flattened particle indices where the pth pair is (i[p], j[p])
+    """
+    if (R, N) not in _replicapairs:
+        i, j = lj.allpairs(N)
+        offset = N*np.arange(R)[:,np.newaxis]
+        _replicapairs[(R, N)] = ((offset + i).ravel(), (offset + j).ravel())
+    return _replicapairs[(R, N)]
+
+def ljreplicas(replicas, Rc, cutoff="truncated"):
+    """
+    Computes the Lennard-Jones forces, potentials and virials of every replica over all pairs, for all replicas in the same array operations.
+    The replicas are flattened into one list of pairs, gathered with np.take, and the pairs within the cutoff are scattered back with np.bincount as in LennardJones.ljkernel.
+
+    :param replicas: ReplicaSyst instance
+    :param Rc: cutoff radius as a float, or of every replica as an (R,) Numpy array
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :return: forces as an (R,N,3) Numpy array, potentials as an (R,N) Numpy array and virials as an (R,) Numpy array
+    """
+    R, N = replicas.R, replicas.N
+
+    # Cutoff radius and shifts at the cutoff of every replica
+    Rc = np.ascontiguousarray(np.broadcast_to(np.asarray(Rc, dtype=float), (R,)))
+    Vc, Fc = (np.ascontiguousarray(np.broadcast_to(shift, (R,)), dtype=float) for shift in lj.cutoffshift(Rc, cutoff))
+
+    # Compiled kernel, parallel over replicas, with the numba backend
+    if Backend.usenumba():
+        return Backend.ljreplicas(replicas.position, replicas.boxdim, Rc, Vc, Fc)
+
+    i, j = replicapairs(R, N)
+    position = replicas.position.reshape(R*N, 3)
+
+    # Minimum image vector separation of every pair of every replica, in its own box
+    rvec = (np.take(position, i, axis=0) - np.take(position, j, axis=0)).reshape(R, -1, 3)
+    boxdim = replicas.boxdim[:,np.newaxis,:]
+    shift = rvec*(1./boxdim)
+    np.rint(shift, out=shift)
+    shift *= boxdim
+    rvec -= shift
+    rsq = np.einsum("rpk,rpk->rp", rvec, rvec)
+
+    # Cutoff radius condition
+    inside = (rsq < np.square(Rc).reshape(-1,1)).ravel()
+    i = i[inside]
+    j = j[inside]
+    rvec = rvec.reshape(-1,3)[inside]
+    replica = i//N
+
+    # Pair terms with the shifts of the replica of every pair
+    if cutoff == "truncated":
+        pairpotential, pairvirial, r2inv = lj.ljpairterms(rsq.ravel()[inside], Rc)
+    else:
+        pairpotential, pairvirial, r2inv = lj.ljpairterms(rsq.ravel()[inside], Rc[replica], Vc[replica], Fc[replica])
+    fvec = (pairvirial*r2inv)[:,np.newaxis]*rvec
+
+    # Add the pair force to particle i and its opposite to particle j
+    force = np.empty(shape=(R*N,3))
+    for k in range(0,3):
+        force[:,k] = np.bincount(i, fvec[:,k], minlength=R*N) - np.bincount(j, fvec[:,k], minlength=R*N)
+
+    # Every pair potential contributes to the potential of both particles, and every pair virial to its replica
+    potential = np.bincount(i, pairpotential, minlength=R*N) + np.bincount(j, pairpotential, minlength=R*N)
+    virial = np.bincount(replica, pairvirial, minlength=R)
+
+    return force.reshape(R,N,3), potential.reshape(R,N), virial
+
+def PBCreplicas(replicas):
+    """
+    Puts the particles of every replica back in its box in place, counting the box images crossed, as PBC.PBCpos does for a single system
+
+    :param replicas: ReplicaSyst instance
+    :return: positions as an (R,N,3) Numpy array
+    """
+    boxdim = replicas.boxdim[:,np.newaxis,:]
+    replicas.image += np.floor_divide(replicas.position, boxdim).astype(np.int64)
+    np.mod(replicas.position, boxdim, out=replicas.position)
+    return replicas.position
+
+def thermo(replicas, Rc, cutoff="truncated"):
+    """
+    Computes the observables of every replica, from the cached forces when they are available
+
+    :param replicas: ReplicaSyst instance
+    :param Rc: cutoff radius as a float, or of every replica as an (R,) Numpy array
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :return: Observables.Thermo record whose fields are (R,) Numpy arrays, and (R,3) for the momentum
+    """
+    if replicas.potential is None:
+        replicas.force, replicas.potential, replicas.virial = ljreplicas(replicas, Rc, cutoff)
+
+    KE = replicas.kineticEnergy()
+    PE = 0.5*np.sum(replicas.potential, axis=1)
+    volume = np.prod(replicas.boxdim, axis=1)
+    temperature = 2.*KE/(3.*replicas.N)
+    pressure = (2.*KE + replicas.virial)/(3.*volume)
+    momentum = replicas.mass*np.sum(replicas.velocity, axis=1)
+    return obs.Thermo(KE, PE, KE + PE, temperature, pressure, momentum)
+
+
+class ReplicaVerlet(object):
+
+    def __init__(self, replicas, R_c, cutoff="truncated"):
+        """
+        Initialise a velocity Verlet integrator of all replicas at once, carrying the forces over from one step to the next
+
+        :param replicas: ReplicaSyst instance
+        :param R_c: cutoff radius as a float, or of every replica as an (R,) Numpy array
+        :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+        """
+        lj.cutoffshift(1., cutoff)
+        self.replicas = replicas
+        self.R_c = R_c
+        self.cutoff = cutoff
+
+        # Number of force evaluations performed
+        self.forcecalls = 0
+
+    def computeforces(self):
+        """
+        Computes the forces, potentials and virials of all replicas and caches them on the replicas
+
+        :param ReplicaVerlet: ReplicaVerlet instance
+        :return: forces as an (R,N,3) Numpy array
+        """
+        replicas = self.replicas
+        replicas.force, replicas.potential, replicas.virial = ljreplicas(replicas, self.R_c, self.cutoff)
+        self.forcecalls += 1
+        return replicas.force
+
+    def step(self, dt):
+        """
+        Performs one velocity Verlet step of all replicas
+
+        :param ReplicaVerlet: ReplicaVerlet instance
+        :param dt: timestep as a float
+        :return: forces at the new positions as an (R,N,3) Numpy array
+        """
+        replicas = self.replicas
+        force = replicas.force
+        if force is None:
+            force = self.computeforces()
+
+        # Second order position update dt*(v + dt/2m f), as in ParticleSyst.leapPos2nd, and periodic boundary conditions
+        replicas.position += dt*(replicas.velocity + 0.5*dt/replicas.mass*force)
+        PBCreplicas(replicas)
+
+        # Velocity update with the average of the old and new forces
+        force_new = self.computeforces()
+        replicas.velocity += dt/replicas.mass*(0.5*(force + force_new))
+        return force_new
@@ -0,0 +1,404 @@
+"""
+Thermostat and Barostat Module
+
+Constant temperature and constant pressure integration layered on the velocity Verlet integrators of VelVerlet: a thermostat or barostat wraps an integrator and has the same step method, so that they can be stacked, e.g. BerendsenBarostat(NoseHoover(VelocityVerlet(...))).
+The Berendsen, Nose-Hoover and Langevin thermostats scale or randomise all velocities at once, and the Berendsen barostat scales the positions and the box dimensions in place, together with the Verlet neighbour list, so that every holder of the box sees the new box.
+The temperature is 2/3 of the kinetic energy per particle, as in Observables.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import math
+import numpy as np
+import LennardJones as lj
+
+# Thermostats by name, None for constant energy
+THERMOSTATS = ("berendsen", "nosehoover", "langevin")
+
+
+class Thermostat(object):
+
+    def __init__(self, integrator, temp, tau):
+        """
+        Initialise a thermostat wrapping an integrator
+
+        :param integrator: integrator with a step(dt) method and syst and boxdim attributes, such as a VelVerlet.VelocityVerlet instance
+        :param temp: target temperature as a float
+        :param tau: relaxation time of the temperature as a float
+        """
+        self.integrator = integrator
+        self.syst = integrator.syst
+        self.boxdim = integrator.boxdim
+        self.R_c = integrator.R_c
+        self.neighbours = getattr(integrator, "neighbours", None)
+        self.temp = temp
+        self.tau = tau
+
+    def __str__(self):
+        """
+        Print the thermostat, target temperature and relaxation time
+
+        :param Thermostat: Thermostat instance
+        :return: string with thermostat, temperature and relaxation time
+        """
+        return type(self).__name__ + " thermostat at temperature " + str(self.temp) + " with relaxation time " + str(self.tau)
+
+    def temperature(self):
+        """
+        Computes the instantaneous temperature of the system
+
+        :param Thermostat: Thermostat instance
+        :return: temperature as a float
+        """
+        return 2.*self.syst.kineticEnergy()/(3.*self.syst.N)
+
+    def computeforces(self):
+        """
+        Computes the forces at the current positions with the wrapped integrator
+
+        :param Thermostat: Thermostat instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        return self.integrator.computeforces()
+
+    def positionschanged(self):
+        """
+        Brings the cached forces of the wrapped integrator up to date after the positions have been changed
+
+        :param Thermostat: Thermostat instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        return self.integrator.positionschanged()
+
+    def step(self, dt):
+        """
+        Performs one step of the wrapped integrator
+
+        :param Thermostat: Thermostat instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        return self.integrator.step(dt)
+
+    def state(self):
+        """
+        Returns the state of the thermostat, to be saved in a checkpoint
+
+        :param Thermostat: Thermostat instance
+        :return: dictionary of Numpy arrays
+        """
+        return {}
+
+    def restore(self, state):
+        """
+        Restores a state saved in a checkpoint
+
+        :param Thermostat: Thermostat instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        pass
+
+
+class Berendsen(Thermostat):
+
+    def step(self, dt):
+        """
+        Performs one step of the wrapped integrator and scales the velocities so that the temperature relaxes exponentially to the target with time constant tau
+
+        :param Berendsen: Berendsen instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        force = self.integrator.step(dt)
+        temperature = self.temperature()
+        if temperature > 0.:
+            self.syst.velocity *= math.sqrt(max(0., 1. + dt/self.tau*(self.temp/temperature - 1.)))
+        return force
+
+
+class NoseHoover(Thermostat):
+
+    def __init__(self, integrator, temp, tau):
+        """
+        Initialise a Nose-Hoover thermostat, whose friction xi follows the difference between the kinetic energy and its target with a thermostat mass set by the period tau of its oscillations
+
+        :param integrator: integrator with a step(dt) method and syst and boxdim attributes, such as a VelVerlet.VelocityVerlet instance
+        :param temp: target temperature as a float
+        :param tau: period of the oscillations of the temperature as a float
+        """
+        Thermostat.__init__(self, integrator, temp, tau)
+        self.dof = 3*self.syst.N
+        self.Q = self.dof*temp*tau*tau
+
+        # Friction and its time integral, which enters the conserved energy
+        self.xi = 0.
+        self.eta = 0.
+
+    def halfstep(self, dt):
+        """
+        Advances the friction by half a timestep and scales the velocities by half a timestep of friction
+
+        :param NoseHoover: NoseHoover instance
+        :param dt: timestep as a float
+        """
+        syst = self.syst
+        self.xi += 0.5*dt*(2.*syst.kineticEnergy() - self.dof*self.temp)/self.Q
+        syst.velocity *= math.exp(-0.5*dt*self.xi)
+        self.eta += 0.5*dt*self.xi
+
+    def step(self, dt):
+        """
+        Performs one step of the wrapped integrator between two half steps of the thermostat, in the symmetric order which keeps the integration time reversible
+
+        :param NoseHoover: NoseHoover instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        self.halfstep(dt)
+        force = self.integrator.step(dt)
+        syst = self.syst
+        syst.velocity *= math.exp(-0.5*dt*self.xi)
+        self.eta += 0.5*dt*self.xi
+        self.xi += 0.5*dt*(2.*syst.kineticEnergy() - self.dof*self.temp)/self.Q
+        return force
+
+    def energy(self):
+        """
+        Computes the energy of the thermostat, which added to the total energy of the system is conserved
+
+        :param NoseHoover: NoseHoover instance
+        :return: energy of the thermostat as a float
+        """
+        return 0.5*self.Q*self.xi*self.xi + self.dof*self.temp*self.eta
+
+    def state(self):
+        """
+        Returns the friction and its time integral, to be saved in a checkpoint
+
+        :param NoseHoover: NoseHoover instance
+        :return: dictionary of Numpy arrays
+        """
+        return {"xi": np.array(self.xi), "eta": np.array(self.eta)}
+
+    def restore(self, state):
+        """
+        Restores a state saved in a checkpoint
+
+        :param NoseHoover: NoseHoover instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        self.xi = float(state["xi"])
+        self.eta = float(state["eta"])
+
+
+class Langevin(Thermostat):
+
+    def __init__(self, integrator, temp, tau, seed=None):
+        """
+        Initialise a Langevin thermostat with friction 1/tau, whose random forces come from their own random number generator
+
+        :param integrator: integrator with a step(dt) method and syst and boxdim attributes, such as a VelVerlet.VelocityVerlet instance
+        :param temp: target temperature as a float
+        :param tau: inverse of the friction coefficient as a float
+        :param seed: seed of the random forces, None for different forces every run
+        """
+        Thermostat.__init__(self, integrator, temp, tau)
+        self.generator = np.random.default_rng(seed)
+
+    def kick(self, dt):
+        """
+        Exact solution of the friction and random force over half a timestep, for all velocities at once
+
+        :param Langevin: Langevin instance
+        :param dt: timestep as a float
+        """
+        syst = self.syst
+        c = math.exp(-0.5*dt/self.tau)
+        syst.velocity *= c
+        syst.velocity += math.sqrt((1. - c*c)*self.temp/syst.mass)*self.generator.standard_normal(syst.velocity.shape)
+
+    def step(self, dt):
+        """
+        Performs one step of the wrapped integrator between two half steps of friction and random force
+
+        :param Langevin: Langevin instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        self.kick(dt)
+        force = self.integrator.step(dt)
+        self.kick(dt)
+        return force
+
+    def state(self):
+        """
+        Returns the state of the random number generator, to be saved in a checkpoint, with its 128 bit integers as strings
+
+        :param Langevin: Langevin instance
+        :return: dictionary of Numpy arrays
+        """
+        generator = self.generator.bit_generator.state
+        return {"key": np.array(str(generator["state"]["state"])), "inc": np.array(str(generator["state"]["inc"])),
+                "hasuint32": np.array(generator["has_uint32"]), "uinteger": np.array(generator["uinteger"])}
+
+    def restore(self, state):
+        """
+        Restores a state saved in a checkpoint
+
+        :param Langevin: Langevin instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        self.generator.bit_generator.state = {"bit_generator": "PCG64", "state": {"state": int(str(state["key"])), "inc": int(str(state["inc"]))},
+                                              "has_uint32": int(state["hasuint32"]), "uinteger": int(state["uinteger"])}
+
+
+class BerendsenBarostat(object):
+
+    def __init__(self, integrator, pressure, tau=1.0, compressibility=0.1, interval=10, tail=False, cutoff="truncated"):
+        """
+        Initialise a Berendsen barostat wrapping an integrator, which every interval steps scales the positions and box so that the pressure relaxes to the target with time constant tau.
+        The box dimensions array of the integrator is scaled in place, so that everything holding it sees the new box, and the integrator brings its forces up to date at the scaled positions with its positionschanged method.
+
+        :param integrator: integrator or thermostat with step(dt) and positionschanged() methods and syst and boxdim attributes
+        :param pressure: target pressure as a float
+        :param tau: relaxation time of the pressure as a float
+        :param compressibility: isothermal compressibility of the system as a float, which sets the size of the moves
+        :param interval: number of timesteps between moves of the box as an integer
+        :param tail: include the tail correction of LennardJones.tailcorrection in the pressure
+        :param cutoff: treatment of the cutoff of the force field, "truncated" or "shifted" with tail
+        """
+        if tail and cutoff == "forceshifted":
+            raise ValueError("There are no tail corrections for the force shifted potential")
+        self.integrator = integrator
+        self.syst = integrator.syst
+        self.boxdim = integrator.boxdim
+        self.R_c = integrator.R_c
+        self.neighbours = getattr(integrator, "neighbours", None)
+        self.pressure = pressure
+        self.tau = tau
+        self.compressibility = compressibility
+        self.interval = interval
+        self.tail = tail
+        self.cutoff = cutoff
+        self.steps = 0
+
+    def __str__(self):
+        """
+        Print the target pressure and relaxation time
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :return: string with pressure and relaxation time
+        """
+        return "BerendsenBarostat at pressure " + str(self.pressure) + " with relaxation time " + str(self.tau)
+
+    def currentpressure(self):
+        """
+        Computes the pressure of the system from the virial of the last force evaluation
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :return: pressure as a float
+        """
+        syst = self.syst
+        volume = np.prod(self.boxdim)
+        pressure = (2.*syst.kineticEnergy() + syst.virial)/(3.*volume)
+        if self.tail:
+            pressure += lj.tailcorrection(syst.N, volume, self.R_c, self.cutoff)[1]
+        return pressure
+
+    def rescale(self, scale):
+        """
+        Scales the positions, the box dimensions and the Verlet neighbour list in place by the same factor
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :param scale: factor of the lengths as a float
+        """
+        self.syst.position *= scale
+        self.boxdim *= scale
+        if hasattr(self.neighbours, "rescale"):
+            self.neighbours.rescale(scale)
+
+    def computeforces(self):
+        """
+        Computes the forces at the current positions with the wrapped integrator
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        return self.integrator.computeforces()
+
+    def positionschanged(self):
+        """
+        Brings the cached forces of the wrapped integrator up to date after the positions have been changed
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        return self.integrator.positionschanged()
+
+    def step(self, dt):
+        """
+        Performs one step of the wrapped integrator, followed every interval steps by a move of the box, limited to 1% of its lengths
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        force = self.integrator.step(dt)
+        self.steps += 1
+        if self.steps%self.interval != 0:
+            return force
+
+        scale = (1. - self.compressibility*self.interval*dt/self.tau*(self.pressure - self.currentpressure()))**(1./3.)
+        self.rescale(min(max(scale, 0.99), 1.01))
+        return self.positionschanged()
+
+    def state(self):
+        """
+        Returns the state of the wrapped thermostat, to be saved in a checkpoint
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :return: dictionary of Numpy arrays
+        """
+        state = {"steps": np.array(self.steps)}
+        if hasattr(self.integrator, "state"):
+            state.update(self.integrator.state())
+        return state
+
+    def restore(self, state):
+        """
+        Restores a state saved in a checkpoint
+
+        :param BerendsenBarostat: BerendsenBarostat instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        self.steps = int(state["steps"])
+        if hasattr(self.integrator, "restore"):
+            self.integrator.restore(state)
+
+
+def ensemble(integrator, thermostat=None, temp=1.0, tau=0.1, pressure=None, taup=1.0, seed=None, tail=False, cutoff="truncated"):
+    """
+    Wraps an integrator in a thermostat and a barostat
+
+    :param integrator: integrator with a step(dt) method, such as a VelVerlet.VelocityVerlet instance
+    :param thermostat: "berendsen", "nosehoover" or "langevin", None for constant energy
+    :param temp: target temperature as a float
+    :param tau: relaxation time of the thermostat as a float
+    :param pressure: target pressure as a float, None for a constant volume
+    :param taup: relaxation time of the barostat as a float
+    :param seed: seed of the random forces of the Langevin thermostat
+    :param tail: include the tail correction in the pressure of the barostat
+    :param cutoff: treatment of the cutoff of the force field, "truncated", "shifted" or "forceshifted"
+    :return: the wrapped integrator
+    """
+    if thermostat is not None and thermostat not in THERMOSTATS:
+        raise ValueError("Unknown thermostat " + str(thermostat) + ", must be one of " + ", ".join(THERMOSTATS))
+    if thermostat == "berendsen":
+        integrator = Berendsen(integrator, temp, tau)
+    elif thermostat == "nosehoover":
+        integrator = NoseHoover(integrator, temp, tau)
+    elif thermostat == "langevin":
+        integrator = Langevin(integrator, temp, tau, seed)
+    if pressure is not None:
+        integrator = BerendsenBarostat(integrator, pressure, taup, tail=tail, cutoff=cutoff)
+    return integrator
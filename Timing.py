@@ -0,0 +1,161 @@
+"""
+Timing Module
+
+Named phase timers for the main loop of the simulation: the time spent in every phase (force, integrate, wrap, neighbours, sample, io) is accumulated with a context manager around the code of that phase.
+Phases can be nested, e.g. the neighbour list rebuild inside the force evaluation inside the integration step, and every phase is only charged the time not spent in the phases nested in it, so that the phases add up to the time of the loop.
+The rates are reported in steps per second and in simulated time per day, in reduced units and in ns for argon.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import time
+import contextlib
+
+# Reduced unit of time of argon (sigma = 3.4 Angstrom, epsilon/kB = 120 K, m = 39.95 u) in ns
+ARGONTAU = 2.156e-3
+
+# Seconds in a day
+DAY = 86400.
+
+
+class PhaseTimers(object):
+
+    def __init__(self):
+        """
+        Initialise a PhaseTimers instance, started at its creation
+        """
+        # Time and number of calls of every phase, in the order they were first timed
+        self.times = {}
+        self.counts = {}
+
+        # Time of the nested phases of every open phase
+        self.nested = []
+        self.start = time.perf_counter()
+        self.stopped = None
+
+    def __str__(self):
+        """
+        Print the phases timed
+
+        :param PhaseTimers: PhaseTimers instance
+        :return: string with the names of the phases
+        """
+        return "PhaseTimers of " + ", ".join(self.times)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Times the code of a with block as the phase name, less the time of the phases nested in it
+
+        :param PhaseTimers: PhaseTimers instance
+        :param name: name of the phase as a string
+        """
+        start = time.perf_counter()
+        self.nested.append(0.)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.times[name] = self.times.get(name, 0.) + elapsed - self.nested.pop()
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if self.nested:
+                self.nested[-1] += elapsed
+
+    def reset(self):
+        """
+        Clears the times of all phases and starts the timers again
+
+        :param PhaseTimers: PhaseTimers instance
+        """
+        self.times = {}
+        self.counts = {}
+        self.start = time.perf_counter()
+        self.stopped = None
+
+    def stop(self):
+        """
+        Stops the clock of the timers, so that the rates and summary are those of the timed loop
+
+        :param PhaseTimers: PhaseTimers instance
+        """
+        self.stopped = time.perf_counter()
+
+    def elapsed(self):
+        """
+        Returns the time since the timers were started, up to when they were stopped
+
+        :param PhaseTimers: PhaseTimers instance
+        :return: time in seconds as a float
+        """
+        return (time.perf_counter() if self.stopped is None else self.stopped) - self.start
+
+    def rates(self, steps, dt):
+        """
+        Computes the rates of the simulation since the timers were started
+
+        :param PhaseTimers: PhaseTimers instance
+        :param steps: number of timesteps completed as an integer
+        :param dt: timestep in reduced units as a float
+        :return: steps per second, reduced time per day and ns per day for argon as floats
+        """
+        stepspersecond = steps/max(self.elapsed(), 1e-12)
+        tauperday = stepspersecond*dt*DAY
+        return stepspersecond, tauperday, tauperday*ARGONTAU
+
+    def line(self, steps, dt):
+        """
+        Formats the rates and the share of every phase of the time so far, for the progress log
+
+        :param PhaseTimers: PhaseTimers instance
+        :param steps: number of timesteps completed as an integer
+        :param dt: timestep in reduced units as a float
+        :return: log line as a string
+        """
+        elapsed = max(self.elapsed(), 1e-12)
+        stepspersecond, tauperday, nsperday = self.rates(steps, dt)
+        phases = ", ".join([name + " " + str(int(round(100.*value/elapsed))) + "%" for name, value in self.times.items()])
+        return "{0:.1f} steps/s, {1:.4g} ns/day, {2}".format(stepspersecond, nsperday, phases)
+
+    def summary(self, steps, dt):
+        """
+        Formats the rates and a table of the time, share of the loop, time per step and number of calls of every phase.
+        The time of the loop not spent in any phase is reported as other.
+
+        :param PhaseTimers: PhaseTimers instance
+        :param steps: number of timesteps completed as an integer
+        :param dt: timestep in reduced units as a float
+        :return: summary as a string
+        """
+        elapsed = max(self.elapsed(), 1e-12)
+        stepspersecond, tauperday, nsperday = self.rates(steps, dt)
+        lines = ["{0:d} steps in {1:.3f} s: {2:.2f} steps/s, {3:.4g} reduced time units/day, {4:.4g} ns/day for argon".format(steps, elapsed, stepspersecond, tauperday, nsperday),
+                 "phase          time (s)  share  per step (us)     calls"]
+        rows = list(self.times.items()) + [("other", elapsed - sum(self.times.values()))]
+        for name, value in rows:
+            lines.append("{0:12s}  {1:10.3f}  {2:4.0f}%  {3:13.1f}  {4:8d}".format(name, value, 100.*value/elapsed, 1e6*value/max(steps, 1), self.counts.get(name, 0)))
+        return "\n".join(lines)
+
+    def state(self):
+        """
+        Returns the time of every phase as a dictionary
+
+        :param PhaseTimers: PhaseTimers instance
+        :return: dictionary of phase names and times in seconds
+        """
+        return dict(self.times)
+
+
+class NullTimers(object):
+
+    def phase(self, name):
+        """
+        Does not time anything, for the code run without instrumentation
+
+        :param NullTimers: NullTimers instance
+        :param name: name of the phase as a string
+        :return: context manager doing nothing
+        """
+        return contextlib.nullcontext()
+
+# Timers of the components created without instrumentation
+NOTIMERS = NullTimers()
@@ -0,0 +1,241 @@
+"""
+Trajectory Module
+
+Writers of trajectory files, all used through write(system, k), flush() and close():
+* XYZWriter - text XYZ file for VMD, with frames formatted by ParticleSyst.printVMD
+* DCDWriter - binary CHARMM/NAMD DCD file readable by VMD, with single precision coordinates and the box as unit cell
+* MemmapWriter - preallocated single precision Numpy memory map of shape (frames, N, 3) saved as a .npy file
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import struct
+import numpy as np
+
+# Trajectory formats available to opentrajectory
+FORMATS = ("xyz", "dcd", "npy")
+
+
+class XYZWriter(object):
+
+    def __init__(self, fileName):
+        """
+        Initialise an XYZ trajectory writer
+
+        :param fileName: name of the trajectory file as a string
+        """
+        self.fileName = fileName
+        self.file = open(fileName, "w")
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, system, k):
+        """
+        Appends a frame to the trajectory
+
+        :param XYZWriter: XYZWriter instance
+        :param system: ParticleSyst instance
+        :param k: timestep number
+        """
+        self.file.write(system.printVMD(k))
+        self.frames += 1
+
+    def flush(self):
+        """
+        Writes the frames to disk
+
+        :param XYZWriter: XYZWriter instance
+        """
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the trajectory file
+
+        :param XYZWriter: XYZWriter instance
+        """
+        self.file.close()
+
+
+class DCDWriter(object):
+
+    def __init__(self, fileName, N, dt=1.0, interval=1, boxdim=None):
+        """
+        Initialise a DCD trajectory writer and write the file header, the number of frames is updated on close
+
+        :param fileName: name of the trajectory file as a string
+        :param N: number of particles as an integer
+        :param dt: timestep as a float
+        :param interval: number of timesteps between frames as an integer
+        :param boxdim: box dimensions as a (1,3) Numpy array, written with every frame if not None
+        """
+        self.fileName = fileName
+        self.N = N
+        self.boxdim = boxdim
+        self.frames = 0
+        self.file = open(fileName, "wb")
+
+        # Buffer of the x, y and z coordinates in single precision
+        self.buffer = np.empty((3,N), dtype=np.float32)
+
+        # Header: CORD, frames, first step, step interval, timestep, unit cell flag and CHARMM version
+        control = [0]*20
+        control[2] = interval
+        control[10] = 0 if boxdim is None else 1
+        control[19] = 24
+        header = b"CORD" + struct.pack("<9i", *control[0:9]) + struct.pack("<f", dt) + struct.pack("<10i", *control[10:20])
+        self._record(header)
+
+        # Title
+        title = "Created by LJModel".ljust(80).encode("ascii")
+        self._record(struct.pack("<i", 1) + title)
+
+        # Number of particles
+        self._record(struct.pack("<i", N))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _record(self, data):
+        """
+        Writes a Fortran unformatted record, the data being surrounded by its length in bytes
+
+        :param DCDWriter: DCDWriter instance
+        :param data: bytes of the record
+        """
+        marker = struct.pack("<i", len(data))
+        self.file.write(marker)
+        self.file.write(data)
+        self.file.write(marker)
+
+    def write(self, system, k):
+        """
+        Appends a frame to the trajectory
+
+        :param DCDWriter: DCDWriter instance
+        :param system: ParticleSyst instance
+        :param k: timestep number
+        """
+        if self.boxdim is not None:
+            # Unit cell as A, gamma, B, beta, alpha, C with right angles
+            a, b, c = self.boxdim
+            self._record(struct.pack("<6d", a, 90., b, 90., 90., c))
+
+        # Cast the positions into the single precision buffer, one record per coordinate
+        np.copyto(self.buffer, system.position.T, casting="same_kind")
+        for axis in range(3):
+            self._record(memoryview(self.buffer[axis]).cast("B"))
+        self.frames += 1
+
+    def _writeframes(self):
+        """
+        Writes the number of frames in the header, which is the first integer after the record marker and CORD
+
+        :param DCDWriter: DCDWriter instance
+        """
+        self.file.seek(8)
+        self.file.write(struct.pack("<i", self.frames))
+
+    def flush(self):
+        """
+        Updates the number of frames in the header and writes the frames to disk, so that the file is readable while the run goes on
+
+        :param DCDWriter: DCDWriter instance
+        """
+        self._writeframes()
+        self.file.seek(0, 2)
+        self.file.flush()
+
+    def close(self):
+        """
+        Writes the number of frames in the header and closes the trajectory file
+
+        :param DCDWriter: DCDWriter instance
+        """
+        if self.file.closed:
+            return
+        self._writeframes()
+        self.file.close()
+
+
+class MemmapWriter(object):
+
+    def __init__(self, fileName, N, nframes):
+        """
+        Initialise a trajectory stored as a preallocated single precision (nframes, N, 3) array memory mapped to a .npy file.
+        Frames that are not written are left as zeros.
+
+        :param fileName: name of the .npy file as a string
+        :param N: number of particles as an integer
+        :param nframes: number of frames to allocate as an integer
+        """
+        self.fileName = fileName
+        self.frames = 0
+        self.steps = np.zeros(nframes, dtype=np.int64)
+        self.array = np.lib.format.open_memmap(fileName, mode="w+", dtype=np.float32, shape=(nframes,N,3))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, system, k):
+        """
+        Copies the positions into the next frame of the memory map
+
+        :param MemmapWriter: MemmapWriter instance
+        :param system: ParticleSyst instance
+        :param k: timestep number
+        """
+        self.array[self.frames] = system.position
+        self.steps[self.frames] = k
+        self.frames += 1
+
+    def flush(self):
+        """
+        Writes the frames to disk
+
+        :param MemmapWriter: MemmapWriter instance
+        """
+        self.array.flush()
+
+    def close(self):
+        """
+        Flushes the memory map to disk
+
+        :param MemmapWriter: MemmapWriter instance
+        """
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+
+
+def opentrajectory(fileName, fmt, system, nframes=None, dt=1.0, interval=1, boxdim=None):
+    """
+    Opens a trajectory writer of the given format
+
+    :param fileName: name of the trajectory file as a string
+    :param fmt: format of the trajectory, "xyz", "dcd" or "npy"
+    :param system: ParticleSyst instance
+    :param nframes: number of frames, needed by the "npy" format
+    :param dt: timestep, used by the "dcd" format
+    :param interval: number of timesteps between frames, used by the "dcd" format
+    :param boxdim: box dimensions, used by the "dcd" format
+    :return: trajectory writer instance
+    """
+    if fmt == "xyz":
+        return XYZWriter(fileName)
+    if fmt == "dcd":
+        return DCDWriter(fileName, system.N, dt, interval, boxdim)
+    if fmt == "npy":
+        return MemmapWriter(fileName, system.N, nframes)
+    raise ValueError("Unknown trajectory format " + str(fmt) + ", must be one of " + ", ".join(FORMATS))
@@ -7,39 +7,261 @@ Created on Tue Feb 28 12:49:52 2017
 Author: Cara Lynch, Marina Ruiz Sanchez-Oro
 """
 
+import numpy as np
 from ParticleList import ParticleSyst as P
 import LennardJones as lj
+import PairPotential as pp
 import PBC
+from VerletList import VerletList
+from CellList import CellList
+import Timing as tm
+from Workspace import Workspace
 
 # Method to compute total energy of the system
-def totE(syst, boxdim, R_c):
+def totE(syst, boxdim, R_c, neighbours=None):
     """
     Calculates the total energy of the system
     
     :param syst: N body system represented as a ParticleSyst instance
     :param boxdim: box dimensions as a (1, N) numpy array
     :param R_c: cutoff radius
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
     :return: total energy of system as a float
     """
-    return P.kineticEnergy(syst) + lj.totPE(syst, boxdim, R_c)
+    return P.kineticEnergy(syst) + lj.totPE(syst, boxdim, R_c, neighbours)
 
-def VelVerlet(dt, syst, boxdim, R_c):
+def VelVerlet(dt, syst, boxdim, R_c, neighbours=None):
     """
-    Performs one velocity verlet time integration loop
+    Performs one velocity verlet time integration loop with a new VelocityVerlet integrator, starting from the forces at the current positions rather than cached ones.
+    The step is that of VelocityVerlet.step, but its buffers are allocated again on every call, so the integrator should be kept for more than one step.
     
     :param dt: timestep as a float
     :param syst: ParticleSyst instance representing the system
     :param boxdim: box dimensions as a (1,N) Numpy array
     :param R_c: cutoff radius
+    :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
     """
-    force = lj.ljforce(syst, boxdim, R_c)
-    # Update particle position
-    P.leapPos2nd(syst, dt, force)
+    integrator = VelocityVerlet(syst, boxdim, R_c, neighbours)
+    integrator.computeforces()
+    integrator.step(dt)
+
+def forcebuffers(work, syst):
+    """
+    Returns the workspace buffers the next forces and potentials of a system are written to, followed by a buffer of the virials of the particles for the force field to sum in.
+    There are two pairs of force and potential buffers and the pair not holding the forces cached on the system is returned, as the step still needs those forces.
+    
+    :param work: Workspace instance of the integrator
+    :param syst: ParticleSyst instance representing the system
+    :return: (N,3), (N,) and (N,) Numpy arrays
+    """
+    slot = 1 if syst.force is work.buffers.get(("force", 0)) else 0
+    return work.buffer(("force", slot), (syst.N,3)), work.buffer(("potential", slot), (syst.N,)), work.buffer("virial", (syst.N,))
+
+
+class VelocityVerlet(object):
+    
+    def __init__(self, syst, boxdim, R_c, neighbours=None, forcefield=None, timers=None):
+        """
+        Initialise a VelocityVerlet integrator which carries the forces over from one step to the next.
+        The forces, potentials and virial of the last force evaluation are cached on the ParticleSyst instance.
+        The positions and velocities are updated in place and the forces written to preallocated buffers, so that after the first step a step only allocates arrays when the neighbour list is rebuilt
+        or the force field is a vectorised numpy kernel.
+        
+        :param syst: ParticleSyst instance representing the system
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param R_c: cutoff radius
+        :param neighbours: neighbour backend such as a CellList instance, all pairs are used if None
+        :param forcefield: function with the arguments and returns of LennardJones.ljpairs, such as a ParallelForce instance, LennardJones.ljpairs if None
+        :param timers: Timing.PhaseTimers instance timing the force, wrap and integrate phases, no timing if None
+        """
+        self.syst = syst
+        self.boxdim = boxdim
+        self.R_c = R_c
+        self.neighbours = neighbours
+        self.forcefield = lj.ljpairs if forcefield is None else forcefield
+        self.timers = tm.NOTIMERS if timers is None else timers
+        
+        # Buffers of the forces and of the updates of the step
+        self.work = Workspace()
+        
+        # Number of force evaluations performed
+        self.forcecalls = 0
+    
+    def computeforces(self):
+        """
+        Computes the forces, potentials and virial at the current positions and caches them on the system.
+        Must be called again if the positions are changed outside of the integrator.
+        The forces are overwritten two evaluations later, so they must be copied to be kept for longer.
+        
+        :param VelocityVerlet: VelocityVerlet instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        syst = self.syst
+        with self.timers.phase("force"):
+            syst.force, syst.potential, syst.virial = self.forcefield(syst, self.boxdim, self.R_c, self.neighbours, out=forcebuffers(self.work, syst))
+        self.forcecalls += 1
+        return syst.force
+    
+    def positionschanged(self):
+        """
+        Brings the cached forces up to date after the positions have been changed outside of the integrator, e.g. scaled by a barostat
+        
+        :param VelocityVerlet: VelocityVerlet instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        return self.computeforces()
+    
+    def step(self, dt):
+        """
+        Performs one velocity verlet time integration loop, starting from the cached forces of the previous step
+        
+        :param VelocityVerlet: VelocityVerlet instance
+        :param dt: timestep as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        syst = self.syst
+        
+        # Forces at the current positions, only computed on the first step
+        force = syst.force
+        if force is None:
+            force = self.computeforces()
+        
+        # Update particle position
+        with self.timers.phase("integrate"):
+            P.leapPos2nd(syst, dt, force, self.work)
+        
+        # Apply periodic boundary conditions to position update
+        with self.timers.phase("wrap"):
+            syst.position = PBC.PBCpos(syst, self.boxdim, self.work)
+        # Update force, which is also the starting force of the next step
+        force_new = self.computeforces()
+        # Update particle velocity based on average and current new forces
+        with self.timers.phase("integrate"):
+            average = self.work.buffer("average", force.shape)
+            np.add(force, force_new, out=average)
+            average *= 0.5
+            P.leapVelocity(syst, dt, average, self.work)
+        return force_new
+
+
+class RESPA(object):
+    
+    def __init__(self, syst, boxdim, R_c, neighbours=None, forcefield=None, R_in=2.0, nsteps=4, width=0.3, skin=0.3, timers=None):
+        """
+        Initialise a reversible multiple timestep (r-RESPA) integrator.
+        The Lennard-Jones potential is split at the inner radius R_in into a stiff short range part, integrated with nsteps velocity Verlet steps of dt/nsteps,
+        and the slowly varying rest up to the cutoff, whose force is only evaluated once per step of dt.
+        The short range part is the Lennard-Jones potential switched off smoothly between R_in - width and R_in, tabulated in a PairPotential.PairTable with its own Verlet list,
+        and the long range force is the full force less the short range force.
+        The full forces, potentials and virial are cached on the ParticleSyst instance at the end of every step, and the updates are made in preallocated buffers, as with VelocityVerlet.
+        
+        :param syst: ParticleSyst instance representing the system
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param R_c: cutoff radius
+        :param neighbours: neighbour backend of the full forces such as a CellList instance, all pairs are used if None
+        :param forcefield: function with the arguments and returns of LennardJones.ljpairs for the full forces, LennardJones.ljpairs if None
+        :param R_in: inner radius, smaller than the cutoff radius, as a float
+        :param nsteps: number of short range steps per step as an integer
+        :param width: width of the switching region below the inner radius as a float
+        :param skin: skin distance of the Verlet list of the short range forces as a float
+        :param timers: Timing.PhaseTimers instance timing the force, wrap and integrate phases, no timing if None
+        """
+        if not (0. < R_in - width and R_in < R_c):
+            raise ValueError("The inner radius must be between the switching width and the cutoff radius")
+        self.syst = syst
+        self.boxdim = boxdim
+        self.R_c = R_c
+        self.neighbours = neighbours
+        self.forcefield = lj.ljpairs if forcefield is None else forcefield
+        self.R_in = R_in
+        self.nsteps = nsteps
+        self.timers = tm.NOTIMERS if timers is None else timers
+        
+        # Short range part of the potential and its neighbour list
+        self.inner = pp.PairTable(pp.switched(pp.lennardjones, R_in, width), R_in)
+        self.innerneighbours = VerletList(skin, CellList(), timers)
+        self.innerforce = None
+        
+        # Buffers of the forces and of the updates of the step
+        self.work = Workspace()
+        
+        # Number of full and short range force evaluations performed
+        self.forcecalls = 0
+        self.innercalls = 0
+    
+    def computeinner(self):
+        """
+        Computes the short range forces at the current positions
+        
+        :param RESPA: RESPA instance
+        :return: short range force on every particle as an (N,3) Numpy array
+        """
+        N = self.syst.N
+        with self.timers.phase("force"):
+            self.innerforce = self.inner(self.syst, self.boxdim, self.R_in, self.innerneighbours, out=(self.work.buffer("innerforce", (N,3)), self.work.buffer("innerpotential", (N,))))[0]
+        self.innercalls += 1
+        return self.innerforce
+    
+    def computeforces(self):
+        """
+        Computes the full forces, potentials and virial at the current positions and caches them on the system.
+        
+        :param RESPA: RESPA instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        syst = self.syst
+        with self.timers.phase("force"):
+            syst.force, syst.potential, syst.virial = self.forcefield(syst, self.boxdim, self.R_c, self.neighbours, out=forcebuffers(self.work, syst))
+        self.forcecalls += 1
+        return syst.force
     
-    # Apply periodic boundary conditions to position update
-    syst.position = PBC.PBCpos(syst, boxdim)
-    # Update force
-    force_new =  lj.ljforce(syst, boxdim, R_c)
-    # Update particle velocity based on average and current new forces
-    P.leapVelocity(syst, dt, 0.5*(force + force_new))
+    def positionschanged(self):
+        """
+        Brings the cached full and short range forces up to date after the positions have been changed outside of the integrator, e.g. scaled by a barostat
+        
+        :param RESPA: RESPA instance
+        :return: force on every particle as an (N,3) Numpy array
+        """
+        self.computeinner()
+        return self.computeforces()
     
+    def step(self, dt):
+        """
+        Performs one r-RESPA step: half a kick of the long range forces, nsteps velocity Verlet steps of the short range forces, and half a kick of the new long range forces
+        
+        :param RESPA: RESPA instance
+        :param dt: timestep of the long range forces as a float
+        :return: force on every particle at the new positions as an (N,3) Numpy array
+        """
+        syst = self.syst
+        
+        # Forces at the current positions, only computed on the first step
+        if syst.force is None:
+            self.computeforces()
+        if self.innerforce is None:
+            self.computeinner()
+        h = dt/self.nsteps
+        outer = self.work.buffer("outerforce", syst.force.shape)
+        
+        # Half kick of the long range forces
+        with self.timers.phase("integrate"):
+            np.subtract(syst.force, self.innerforce, out=outer)
+            P.leapVelocity(syst, 0.5*dt, outer, self.work)
+        
+        # Velocity Verlet steps of the short range forces, with the periodic boundary conditions after every drift
+        for n in range(self.nsteps):
+            with self.timers.phase("integrate"):
+                P.leapVelocity(syst, 0.5*h, self.innerforce, self.work)
+                P.leapPos1st(syst, h, self.work)
+            with self.timers.phase("wrap"):
+                syst.position = PBC.PBCpos(syst, self.boxdim, self.work)
+            self.computeinner()
+            with self.timers.phase("integrate"):
+                P.leapVelocity(syst, 0.5*h, self.innerforce, self.work)
+        
+        # Half kick of the long range forces at the new positions
+        force_new = self.computeforces()
+        with self.timers.phase("integrate"):
+            np.subtract(force_new, self.innerforce, out=outer)
+            P.leapVelocity(syst, 0.5*dt, outer, self.work)
+        return force_new
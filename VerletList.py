@@ -0,0 +1,176 @@
+"""
+Verlet List Module
+
+Verlet neighbour list with a skin distance: the pairs closer than Rc + skin are stored and reused across time steps until a particle has moved more than half the skin since the list was built.
+A VerletList instance can be passed as the neighbour backend of the LennardJones force and energy routines.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+import LennardJones as lj
+import PBC
+import Timing as tm
+from Workspace import Workspace
+
+
+class VerletList(object):
+
+    def __init__(self, skin, celllist=None, timers=None):
+        """
+        Initialise a VerletList instance
+
+        :param skin: skin distance added to the cutoff radius as a float
+        :param celllist: CellList instance used to build the list, the list is built from all pairs if None
+        :param timers: Timing.PhaseTimers instance timing the rebuilds as the neighbours phase, no timing if None
+        """
+        self.skin = skin
+        self.celllist = celllist
+        self.timers = tm.NOTIMERS if timers is None else timers
+
+        # Buffers of the displacement check made at every call
+        self.work = Workspace()
+
+        # Pairs of the list and the state of the system when it was built
+        self.i = None
+        self.j = None
+        self.reference = None
+        self.boxdim = None
+        self.Rc = None
+
+        # Largest change of a pair distance within the list radius caused by scaling the box since the list was built
+        self.strain = 0.
+
+        # Counters to tune the skin distance
+        self.rebuilds = 0
+        self.calls = 0
+
+    def __str__(self):
+        """
+        Print the skin distance and the rebuild statistics
+
+        :param VerletList: VerletList instance
+        :return: string with skin, number of rebuilds and number of calls
+        """
+        return "VerletList with skin " + str(self.skin) + " rebuilt " + str(self.rebuilds) + " times over " + str(self.calls) + " calls"
+
+    def maxdisplacement(self, system):
+        """
+        Computes the largest displacement of a particle since the list was built, according to the MIC
+
+        :param VerletList: VerletList instance
+        :param system: ParticleSyst instance
+        :return: largest displacement as a float
+        """
+        displacement = self.work.buffer("displacement", self.reference.shape, self.reference.dtype)
+        np.subtract(system.position, self.reference, out=displacement)
+        PBC.MIC(displacement, self.boxdim, self.work)
+        distance = self.work.buffer("distance", (len(displacement),), displacement.dtype)
+        np.einsum("ij,ij->i", displacement, displacement, out=distance)
+        return np.sqrt(np.max(distance))
+
+    def needsrebuild(self, system, boxdim, Rc):
+        """
+        Checks whether the list must be rebuilt, which is when it has never been built, the system or box has changed, the cutoff is larger than the one of the list or a particle has moved more than half the skin.
+        Scaling the box with rescale uses up part of the skin.
+        A smaller cutoff reuses the list, so that it can also serve the RDF.
+
+        :param VerletList: VerletList instance
+        :param system: ParticleSyst instance
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :return: True if the list must be rebuilt
+        """
+        if self.reference is None or len(self.reference) != system.N or Rc > self.Rc:
+            return True
+        if not np.array_equal(boxdim, self.boxdim):
+            return True
+        return self.maxdisplacement(system) > 0.5*(self.skin - self.strain)
+
+    def build(self, system, boxdim, Rc):
+        """
+        Builds the list of pairs closer than Rc + skin, from the cell list if there is one and from all pairs otherwise
+
+        :param VerletList: VerletList instance
+        :param system: ParticleSyst instance with positions inside the box
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        """
+        rlist = Rc + self.skin
+
+        # Candidate pairs
+        if self.celllist is None:
+            i, j = lj.allpairs(system.N)
+        else:
+            i, j = self.celllist.pairs(system, boxdim, rlist)
+
+        # Only keep the pairs inside the list radius
+        rvec = PBC.MIC(system.position[i] - system.position[j], boxdim)
+        inside = np.einsum("ij,ij->i", rvec, rvec) < rlist*rlist
+        self.i = i[inside]
+        self.j = j[inside]
+
+        # Save the state the list was built for
+        self.reference = np.copy(system.position)
+        self.boxdim = np.copy(boxdim)
+        self.Rc = Rc
+        self.strain = 0.
+        self.rebuilds += 1
+
+    def rescale(self, scale):
+        """
+        Scales the list with the box and positions by the same factor, as done by a barostat, so that it does not need to be rebuilt.
+        Every pair distance changes by at most |scale - 1| times the list radius, which is taken from the skin left for the displacements.
+
+        :param VerletList: VerletList instance
+        :param scale: factor of the lengths as a float
+        """
+        if self.reference is not None:
+            self.reference *= scale
+            self.boxdim *= scale
+            self.strain += abs(scale - 1.)*(self.Rc + self.skin)
+
+    def pairs(self, system, boxdim, Rc):
+        """
+        Returns the pairs of the list, rebuilding it first if a particle has moved more than half the skin
+
+        :param VerletList: VerletList instance
+        :param system: ParticleSyst instance with positions inside the box
+        :param boxdim: box dimensions as a (1,3) Numpy array
+        :param Rc: cutoff radius as a float
+        :return i, j: two Numpy arrays of particle indices where the pth pair is (i[p], j[p])
+        """
+        self.calls += 1
+        if self.needsrebuild(system, boxdim, Rc):
+            with self.timers.phase("neighbours"):
+                self.build(system, boxdim, Rc)
+        return self.i, self.j
+
+    def state(self):
+        """
+        Returns the pairs of the list, the state it was built for and the counters, to be saved in a checkpoint
+
+        :param VerletList: VerletList instance
+        :return: dictionary of Numpy arrays
+        """
+        state = {"rebuilds": np.array(self.rebuilds), "calls": np.array(self.calls)}
+        if self.reference is not None:
+            state.update({"i": self.i, "j": self.j, "reference": self.reference, "boxdim": self.boxdim, "Rc": np.array(self.Rc), "strain": np.array(self.strain)})
+        return state
+
+    def restore(self, state):
+        """
+        Restores a list saved in a checkpoint, so that the pairs and the order of the force sums are the same as in the saved run
+
+        :param VerletList: VerletList instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        self.rebuilds = int(state["rebuilds"])
+        self.calls = int(state["calls"])
+        if "reference" in state:
+            self.i = np.copy(state["i"])
+            self.j = np.copy(state["j"])
+            self.reference = np.copy(state["reference"])
+            self.boxdim = np.copy(state["boxdim"])
+            self.Rc = float(state["Rc"])
+            self.strain = float(state["strain"]) if "strain" in state else 0.
@@ -0,0 +1,72 @@
+"""
+Workspace Module
+
+Preallocated work arrays for the time integration: the integrators and the neighbour list keep a Workspace of named buffers which the position and velocity updates, the periodic wrap,
+the minimum image separations and the force kernels write into with out= arguments, so that once every buffer exists a timestep does not allocate any array.
+A buffer is only allocated again if it is asked for with another shape or type, e.g. after the number of particles or the precision of the system has changed.
+Numpy allocates iteration buffers for arithmetic between arrays of different types and for a row broadcast over a column-major access pattern, so the users of a Workspace convert types with cast
+and apply the box dimensions one coordinate at a time.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import numpy as np
+
+
+class Workspace(object):
+
+    def __init__(self):
+        """
+        Initialise an empty Workspace instance, the buffers are allocated on first use
+        """
+        self.buffers = {}
+
+    def __str__(self):
+        """
+        Print the number and total size of the buffers
+
+        :param Workspace: Workspace instance
+        :return: string with the number of buffers and their size in bytes
+        """
+        return "Workspace of " + str(len(self.buffers)) + " buffers holding " + str(self.nbytes()) + " bytes"
+
+    def buffer(self, name, shape, dtype=np.float64):
+        """
+        Returns the buffer of a name, allocating it if it does not exist yet or has another shape or type.
+        The content of the buffer is whatever was last written to it.
+
+        :param Workspace: Workspace instance
+        :param name: name of the buffer, any hashable value
+        :param shape: shape of the buffer as a tuple
+        :param dtype: type of the buffer
+        :return: buffer as a Numpy array
+        """
+        array = self.buffers.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = np.empty(shape, dtype=dtype)
+            self.buffers[name] = array
+        return array
+
+    def cast(self, array, dtype):
+        """
+        Returns an array converted to a type, copied into a buffer of that type if its type is another one
+
+        :param Workspace: Workspace instance
+        :param array: Numpy array
+        :param dtype: type of the returned array
+        :return: the array itself, or a buffer holding it converted to the type
+        """
+        if array.dtype == dtype:
+            return array
+        converted = self.buffer(("cast", array.shape, dtype), array.shape, dtype)
+        np.copyto(converted, array, casting="same_kind")
+        return converted
+
+    def nbytes(self):
+        """
+        Computes the memory held by the buffers
+
+        :param Workspace: Workspace instance
+        :return: size of all buffers in bytes as an integer
+        """
+        return sum([array.nbytes for array in self.buffers.values()])
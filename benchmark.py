@@ -0,0 +1,593 @@
+"""
+Benchmarks
+
+Timing benchmarks of the simulation kernels, run with:
+    python3 benchmark.py [N]    strong scaling of the parallel force evaluation
+    python3 benchmark.py wrap   cost of the periodic wrap
+    python3 benchmark.py replicas   throughput of replica batching
+    python3 benchmark.py pairlist   parallel numba kernel over a Verlet pair list against the serial kernel, over numbers of threads
+    python3 benchmark.py table   accuracy and speed of tabulated pair potentials
+    python3 benchmark.py respa   energy conservation and cost of the multiple timestep integrator
+    python3 benchmark.py precision   force error, speed and energy drift of mixed precision against double precision
+    python3 benchmark.py allocations   check with tracemalloc that the integration steps do not allocate arrays besides the Verlet list rebuilds
+    python3 benchmark.py suite [results.json] [baseline.json]   timings of the force, integrator, I/O and analysis paths across N and phases, compared against a baseline
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import platform
+import contextlib
+import tracemalloc
+import numpy as np
+from ParticleList import ParticleSyst as P
+import PBC
+import Observables as obs
+import MDUtilities as md
+import LennardJones as lj
+from ParallelForce import ParallelForce
+import VelVerlet as vv
+import Replicas as rp
+import PairPotential as pp
+import histogram as hist
+import Backend
+from VerletList import VerletList
+from CellList import CellList
+
+# Temperature, density and cutoff radius of the phases of the input files solid.in, fluid.in and gas.in
+PHASES = {"solid": (0.0768, 0.8446, 2.5), "fluid": (0.768, 0.8446, 2.5), "gas": (7.68, 0.2446, 3.5)}
+
+# Timed functions of the benchmark suite
+FUNCTIONS = ("ljforce", "ljpotential", "PBCpos", "MICvecsep", "VelVerlet", "printVMD", "histogram")
+
+# Memory in bytes an integration step may allocate, for its small Python objects, with the numba backend
+STEPALLOCATION = 4096
+
+
+def latticesystem(N, rho, temp=1.0, seed=0, precision="double"):
+    """
+    Creates a system of N particles on a fcc lattice with random velocities.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param temp: temperature as a float
+    :param seed: seed of the random velocities
+    :param precision: precision of the positions and velocities, "double" or "mixed"
+    :return: ParticleSyst instance and box dimensions as a (1,3) Numpy array
+    """
+    system = P.fromarrays("Bench", np.zeros((N,3)))
+    boxdim = md.setInitialPositions(rho, system)
+    md.setInitialVelocities(temp, system, seed)
+    system.setprecision(precision)
+    return system, boxdim
+
+def besttime(function, repeats=3):
+    """
+    Times a function a number of times.
+
+    :param function: function without arguments
+    :param repeats: number of timings as an integer
+    :return: shortest time in seconds as a float
+    """
+    best = float("inf")
+    for r in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parallelscaling(N=4000, rho=0.8446, Rc=2.5, workers=None, repeats=3):
+    """
+    Strong scaling of the parallel force evaluation: times one force evaluation of the same system over increasing numbers of workers.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param Rc: cutoff radius as a float
+    :param workers: list of numbers of workers, powers of 2 up to the number of cores if None
+    :param repeats: number of timings of each force evaluation
+    :return: list of (workers, time, speedup, efficiency) tuples
+    """
+    if workers is None:
+        workers = [2**k for k in range(int(np.log2(os.cpu_count())) + 1)]
+    system, boxdim = latticesystem(N, rho)
+
+    # Serial reference
+    serial = besttime(lambda: lj.ljpairs(system, boxdim, Rc), repeats)
+    print("Strong scaling of the force evaluation for {0:d} particles".format(N))
+    print("serial: {0:.4f} s".format(serial))
+    print("workers  time (s)  speedup  efficiency")
+
+    results = []
+    for w in workers:
+        with ParallelForce(N, w) as engine:
+            # First call attaches the workers to the shared memory
+            engine(system, boxdim, Rc)
+            elapsed = besttime(lambda: engine(system, boxdim, Rc), repeats)
+        results.append((w, elapsed, serial/elapsed, serial/elapsed/w))
+        print("{0:7d}  {1:8.4f}  {2:7.2f}  {3:10.2f}".format(*results[-1]))
+    return results
+
+def loopPBCpos(syst, boxdim):
+    """
+    Former Python loop implementation of PBC.PBCpos, kept as the reference of wrapbenchmark.
+
+    :param syst: system represented as a ParticleSyst instance
+    :param boxdim: dimensions of box represented as an (1,3) Numpy array
+    :return: position of the particle according to the PBC update
+    """
+    position = syst.position
+    for i in range(0, syst.N):
+        for j in range(0,3):
+            if position[i,j] < 0.:
+                position[i,j] = position[i,j]%boxdim[j]
+            if position[i,j] > boxdim[j]:
+                position[i,j] = position[i,j]%boxdim[j]
+    return position
+
+def wrapbenchmark(sizes=(100, 500, 1000), rho=0.8446, repeats=3):
+    """
+    Per-step cost of the periodic wrap before and after vectorisation.
+    Before, the loop wrap was applied inside every MICvecsep call, so N times per force evaluation; it is now applied once per step to the whole array.
+
+    :param sizes: numbers of particles as a list of integers
+    :param rho: density as a float
+    :param repeats: number of timings of each wrap
+    :return: list of (N, time before, time after) tuples
+    """
+    print("Periodic wrap cost per step")
+    print("      N  before (s)   after (s)  speedup")
+    results = []
+    for N in sizes:
+        system, boxdim = latticesystem(N, rho)
+        # Displace the particles so that some of them are outside of the box
+        system.position += np.random.default_rng(0).uniform(-0.5, 0.5, size=(N,3))*boxdim
+        start = np.copy(system.position)
+
+        def before():
+            system.position[:] = start
+            for n in range(N):
+                loopPBCpos(system, boxdim)
+
+        def after():
+            system.position[:] = start
+            PBC.PBCpos(system, boxdim)
+
+        results.append((N, besttime(before, repeats), besttime(after, repeats)))
+        print("{0:7d}  {1:10.5f}  {2:10.6f}  {3:7.0f}".format(N, results[-1][1], results[-1][2], results[-1][1]/results[-1][2]))
+    return results
+
+def replicathroughput(N=108, replicas=(1, 16, 64), rho=0.8446, Rc=2.5, dt=0.005, steps=20):
+    """
+    Throughput of R replicas integrated together in one ReplicaSyst against the same R systems integrated one after the other, both over all pairs.
+
+    :param N: number of particles per replica as an integer
+    :param replicas: numbers of replicas as a list of integers
+    :param rho: density as a float
+    :param Rc: cutoff radius as a float
+    :param dt: timestep as a float
+    :param steps: number of timed steps
+    :return: list of (R, time per replica step one by one, time per replica step batched) tuples
+    """
+    print("Velocity Verlet steps of {0:d} particle replicas".format(N))
+    print("      R  one by one (ms)  batched (ms)  speedup")
+    results = []
+    for R in replicas:
+        batch = rp.ReplicaSyst.lattice("Bench", R, N, rho, 1.0, seed=0)
+        integrator = rp.ReplicaVerlet(batch, Rc)
+        singles = [vv.VelocityVerlet(system, boxdim, Rc) for system, boxdim in [batch.replica(r) for r in range(R)]]
+
+        # First step compiles the numba kernels and caches the forces
+        integrator.step(dt)
+        for single in singles:
+            single.step(dt)
+
+        def sequential():
+            for n in range(steps):
+                for single in singles:
+                    single.step(dt)
+
+        def batched():
+            for n in range(steps):
+                integrator.step(dt)
+
+        serial = besttime(sequential, 1)/(steps*R)
+        together = besttime(batched, 1)/(steps*R)
+        results.append((R, serial, together))
+        print("{0:7d}  {1:15.4f}  {2:12.4f}  {3:7.2f}".format(R, 1e3*serial, 1e3*together, serial/together))
+    return results
+
+def pairlistbenchmark(N=32000, rho=0.8446, Rc=2.5, skin=0.3, threads=None, repeats=5):
+    """
+    Cost of the numba Lennard-Jones kernel over a Verlet pair list in parallel over chunks of pairs against the serial kernel, over increasing numbers of numba threads.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param Rc: cutoff radius as a float
+    :param skin: skin of the Verlet list as a float
+    :param threads: list of numbers of numba threads, powers of 2 up to the number of numba threads if None
+    :param repeats: number of timings of each force evaluation
+    :return: list of (threads, time, speedup) tuples, or an empty list if numba is not installed
+    """
+    if Backend.numba is None:
+        print("numba is not installed, there is no pair list kernel to time.")
+        return []
+    maxthreads = Backend.numba.config.NUMBA_NUM_THREADS
+    if threads is None:
+        threads = [2**k for k in range(int(np.log2(maxthreads)) + 1)]
+    system, boxdim = latticesystem(N, rho)
+    boxdim = np.asarray(boxdim, dtype=float)
+    i, j = VerletList(skin, CellList()).pairs(system, boxdim, Rc)
+    force, potential = np.empty((N,3)), np.empty(N)
+
+    # Serial reference, the first call compiling the kernel
+    Backend.ljpairlistserial(system.position, boxdim, Rc, i, j, 0., 0., force, potential)
+    serial = besttime(lambda: Backend.ljpairlistserial(system.position, boxdim, Rc, i, j, 0., 0., force, potential), repeats)
+    print("Lennard-Jones kernel over {0:d} pairs of {1:d} particles".format(len(i), N))
+    print("serial: {0:.4f} s".format(serial))
+    print("threads  time (s)  speedup")
+
+    results = []
+    previous = Backend.numba.get_num_threads()
+    try:
+        for t in threads:
+            Backend.numba.set_num_threads(t)
+            accumulator = Backend.accumulators(N)
+            Backend.ljpairlist(system.position, boxdim, Rc, i, j, 0., 0., force, potential, accumulator)
+            elapsed = besttime(lambda: Backend.ljpairlist(system.position, boxdim, Rc, i, j, 0., 0., force, potential, accumulator), repeats)
+            results.append((t, elapsed, serial/elapsed))
+            print("{0:7d}  {1:8.4f}  {2:7.2f}".format(*results[-1]))
+    finally:
+        Backend.numba.set_num_threads(previous)
+    return results
+
+def tablebenchmark(N=4000, rho=0.8446, Rc=2.5, points=(1000, 4000, 16000), repeats=5):
+    """
+    Accuracy and speed of the forces of tabulated Lennard-Jones potentials against LennardJones.ljforce, over the same Verlet list of a disordered lattice.
+    The errors are the largest error of a force component relative to the largest force component and the relative errors of the total energy and virial.
+    The lookup is also timed against the analytic Morse potential, which needs a square root and an exponential per pair.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param Rc: cutoff radius as a float
+    :param points: numbers of intervals of the tables as a list of integers
+    :param repeats: number of timings of each force evaluation
+    :return: list of (interpolation, points, force error, energy error, virial error, time, speedup) tuples
+    """
+    system, boxdim = latticesystem(N, rho)
+    system.position += np.random.default_rng(0).uniform(-0.08, 0.08, size=(N,3))
+    neighbours = VerletList(0.3, CellList())
+    force, potential, virial = lj.ljpairs(system, boxdim, Rc, neighbours)
+    analytic = besttime(lambda: lj.ljforce(system, boxdim, Rc, neighbours), repeats)
+
+    print("Tabulated Lennard-Jones forces of {0:d} particles, ljforce: {1:.4f} s".format(N, analytic))
+    print("interpolation  points  force error  energy error  virial error  time (s)  speedup")
+    results = []
+    for interpolation in pp.INTERPOLATIONS:
+        for n in points:
+            table = pp.PairTable("lj", Rc, points=n, interpolation=interpolation)
+            tforce, tpotential, tvirial = table(system, boxdim, Rc, neighbours)
+            elapsed = besttime(lambda: table(system, boxdim, Rc, neighbours), repeats)
+            results.append((interpolation, n, np.max(np.abs(tforce - force))/np.max(np.abs(force)),
+                            abs(np.sum(tpotential) - np.sum(potential))/abs(np.sum(potential)), abs(tvirial - virial)/abs(virial), elapsed, analytic/elapsed))
+            print("{0:>13s}  {1:6d}  {2:11.2e}  {3:12.2e}  {4:12.2e}  {5:8.4f}  {6:7.2f}".format(*results[-1]))
+
+    # Pair function alone, over the squared distances of the pairs within the cutoff
+    i, j = neighbours.pairs(system, boxdim, Rc)
+    rvec = PBC.MIC(system.position[i] - system.position[j], boxdim)
+    rsq = np.einsum("ij,ij->i", rvec, rvec)
+    rsq = rsq[rsq < Rc*Rc]
+    table = pp.PairTable("morse", Rc)
+    direct = besttime(lambda: pp.morse(rsq), repeats)
+    lookup = besttime(lambda: table.lookup(rsq), repeats)
+    print("Morse over {0:d} pairs: analytic {1:.4f} s, table {2:.4f} s, speedup {3:.2f}".format(len(rsq), direct, lookup, direct/lookup))
+    return results
+
+def respabenchmark(N=864, rho=0.8, temp=1.0, Rc=3.5, dt=0.005, nsteps=4, R_in=(2.0, 1.6), duration=2.0):
+    """
+    Energy conservation and cost of the r-RESPA integrator against velocity Verlet over the same simulated time, from the same initial state.
+    Velocity Verlet is run with the short timestep dt and with the long timestep nsteps*dt, and r-RESPA with the long timestep for the full forces and dt for the short range forces.
+    The fluctuation and drift are those of the total energy per particle, sampled every 5 steps after the first fifth of the run.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param temp: temperature as a float
+    :param Rc: cutoff radius as a float
+    :param dt: short timestep as a float
+    :param nsteps: number of short timesteps per long timestep as an integer
+    :param R_in: inner radii of r-RESPA as a list of floats
+    :param duration: simulated time as a float
+    :return: list of (integrator, timestep, inner radius, time, fluctuation, drift) tuples
+    """
+    runs = [("verlet", dt, None), ("verlet", nsteps*dt, None)] + [("respa", nsteps*dt, r) for r in R_in]
+    systems = [latticesystem(N, rho, temp) for run in runs]
+    print("Energy conservation over a time of {0:g} for {1:d} particles with cutoff {2:g}".format(duration, N, Rc))
+    print("integrator  timestep  inner radius  time (s)  fluctuation      drift")
+    results = []
+    for (integrator, step, inner), (system, boxdim) in zip(runs, systems):
+        neighbours = VerletList(0.3, CellList())
+        if integrator == "verlet":
+            engine = vv.VelocityVerlet(system, boxdim, Rc, neighbours)
+        else:
+            engine = vv.RESPA(system, boxdim, Rc, neighbours, None, inner, nsteps)
+
+        energy = []
+        start = time.perf_counter()
+        for n in range(int(round(duration/step))):
+            engine.step(step)
+            if n%5 == 0:
+                energy.append(obs.thermo(system, boxdim, Rc, neighbours).totE/N)
+        elapsed = time.perf_counter() - start
+        energy = np.array(energy[len(energy)//5:])
+
+        results.append((integrator, step, inner, elapsed, np.std(energy), energy[-1] - energy[0]))
+        print("{0:>10s}  {1:8g}  {2:>12s}  {3:8.2f}  {4:11.2e}  {5:9.2e}".format(integrator, step, "-" if inner is None else str(inner), *results[-1][3:]))
+    return results
+
+def precisionbenchmark(N=4000, rho=0.8446, temp=1.0, Rc=2.5, dt=0.005, steps=1000, cutoff="shifted", repeats=5):
+    """
+    Force error, speed and energy conservation of mixed precision against double precision, from the same initial state.
+    Both runs start from the same state, melted from a fcc lattice with 100 steps in double precision.
+    The force error is the largest difference of a force component from the double precision forces at the same positions, relative to the root mean square force.
+    The fluctuation and drift are those of the total energy per particle, sampled every 5 steps after the first fifth of the run, with the potential shifted to zero at the cutoff
+    so that the drift is not that of particles crossing the cutoff.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param temp: temperature as a float
+    :param Rc: cutoff radius as a float
+    :param dt: timestep as a float
+    :param steps: number of timesteps of the energy conservation runs as an integer
+    :param cutoff: treatment of the cutoff, "truncated", "shifted" or "forceshifted"
+    :param repeats: number of timings of the forces as an integer
+    :return: list of (precision, force time, force error, step time, fluctuation, drift) tuples
+    """
+    forcefield = lj.forcefield(cutoff)
+
+    # Disordered initial state, melted from the lattice in double precision, so that the forces do not cancel as on the lattice
+    with contextlib.redirect_stdout(io.StringIO()):
+        system, boxdim = latticesystem(N, rho, temp)
+    engine = vv.VelocityVerlet(system, boxdim, Rc, VerletList(0.3, CellList()), forcefield)
+    for n in range(100):
+        engine.step(dt)
+    systems = [(P.fromarrays("Bench", system.position, system.velocity, precision=precision), boxdim.copy()) for precision in ("double", "mixed")]
+    print("Mixed against double precision for {0:d} particles with cutoff {1:g} ({2}), {3:d} steps of {4:g} with the {5} backend".format(N, Rc, cutoff, steps, dt, Backend.backend))
+    print("precision  force (ms)  force error  step (ms)  fluctuation      drift")
+    results = []
+    reference = None
+    for precision, (system, boxdim) in zip(("double", "mixed"), systems):
+        neighbours = VerletList(0.3, CellList())
+        force = forcefield(system, boxdim, Rc, neighbours)[0]
+        forcetime = besttime(lambda: forcefield(system, boxdim, Rc, neighbours), repeats)
+        if reference is None:
+            reference = force
+        error = np.max(np.abs(force - reference))/np.sqrt(np.mean(reference*reference))
+
+        engine = vv.VelocityVerlet(system, boxdim, Rc, neighbours, forcefield)
+        energy = []
+        start = time.perf_counter()
+        for n in range(steps):
+            engine.step(dt)
+            if n%5 == 0:
+                energy.append(obs.thermo(system, boxdim, Rc, neighbours, forcefield).totE/N)
+        elapsed = time.perf_counter() - start
+        energy = np.array(energy[len(energy)//5:])
+
+        results.append((precision, forcetime, error, elapsed/steps, np.std(energy), energy[-1] - energy[0]))
+        print("{0:>9s}  {1:10.2f}  {2:11.2e}  {3:9.2f}  {4:11.2e}  {5:9.2e}".format(precision, 1e3*forcetime, error, 1e3*elapsed/steps, *results[-1][4:]))
+    return results
+
+def stepallocations(engine, dt, steps):
+    """
+    Measures with tracemalloc the memory allocated by every step of an integrator, above what was allocated before the step.
+    A step which rebuilds a Verlet list is counted above the memory of building the same list again straight after the step, so that what is measured is the memory allocated besides the pair search.
+    The steps until every Verlet list has been rebuilt once are made before the counted ones, as tracemalloc does not see the release of the lists allocated before it started.
+
+    :param engine: integrator such as a VelVerlet.VelocityVerlet instance, which has already made the steps allocating its buffers
+    :param dt: timestep as a float
+    :param steps: number of timesteps as an integer
+    :return: lists of the memory in bytes allocated by the steps which did not rebuild a Verlet list and by those which did
+    """
+    lists = [verlet for verlet in (engine.neighbours, getattr(engine, "innerneighbours", None)) if isinstance(verlet, VerletList)]
+    steady = []
+    rebuild = []
+    tracemalloc.start()
+    try:
+        rebuilds = [verlet.rebuilds for verlet in lists]
+        while any([verlet.rebuilds == count for verlet, count in zip(lists, rebuilds)]):
+            engine.step(dt)
+
+        for n in range(steps):
+            rebuilds = [verlet.rebuilds for verlet in lists]
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            engine.step(dt)
+            allocated = tracemalloc.get_traced_memory()[1] - before
+            rebuilt = [verlet for verlet, count in zip(lists, rebuilds) if verlet.rebuilds != count]
+            if not rebuilt:
+                steady.append(allocated)
+                continue
+
+            # Pair searches of the step made again at the same positions
+            for verlet in rebuilt:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                verlet.build(engine.syst, engine.boxdim, verlet.Rc)
+                allocated -= tracemalloc.get_traced_memory()[1] - before
+            rebuild.append(allocated)
+    finally:
+        tracemalloc.stop()
+    return steady, rebuild
+
+def allocationcheck(N=4000, rho=0.8446, temp=1.0, Rc=2.5, dt=0.005, steps=40):
+    """
+    Checks with tracemalloc that the steps of VelVerlet.VelocityVerlet and VelVerlet.RESPA do not allocate any array, in double and mixed precision, failing with an AssertionError otherwise.
+    The numba backend is used, as the vectorised numpy pair kernels allocate their per-pair temporaries on every call. A step which rebuilds a Verlet list is counted besides its pair search, see stepallocations.
+    Every step must allocate less than STEPALLOCATION bytes, which leaves room for the small Python objects of a step whatever the number of particles.
+
+    :param N: number of particles as an integer
+    :param rho: density as a float
+    :param temp: temperature as a float
+    :param Rc: cutoff radius as a float
+    :param dt: timestep as a float
+    :param steps: number of timesteps of every check as an integer
+    :return: list of (integrator, precision, steps, largest allocation in bytes, rebuild steps, largest allocation of a rebuild step in bytes) tuples, None if numba is not installed
+    """
+    if Backend.numba is None:
+        print("numba is not installed, the allocations of the numpy pair kernels cannot be avoided.")
+        return None
+    previous = Backend.backend
+    Backend.setbackend("numba")
+    print("Memory allocated per step for {0:d} particles, at most {1:d} bytes".format(N, STEPALLOCATION))
+    print("integrator  precision  steps  largest (bytes)  rebuilds  largest (bytes)")
+    results = []
+    try:
+        for integrator in ("verlet", "respa"):
+            for precision in ("double", "mixed"):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    system, boxdim = latticesystem(N, rho, temp, precision=precision)
+                neighbours = VerletList(0.3, CellList())
+                if integrator == "verlet":
+                    engine = vv.VelocityVerlet(system, boxdim, Rc, neighbours)
+                else:
+                    engine = vv.RESPA(system, boxdim, Rc, neighbours)
+
+                # The first steps allocate the buffers of the workspaces and compile the kernels
+                for n in range(3):
+                    engine.step(dt)
+
+                steady, rebuild = stepallocations(engine, dt, steps)
+                results.append((integrator, precision, len(steady), max(steady + [0]), len(rebuild), max(rebuild + [0])))
+                print("{0:>10s}  {1:>9s}  {2:5d}  {3:15d}  {4:8d}  {5:15d}".format(*results[-1]))
+                assert max(steady + rebuild) < STEPALLOCATION, integrator + " allocated " + str(max(steady + rebuild)) + " bytes in a step in " + precision + " precision"
+    finally:
+        Backend.setbackend(previous)
+    return results
+
+def pertime(function, repeats=5, mintime=0.02):
+    """
+    Times a function, calling it enough times in a row that every timing lasts at least mintime, so that short functions are timed accurately.
+
+    :param function: function without arguments
+    :param repeats: number of timings as an integer
+    :param mintime: smallest duration of a timing in seconds as a float
+    :return: shortest time per call in seconds as a float
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for n in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= mintime:
+            break
+        number *= 2
+    best = elapsed/number
+    for r in range(repeats - 1):
+        start = time.perf_counter()
+        for n in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start)/number)
+    return best
+
+def suite(sizes=(100, 1000, 10000, 100000), phases=("solid", "fluid", "gas"), dt=0.005, repeats=5):
+    """
+    Times the force, integrator, I/O and analysis paths for systems of every size on a fcc lattice at the temperature, density and cutoff of every phase.
+    The forces use a Verlet list built with a cell list, built before the timings as it is during a run. The MIC separation is timed for one particle against all others,
+    the integrator for one step of VelVerlet.VelVerlet, printVMD for one frame, and the histogram for one sample of the RDF up to the cutoff radius, reusing the Verlet list.
+
+    :param sizes: numbers of particles as a list of integers
+    :param phases: names of phases of PHASES as a list of strings
+    :param dt: timestep of the integrator as a float
+    :param repeats: number of timings of each function
+    :return: results as a dictionary with the metadata of the run and the time per call in seconds of every function, keyed by "phase N function"
+    """
+    results = {"metadata": {"python": platform.python_version(), "numpy": np.__version__, "backend": Backend.backend,
+                            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                            "date": time.strftime("%Y-%m-%d %H:%M:%S")},
+               "times": {}}
+    print("Benchmark suite with the " + Backend.backend + " backend, time per call in ms")
+    print("phase        N" + "".join(["{0:>12s}".format(function) for function in FUNCTIONS]))
+    for phase in phases:
+        temp, rho, Rc = PHASES[phase]
+        for N in sizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                system, boxdim = latticesystem(N, rho, temp)
+            neighbours = VerletList(0.3, CellList())
+            neighbours.pairs(system, boxdim, Rc)
+            rdf = hist.RDF(min(0.5*np.min(boxdim), Rc))
+            start = np.copy(system.position)
+
+            def wrap():
+                system.position[:] = start
+                PBC.PBCpos(system, boxdim)
+
+            timings = {"ljforce": lambda: lj.ljforce(system, boxdim, Rc, neighbours),
+                       "ljpotential": lambda: lj.ljpotential(system, boxdim, Rc, neighbours),
+                       "PBCpos": wrap,
+                       "MICvecsep": lambda: system.MICvecsep(boxdim, 0),
+                       "VelVerlet": lambda: vv.VelVerlet(dt, system, boxdim, Rc, neighbours),
+                       "printVMD": lambda: system.printVMD(0),
+                       "histogram": lambda: rdf.sample(system, boxdim, neighbours)}
+            times = [pertime(timings[function], repeats) for function in FUNCTIONS]
+            for function, elapsed in zip(FUNCTIONS, times):
+                results["times"][phase + " " + str(N) + " " + function] = elapsed
+            print("{0:5s}  {1:7d}".format(phase, N) + "".join(["{0:12.4f}".format(1e3*elapsed) for elapsed in times]))
+    return results
+
+def compare(results, baseline, tolerance=0.5):
+    """
+    Compares the timings of the benchmark suite against a baseline, printing the ratio of every timing to the baseline.
+    A timing is a regression if it is slower than the baseline by more than the tolerance, which is large as timings on a shared machine vary by tens of percent from run to run.
+
+    :param results: results of suite as a dictionary
+    :param baseline: results of suite for the baseline as a dictionary
+    :param tolerance: allowed relative slowdown as a float
+    :return: keys of the regressions as a list of strings
+    """
+    print("Comparison against the baseline of " + str(baseline["metadata"].get("date")) + ", ratio of the time to the baseline")
+    regressions = []
+    for key, elapsed in results["times"].items():
+        if key not in baseline["times"]:
+            continue
+        ratio = elapsed/baseline["times"][key]
+        flag = ""
+        if ratio > 1. + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print("{0:30s} {1:10.4f} ms {2:7.2f}{3}".format(key, 1e3*elapsed, ratio, flag))
+    print(str(len(regressions)) + " regressions beyond " + str(int(100*tolerance)) + "%")
+    return regressions
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "wrap":
+        wrapbenchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "replicas":
+        replicathroughput()
+    elif len(sys.argv) > 1 and sys.argv[1] == "pairlist":
+        pairlistbenchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "table":
+        tablebenchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "respa":
+        respabenchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "precision":
+        precisionbenchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "allocations":
+        allocationcheck()
+    elif len(sys.argv) > 1 and sys.argv[1] == "suite":
+        # Results written to a JSON file and compared against the baseline file if there is one, failing if there are regressions
+        resultsFile = sys.argv[2] if len(sys.argv) > 2 else "benchmark.json"
+        baselineFile = sys.argv[3] if len(sys.argv) > 3 else "benchmarkbaseline.json"
+        results = suite()
+        with open(resultsFile, "w") as file:
+            json.dump(results, file, indent=1)
+        if os.path.exists(baselineFile):
+            with open(baselineFile, "r") as file:
+                if compare(results, json.load(file)):
+                    sys.exit(1)
+    else:
+        parallelscaling(int(sys.argv[1]) if len(sys.argv) > 1 else 4000)
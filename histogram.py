@@ -3,6 +3,7 @@
 Radial Distribution Function algorithm
 
 Collects distances between pairs of particles and plots the RDF.
+The RDF class accumulates a fixed histogram of pair distances on the fly, so memory and disk use do not grow with the number of steps.
 
 Created on Sun Feb 26 11:43:43 2017
 
@@ -13,6 +14,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import math
 from ParticleList import ParticleSyst as P
+import LennardJones as lj
+import PBC
 
 def particledistances(syst, fileName,boxdim, k):
     """
@@ -80,4 +83,171 @@ def histogram(fileName, name, syst, rho):
     plt.show()
 
 
+class RDF(object):
     
+    def __init__(self, rmax, nbins=100, blocksize=None):
+        """
+        Initialise a streaming radial distribution function accumulator
+        
+        :param rmax: largest radial distance, at most half the smallest box dimension, as a float
+        :param nbins: number of bins of the histogram as an integer
+        :param blocksize: number of samples per block average as an integer, no block averages if None
+        """
+        self.setedges(np.linspace(0., rmax, nbins + 1))
+        
+        # Pair counts and ideal gas pair density summed over all samples
+        self.counts = np.zeros(nbins)
+        self.norm = 0.0
+        self.samples = 0
+        
+        # Block averages of g(r)
+        self.blocksize = blocksize
+        self.blockcounts = np.zeros(nbins)
+        self.blocknorm = 0.0
+        self.blocksamples = 0
+        self.blocks = []
+    
+    def __str__(self):
+        """
+        Print the range, number of bins and number of samples
+        
+        :param RDF: RDF instance
+        :return: string with the range, bins and samples
+        """
+        return "RDF up to r = " + str(self.rmax) + " in " + str(self.nbins) + " bins over " + str(self.samples) + " samples"
+    
+    def setedges(self, edges):
+        """
+        Sets the bin edges of the histogram and the range and shell volumes that follow from them
+        
+        :param RDF: RDF instance
+        :param edges: edges of the bins from 0 to rmax as a Numpy array
+        """
+        self.edges = np.array(edges, dtype=float)
+        self.rmax = float(self.edges[-1])
+        self.nbins = self.edges.size - 1
+        
+        # Volume of the spherical shell of every bin
+        self.shellvolume = 4./3.*math.pi*(self.edges[1:]**3 - self.edges[:-1]**3)
+    
+    def accumulate(self, r, N, volume):
+        """
+        Adds one sample of pair distances to the histogram
+        
+        :param RDF: RDF instance
+        :param r: distances between pairs of particles, each pair counted once, as a Numpy array
+        :param N: number of particles as an integer
+        :param volume: volume of the box as a float
+        """
+        hist = np.histogram(r, bins=self.edges)[0]
+        
+        # Number of pairs per unit volume for an ideal gas of the same density
+        norm = 0.5*N*(N - 1)/volume
+        
+        self.counts += hist
+        self.norm += norm
+        self.samples += 1
+        
+        if self.blocksize is not None:
+            self.blockcounts += hist
+            self.blocknorm += norm
+            self.blocksamples += 1
+            if self.blocksamples == self.blocksize:
+                self.blocks.append(self.blockcounts/(self.blocknorm*self.shellvolume))
+                self.blockcounts = np.zeros(self.nbins)
+                self.blocknorm = 0.0
+                self.blocksamples = 0
+    
+    def sample(self, syst, boxdim, neighbours=None):
+        """
+        Bins the pair distances of the system at a specific point in time.
+        The neighbour backend must be the RDF's own, such as a CellList instance: a Verlet list of the forces would be rebuilt for rmax at every sample and again for the cutoff radius at the next step.
+        
+        :param RDF: RDF instance
+        :param syst: N body system represented as a ParticleSyst instance
+        :param boxdim: box dimensions as a Numpy array
+        :param neighbours: neighbour backend of the RDF such as a CellList instance, all pairs are used if None
+        """
+        if neighbours is None:
+            i, j = lj.allpairs(syst.N)
+        else:
+            i, j = neighbours.pairs(syst, boxdim, self.rmax)
+        rvec = PBC.MIC(syst.position[i] - syst.position[j], boxdim)
+        r = np.sqrt(np.einsum("ij,ij->i", rvec, rvec))
+        self.accumulate(r, syst.N, np.prod(boxdim))
+    
+    def gofr(self):
+        """
+        Computes the radial distribution function averaged over all samples
+        
+        :param RDF: RDF instance
+        :return: centres of the bins and g(r) as two Numpy arrays
+        """
+        centres = 0.5*(self.edges[1:] + self.edges[:-1])
+        return centres, self.counts/(self.norm*self.shellvolume)
+    
+    def write(self, fileName):
+        """
+        Writes the radial distribution function to a file where each line is: [radial distance] [g(r)], followed by [standard error of g(r)] if there are at least 2 block averages
+        
+        :param RDF: RDF instance
+        :param fileName: name of the output file as a string
+        """
+        centres, g = self.gofr()
+        columns = [centres, g]
+        if len(self.blocks) > 1:
+            columns.append(np.std(self.blocks, axis=0, ddof=1)/math.sqrt(len(self.blocks)))
+        np.savetxt(fileName, np.column_stack(columns), fmt="%.4f")
+    
+    def state(self):
+        """
+        Returns the bin edges and the accumulated histograms, to be saved in a checkpoint
+        
+        :param RDF: RDF instance
+        :return: dictionary of Numpy arrays
+        """
+        return {"rmax": np.array(self.rmax), "edges": self.edges, "counts": self.counts, "norm": np.array(self.norm), "samples": np.array(self.samples),
+                "blockcounts": self.blockcounts, "blocknorm": np.array(self.blocknorm), "blocksamples": np.array(self.blocksamples),
+                "blocks": np.array(self.blocks).reshape(-1, self.nbins)}
+    
+    def restore(self, state):
+        """
+        Restores the bin edges and histograms saved in a checkpoint.
+        The bins of the checkpoint replace those the RDF was created with, which differ if the box has been rescaled by a barostat since the start of the run.
+        
+        :param RDF: RDF instance
+        :param state: dictionary of Numpy arrays returned by state
+        """
+        if "edges" in state:
+            self.setedges(state["edges"])
+        elif len(state["counts"]) != self.nbins:
+            raise ValueError("RDF checkpoint has " + str(len(state["counts"])) + " bins and no bin edges, expected " + str(self.nbins) + " bins")
+        self.counts = np.copy(state["counts"])
+        self.norm = float(state["norm"])
+        self.samples = int(state["samples"])
+        self.blockcounts = np.copy(state["blockcounts"])
+        self.blocknorm = float(state["blocknorm"])
+        self.blocksamples = int(state["blocksamples"])
+        self.blocks = list(np.copy(state["blocks"]))
+
+
+def plotrdf(rdf, name, prefix=None, show=True):
+    """
+    Plots the radial distribution function accumulated by an RDF instance.
+    
+    :param rdf: RDF instance
+    :param name: name of system as a string
+    :param prefix: path and name the figure is saved under, the name of the system if None
+    :param show: show the figure, otherwise it is only saved
+    """
+    r, g = rdf.gofr()
+    plt.figure()
+    plt.plot(r, g, "g", label="rdf")
+    plt.title("Radial distribution function for a " + str(name))
+    plt.xlabel("Radial distance")
+    plt.ylabel("g(r)")
+    plt.savefig(str(name if prefix is None else prefix)+'Histogram')
+    if show:
+        plt.show()
+    else:
+        plt.close()
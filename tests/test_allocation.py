@@ -0,0 +1,53 @@
+"""
+Checks with tracemalloc that the integration steps do not allocate any array with the numba backend, see benchmark.stepallocations.
+The vectorised kernels of the numpy backend allocate their per-pair temporaries on every step, so they are not checked.
+
+Authors: Cara Lynch, Marina Ruiz Sanchez-Oro
+"""
+
+import io
+import contextlib
+import pytest
+import Backend
+import VelVerlet as vv
+import benchmark as bm
+from VerletList import VerletList
+from CellList import CellList
+
+
+@pytest.fixture
+def numba():
+    """
+    Sets the numba backend for a check and restores the previous one afterwards
+    """
+    if Backend.numba is None:
+        pytest.skip("numba is not installed")
+    previous = Backend.backend
+    Backend.setbackend("numba")
+    yield
+    Backend.setbackend(previous)
+
+
+@pytest.mark.parametrize("precision", ["double", "mixed"])
+@pytest.mark.parametrize("integrator, N", [("verlet", 2048), ("respa", 2048), ("allpairs", 256)])
+def test_steps_do_not_allocate(numba, integrator, N, precision):
+    """
+    Every step, including those which rebuild a Verlet list besides its pair search, allocates less than benchmark.STEPALLOCATION bytes
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        system, boxdim = bm.latticesystem(N, 0.8446, 1.0, precision=precision)
+    if integrator == "verlet":
+        engine = vv.VelocityVerlet(system, boxdim, 2.5, VerletList(0.3, CellList()))
+    elif integrator == "respa":
+        engine = vv.RESPA(system, boxdim, 2.5, VerletList(0.3, CellList()))
+    else:
+        engine = vv.VelocityVerlet(system, boxdim, 2.5)
+
+    # The first steps allocate the buffers of the workspaces and compile the kernels
+    for n in range(3):
+        engine.step(0.005)
+
+    steady, rebuild = bm.stepallocations(engine, 0.005, 20)
+    assert len(steady) > 0
+    assert len(rebuild) > 0 or integrator == "allpairs"
+    assert max(steady + rebuild) < bm.STEPALLOCATION